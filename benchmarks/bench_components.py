@@ -0,0 +1,64 @@
+""" component factory construction, without the autoname cache """
+import numpy as np
+import pytest
+
+from pp.components import component_factory
+
+# need arguments to be built
+_skip = {"cavity", "component_sequence", "label", "text", "tlm", "bbox"}
+
+
+@pytest.mark.benchmark(group="component_factory")
+@pytest.mark.parametrize(
+    "component_type", sorted(set(component_factory.keys()) - _skip)
+)
+def bench_component_factory(benchmark, clear_cache, component_type):
+    factory = component_factory[component_type]
+    c = benchmark.pedantic(factory, setup=clear_cache, rounds=20, warmup_rounds=1)
+    assert c.name
+
+
+def _grating_doe_settings():
+    """500 variants of a fiber angle and wavelength sweep"""
+    return [
+        dict(fiber_angle=round(fiber_angle, 1), lambda_c=round(lambda_c, 2))
+        for fiber_angle in np.arange(8, 13, 0.2)
+        for lambda_c in np.arange(1.5, 1.7, 0.01)
+    ]
+
+
+@pytest.mark.benchmark(group="grating_coupler_doe")
+@pytest.mark.parametrize(
+    "component_type", ["grating_coupler_elliptical_te", "grating_coupler_te"]
+)
+def bench_grating_coupler_doe(benchmark, clear_cache, component_type):
+    factory = component_factory[component_type]
+    settings = _grating_doe_settings()
+    components = benchmark.pedantic(
+        lambda: [factory(**s) for s in settings], setup=clear_cache, rounds=3
+    )
+    assert len({c.name for c in components}) == 500
+
+
+@pytest.mark.benchmark(group="generators")
+def bench_splitter_tree_256(benchmark, clear_cache):
+    c = benchmark.pedantic(
+        lambda: component_factory["splitter_tree"](n_o_outputs=256, spacing=6400.0),
+        setup=clear_cache,
+        rounds=3,
+    )
+    assert len(c.ports) == 257
+
+
+@pytest.mark.benchmark(group="generators")
+def bench_component_lattice_256(benchmark, clear_cache):
+    from pp.components.component_lattice import get_sequence_cross_str
+
+    n = 256
+    lattice = get_sequence_cross_str(list(range(n)), list(range(n))[::-1])
+    c = benchmark.pedantic(
+        lambda: component_factory["component_lattice"](lattice=lattice),
+        setup=clear_cache,
+        rounds=3,
+    )
+    assert len(c.ports) == 2 * n
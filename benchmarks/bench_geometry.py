@@ -0,0 +1,32 @@
+""" area: analytical rectangles vs gdspy """
+import gdspy
+import pytest
+from generators import electrical_chip
+
+from pp.rectangles import rectangles_area, split_rectangles
+
+_sizes = [100, 1000]
+
+
+def _get_polygons(n):
+    c = electrical_chip(n)
+    return c.get_polygons(by_spec=True)[(49, 0)]
+
+
+@pytest.mark.benchmark(group="area")
+@pytest.mark.parametrize("n", _sizes)
+def bench_area_rectangles(benchmark, n):
+    polygons = _get_polygons(n)
+    benchmark(lambda: rectangles_area(split_rectangles(polygons)[0]))
+
+
+@pytest.mark.benchmark(group="area")
+@pytest.mark.parametrize("n", _sizes)
+def bench_area_gdspy(benchmark, n):
+    polygons = _get_polygons(n)
+    benchmark(
+        lambda: sum(
+            gdspy.Polygon(p).area()
+            for p in gdspy.boolean(polygons, None, "or").polygons
+        )
+    )
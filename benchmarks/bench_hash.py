@@ -0,0 +1,11 @@
+""" geometry hash on deep hierarchies """
+import pytest
+from generators import deep_hierarchy
+
+
+@pytest.mark.benchmark(group="hash_geometry")
+@pytest.mark.parametrize("depth,fanout", [(3, 4), (6, 4), (10, 2)])
+def bench_hash_geometry(benchmark, depth, fanout):
+    c = deep_hierarchy(depth=depth, fanout=fanout)
+    h = benchmark(c.hash_geometry)
+    assert h == c.hash_geometry()
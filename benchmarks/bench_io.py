@@ -0,0 +1,29 @@
+""" GDS and OASIS write / import, JSON metadata """
+import pytest
+from generators import deep_hierarchy
+
+import pp
+
+_suffixes = [".gds", ".oas"]
+
+
+@pytest.mark.benchmark(group="write_gds")
+@pytest.mark.parametrize("suffix", _suffixes)
+def bench_write_gds(benchmark, tmp_path, suffix):
+    c = deep_hierarchy(depth=6, fanout=4, polygons=100)
+    benchmark(pp.write_gds, c, tmp_path / f"deep{suffix}")
+
+
+@pytest.mark.benchmark(group="import_gds")
+@pytest.mark.parametrize("suffix", _suffixes)
+def bench_import_gds(benchmark, tmp_path, suffix):
+    c = deep_hierarchy(depth=6, fanout=4, polygons=100)
+    gdspath = pp.write_gds(c, tmp_path / f"deep{suffix}")
+    c2 = benchmark(pp.import_gds, gdspath)
+    assert len(c2.get_dependencies(recursive=True)) == 5
+
+
+@pytest.mark.benchmark(group="write_json")
+def bench_write_json(benchmark, tmp_path):
+    c = pp.routing.add_fiber_array(pp.c.mzi2x2())
+    benchmark(c.write_json, tmp_path / "metadata.json")
@@ -0,0 +1,44 @@
+""" packing and placement """
+import klayout.db as pya
+import pytest
+from generators import chain_yaml, klayout_cells, random_rectangles
+
+from pp.autoplacer.auto_placer import AutoPlacer
+from pp.component_from_yaml import component_from_yaml
+from pp.pack import pack
+
+
+@pytest.mark.benchmark(group="pack")
+@pytest.mark.parametrize("n", [50, 500])
+def bench_pack(benchmark, n):
+    components = random_rectangles(n)
+    bins = benchmark(pack, components, max_size=(5000, 5000))
+    assert bins
+
+
+@pytest.mark.benchmark(group="pack_many")
+@pytest.mark.parametrize("n", [50, 500])
+def bench_pack_many(benchmark, n):
+    def setup():
+        placer = AutoPlacer("bench", max_width=50e6, max_height=50e6)
+        layout = pya.Layout()
+        return (placer, layout, klayout_cells(layout, n)), {}
+
+    def pack_many(placer, layout, cells):
+        return placer.pack_many(cells)
+
+    failed = benchmark.pedantic(pack_many, setup=setup, rounds=3)
+    assert len(failed) == 0
+
+
+@pytest.mark.benchmark(group="component_from_yaml")
+@pytest.mark.parametrize("n", [10, 100])
+def bench_component_from_yaml(benchmark, clear_cache, n):
+    netlist = chain_yaml(n)
+
+    def setup():
+        clear_cache()
+        return (netlist,), {}
+
+    c = benchmark.pedantic(component_from_yaml, setup=setup, rounds=5)
+    assert len(c.references) == n
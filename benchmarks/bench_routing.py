@@ -0,0 +1,72 @@
+""" routing on large port counts """
+import pytest
+from generators import bundle_ports, component_with_ports
+
+import pp
+from pp import Port
+from pp.port import get_ports_facing, select_ports
+from pp.routing.connect_bundle import connect_bundle
+from pp.routing.connect_bundle import compute_ports_max_displacement
+from pp.routing.connect_bundle import generate_waypoints_connect_bundle
+from pp.routing.path_length_matching import path_length_matched_points
+from pp.routing.path_length_matching import path_length_matched_bundle
+
+
+@pytest.mark.benchmark(group="connect_bundle")
+@pytest.mark.parametrize("n", [16, 64, 256])
+def bench_connect_bundle(benchmark, n):
+    top, bottom = bundle_ports(n)
+    routes = benchmark(connect_bundle, top, bottom, cache=False)
+    assert len(routes) == n
+
+
+@pytest.mark.benchmark(group="add_fiber_array")
+@pytest.mark.parametrize("n", [4, 16, 32])
+def bench_add_fiber_array(benchmark, clear_cache, n):
+    def setup():
+        clear_cache()
+        return (component_with_ports(n),), {}
+
+    c = benchmark.pedantic(pp.routing.add_fiber_array, setup=setup, rounds=3)
+    assert len(c.references) > n
+
+
+@pytest.mark.benchmark(group="select_ports")
+@pytest.mark.parametrize("n", [100, 1000])
+def bench_select_ports(benchmark, n):
+    c = component_with_ports(n)
+    for i in range(n):
+        c.add_port(f"pad{i}", (i * 100, 1e4), 80, 90, port_type="dc")
+
+    def select():
+        return (
+            select_ports(c, port_type="dc"),
+            get_ports_facing(c, "W"),
+            c.get_ports_list(prefix="E1"),
+        )
+
+    pads, west, east = benchmark(select)
+    assert len(pads) == len(west) == n
+
+
+@pytest.mark.benchmark(group="path_length_match")
+@pytest.mark.parametrize("n", [16, 64])
+def bench_path_length_matched_points(benchmark, n):
+    top = [Port(f"T_{i}", (i * 10, 0), 0.5, 90) for i in range(n)]
+    bottom = [Port(f"B_{i}", (i * 50 + 400, 500), 0.5, 270) for i in range(n)]
+    # same end_straight_offset as connect_bundle_path_length_match
+    offset = compute_ports_max_displacement(top, bottom) / 2 + 30.0
+    waypoints = generate_waypoints_connect_bundle(
+        top, bottom, separation=30.0, end_straight_offset=offset
+    )
+    routes = benchmark(path_length_matched_points, waypoints, nb_loops=1)
+    assert len(routes) == n
+
+
+@pytest.mark.benchmark(group="path_length_match")
+@pytest.mark.parametrize("n", [16, 64, 128])
+def bench_path_length_matched_bundle(benchmark, n):
+    top = [Port(f"T_{i}", (i * 10, 0), 0.5, 90) for i in range(n)]
+    bottom = [Port(f"B_{i}", (i * 127 - n * 60, 5000), 0.5, 270) for i in range(n)]
+    routes = benchmark(path_length_matched_bundle, top, bottom)
+    assert len(routes) == n
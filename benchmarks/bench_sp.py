@@ -0,0 +1,13 @@
+""" Sparameters loading """
+import pytest
+from generators import write_sparameters
+
+import pp
+
+
+@pytest.mark.benchmark(group="sp_load")
+@pytest.mark.parametrize("numports,nfreq", [(2, 1000), (4, 1000), (8, 2000)])
+def bench_sp_load(benchmark, tmp_path, numports, nfreq):
+    filepath = write_sparameters(tmp_path / "s.dat", numports, nfreq)
+    port_names, f, s = benchmark(pp.sp.load, filepath=filepath, numports=numports)
+    assert s.shape == (nfreq, numports, numports)
@@ -0,0 +1,27 @@
+""" benchmarks for the hot paths of a mask build (needs pytest-benchmark)
+
+.. code::
+
+    make bench-baseline  # stores a baseline in benchmarks/.baseline
+    make bench           # compares against the last baseline, fails on regressions
+
+"""
+import pytest
+
+from pp.container import CONTAINER_CACHE
+from pp.name import NAME_TO_DEVICE
+from pp.routing.connect_bundle import ROUTE_CACHE
+
+
+@pytest.fixture
+def clear_cache():
+    """returns a function that empties the autoname, container and routing caches
+    so that components are built from scratch in every round
+    """
+
+    def _clear_cache():
+        NAME_TO_DEVICE.clear()
+        CONTAINER_CACHE.clear()
+        ROUTE_CACHE.clear()
+
+    return _clear_cache
@@ -0,0 +1,149 @@
+""" synthetic inputs for the benchmarks """
+import pathlib
+
+import numpy as np
+
+import pp
+from pp import Port
+from pp.component import Component
+
+
+def ports_row(n, pitch=10.0, y=0.0, orientation=270, prefix="P"):
+    """returns n ports along x"""
+    return [Port(f"{prefix}_{i}", (i * pitch, y), 0.5, orientation) for i in range(n)]
+
+
+def bundle_ports(n, pitch_top=10.0, pitch_bottom=127.0, separation=500.0):
+    """returns (top_ports, bottom_ports) for a n-wide fan-out"""
+    offset = (n - 1) * (pitch_bottom - pitch_top) / 2
+    top = ports_row(n, pitch=pitch_top, y=0, orientation=270, prefix="T")
+    bottom = ports_row(n, pitch=pitch_bottom, y=-separation, orientation=90, prefix="B")
+    for port in bottom:
+        port.midpoint = port.midpoint - np.array([offset, 0])
+    return top, bottom
+
+
+def component_with_ports(n, pitch=10.0, width=0.5):
+    """returns a box with n optical ports facing west and n facing east"""
+    c = Component(name=f"ports_{n}")
+    height = n * pitch
+    length = 20.0
+    c.add_polygon([(0, 0), (length, 0), (length, height), (0, height)], layer=(1, 0))
+    for i in range(n):
+        y = (i + 0.5) * pitch
+        c.add_port(name=f"W{i}", midpoint=(0, y), width=width, orientation=180)
+        c.add_port(name=f"E{i}", midpoint=(length, y), width=width, orientation=0)
+    return c
+
+
+def deep_hierarchy(depth=6, fanout=4, polygons=10):
+    """returns a Component tree with `fanout` references per level
+    and a few polygons in every cell, (fanout ** depth) leaf instances
+    """
+    rng = np.random.RandomState(depth)
+    child = None
+    for level in range(depth):
+        c = Component(name=f"level_{depth}_{fanout}_{level}")
+        for _ in range(polygons):
+            x, y = rng.uniform(0, 10, 2)
+            c.add_polygon([(x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1)], layer=1)
+        if child is not None:
+            for i in range(fanout):
+                c.add_ref(child).movex(i * child.xsize * 1.1)
+        child = c
+    return child
+
+
+def random_rectangles(n, seed=0):
+    """returns n rectangles of random sizes"""
+    rng = np.random.RandomState(seed)
+    return [
+        pp.c.rectangle(size=tuple(np.round(size, 1)))
+        for size in rng.uniform(10, 200, (n, 2))
+    ]
+
+
+def electrical_chip(n, pitch=150.0, wire_width=10.0, layer=(49, 0)):
+    """returns a flat chip with 2 rows of n pads connected by Manhattan wires
+    (rectangles only, overlapping at the pads and corners)
+    """
+    c = Component(name=f"electrical_chip_{n}")
+    pad = pp.c.pad(layer=layer)
+    shift = n * pitch / 3
+    for i in range(n):
+        top = c << pad
+        bottom = c << pad
+        top.move((i * pitch, 2000 + 20 * n))
+        bottom.move((i * pitch + shift, 0))
+        y = 100 + 20 * i
+        x0, x1 = sorted((top.x, bottom.x))
+        w = wire_width / 2
+        for points in (
+            [
+                (top.x - w, y - w),
+                (top.x + w, y - w),
+                (top.x + w, top.y),
+                (top.x - w, top.y),
+            ],
+            [(x0 - w, y - w), (x1 + w, y - w), (x1 + w, y + w), (x0 - w, y + w)],
+            [
+                (bottom.x - w, bottom.y),
+                (bottom.x + w, bottom.y),
+                (bottom.x + w, y + w),
+                (bottom.x - w, y + w),
+            ],
+        ):
+            c.add_polygon(points, layer=layer)
+    return c.flatten()
+
+
+def klayout_cells(layout, n, seed=0):
+    """returns n boxes of random sizes (in dbu) as klayout cells"""
+    import klayout.db as pya
+
+    rng = np.random.RandomState(seed)
+    layer = layout.layer(1, 0)
+    cells = []
+    for i, (w, h) in enumerate(rng.randint(100, 2000, (n, 2)) * 1000):
+        cell = layout.create_cell(f"box_{i}")
+        cell.shapes(layer).insert(pya.Box(0, 0, int(w), int(h)))
+        cells.append(cell)
+    return cells
+
+
+def chain_yaml(n, length=10.0):
+    """returns a YAML netlist of n waveguides connected in series"""
+    lines = ["instances:"]
+    for i in range(n):
+        lines += [
+            f"  wg{i}:",
+            "    component: waveguide",
+            "    settings:",
+            f"      length: {length + i % 10}",
+        ]
+    lines += ["placements:", "  wg0:", "    x: 0", "    'y': 0", "connections:"]
+    lines += [f"  wg{i + 1},W0: wg{i},E0" for i in range(n - 1)]
+    lines += ["ports:", "  W0: wg0,W0", f"  E0: wg{n - 1},E0"]
+    return "\n".join(lines) + "\n"
+
+
+def write_sparameters(filepath, numports=4, nfreq=1000):
+    """writes random Sparameters in the Lumerical interconnect format"""
+    rng = np.random.RandomState(numports)
+    f = np.linspace(180e12, 200e12, nfreq)
+    lines = [f'["port{i}","LEFT"]' for i in range(numports)]
+    for n in range(numports):
+        for m in range(numports):
+            lines += [
+                f'("port{m}","mode 1",1,"port{n}",1,"transmission")',
+                f"({nfreq},3)",
+            ]
+            lines += [
+                f"{fi} {mag} {phase}"
+                for fi, mag, phase in zip(
+                    f, rng.uniform(0, 1, nfreq), rng.uniform(-np.pi, np.pi, nfreq)
+                )
+            ]
+    filepath = pathlib.Path(filepath)
+    filepath.write_text("\n".join(lines) + "\n")
+    return filepath
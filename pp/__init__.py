@@ -43,6 +43,7 @@ import pp.components as c
 import pp.routing as routing
 import pp.bias as bias
 import pp.klive as klive
+import pp.profiler as profiler
 import pp.sp as sp
 import pp.port as port
 import pp.units as units
@@ -95,6 +96,7 @@ __all__ = [
     "path",
     "pg",
     "port",
+    "profiler",
     "routing",
     "show",
     "sp",
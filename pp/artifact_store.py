@@ -0,0 +1,317 @@
+""" content-addressed store of build artifacts
+
+An artifact is a directory of build files (the GDS, JSON and content.txt of a DOE)
+stored under a key that hashes everything that produced it:
+the component type and settings, the tech config (layers, pins, derived layers ...)
+and the code (pp sources and the module of the component factory). Builds ask for each artifact and only fetch the ones
+they need, instead of mirroring the whole build directory.
+
+.. code:: yaml
+
+    tech:
+        artifact_store: /nfs/gdsfactory/artifacts  # or file://, ssh://host/path
+
+Backends:
+
+- LocalArtifactStore: a directory, local or shared (NFS). Artifacts are written
+  in a temporary directory and renamed, so concurrent builds never see
+  half written artifacts
+- RsyncArtifactStore: a remote directory (ssh://host/path or host:path),
+  one rsync per artifact. A marker file is uploaded last, and artifacts
+  without it (being uploaded or failed) do not exist
+
+Other backends subclass ArtifactStore and register their URL scheme with
+`register_backend`.
+"""
+
+import abc
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from omegaconf import OmegaConf
+
+from pp.config import __version__, conf, module_path
+from pp.name import clean_value
+
+# tech settings that do not change the artifacts
+TECH_IGNORE = ("cache_url", "artifact_store")
+
+
+class ArtifactStore(abc.ABC):
+    """ stores directories of build files by key """
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def get(self, key: str, dirpath: pathlib.Path) -> bool:
+        """copies the artifact files into dirpath
+        returns False if the store does not have the artifact
+        """
+
+    @abc.abstractmethod
+    def put(self, key: str, dirpath: pathlib.Path) -> None:
+        """ stores the files of dirpath (no-op if the artifact exists) """
+
+
+class LocalArtifactStore(ArtifactStore):
+    """ artifacts in a local or shared (NFS) directory: root/ke/key/ """
+
+    def __init__(self, root) -> None:
+        self.root = pathlib.Path(root)
+
+    def _get_path(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / key
+
+    def exists(self, key: str) -> bool:
+        return self._get_path(key).is_dir()
+
+    def get(self, key: str, dirpath: pathlib.Path) -> bool:
+        path = self._get_path(key)
+        if not path.is_dir():
+            return False
+        dirpath = pathlib.Path(dirpath)
+        dirpath.mkdir(parents=True, exist_ok=True)
+        for filepath in path.iterdir():
+            shutil.copy2(filepath, dirpath / filepath.name)
+        return True
+
+    def put(self, key: str, dirpath: pathlib.Path) -> None:
+        path = self._get_path(key)
+        if path.is_dir():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / f".{key}.{uuid.uuid4().hex}"
+        shutil.copytree(dirpath, tmp)
+        try:
+            os.rename(tmp, path)
+        except OSError:  # stored by another build in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class RsyncArtifactStore(ArtifactStore):
+    """ artifacts in a remote directory (host:path), one rsync per artifact """
+
+    marker = ".complete"
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    def _get_url(self, key: str) -> str:
+        return f"{self.url}/{key[:2]}/{key}/"
+
+    def _rsync(self, *args) -> bool:
+        try:
+            process = subprocess.run(
+                ["rsync", *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except OSError:  # no rsync
+            return False
+        return process.returncode == 0
+
+    def exists(self, key: str) -> bool:
+        return self._rsync("--list-only", self._get_url(key) + self.marker)
+
+    def get(self, key: str, dirpath: pathlib.Path) -> bool:
+        if not self.exists(key):
+            return False
+        pathlib.Path(dirpath).mkdir(parents=True, exist_ok=True)
+        return self._rsync(
+            "-r", f"--exclude={self.marker}", self._get_url(key), f"{dirpath}/"
+        )
+
+    def put(self, key: str, dirpath: pathlib.Path) -> None:
+        """uploads the files then the marker, raises OSError if rsync fails
+        the parent directories are staged locally (rsync < 3.2.3 has no --mkpath)
+        """
+        if self.exists(key):
+            return
+        with tempfile.TemporaryDirectory() as tmp:
+            staged = pathlib.Path(tmp) / key[:2] / key
+            shutil.copytree(dirpath, staged)
+            if not self._rsync("-r", f"{tmp}/", f"{self.url}/"):
+                raise OSError(f"rsync of {dirpath} to {self._get_url(key)} failed")
+            (staged / self.marker).touch()
+            if not self._rsync("-r", f"{tmp}/", f"{self.url}/"):
+                raise OSError(f"rsync of {self.marker} to {self._get_url(key)} failed")
+
+
+BACKENDS = {"file": LocalArtifactStore, "ssh": RsyncArtifactStore}
+
+
+def register_backend(scheme: str, store_class: Callable) -> None:
+    """ registers an ArtifactStore class for the URLs that start with scheme:// """
+    BACKENDS[scheme] = store_class
+
+
+def get_artifact_store(url: Optional[str] = None) -> Optional[ArtifactStore]:
+    """returns the artifact store of an URL or path
+    (defaults to tech.artifact_store, None if not set)
+    """
+    url = url or conf.tech.get("artifact_store")
+    if not url:
+        return None
+    url = str(url)
+    if "://" in url:
+        scheme, path = url.split("://", 1)
+        if scheme not in BACKENDS:
+            raise ValueError(f"artifact store {scheme} not in {list(BACKENDS)}")
+        if scheme == "file":
+            return BACKENDS[scheme](path)
+        if scheme == "ssh":
+            host, _, path = path.partition("/")
+            return BACKENDS[scheme](f"{host}:/{path}")
+        return BACKENDS[scheme](url)
+    if ":" in url.split("/")[0]:
+        return RsyncArtifactStore(url)
+    return LocalArtifactStore(url)
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_sources(dirpath: str) -> str:
+    h = hashlib.sha1()
+    for filepath in sorted(pathlib.Path(dirpath).rglob("*.py")):
+        h.update(str(filepath.relative_to(dirpath)).encode())
+        h.update(filepath.read_bytes())
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_file(filepath: str) -> str:
+    return hashlib.sha1(pathlib.Path(filepath).read_bytes()).hexdigest()
+
+
+def get_code_hash(function: Optional[Callable] = None) -> str:
+    """returns the hash of the pp sources and version,
+    and of the module that defines function (custom component factories)
+    """
+    h = hashlib.sha1((__version__ + _hash_sources(str(module_path))).encode())
+    try:
+        filepath = inspect.getsourcefile(inspect.unwrap(function))
+    except TypeError:
+        filepath = None
+    if filepath:
+        try:
+            pathlib.Path(filepath).relative_to(module_path)
+        except ValueError:  # not in the pp sources
+            h.update(_hash_file(filepath).encode())
+    return h.hexdigest()
+
+
+def get_tech_settings() -> Dict[str, Any]:
+    """returns the tech config that the artifacts depend on"""
+    tech = OmegaConf.to_container(conf.tech, resolve=True)
+    return {k: v for k, v in tech.items() if k not in TECH_IGNORE}
+
+
+def get_doe_key(
+    doe: Dict[str, Any], component_factory: Dict[str, Callable], **kwargs
+) -> str:
+    """returns the artifact key of a DOE:
+    hash of the component type, settings, build options (kwargs), tech config and code
+    """
+    component_type = doe["component"]
+    settings = dict(
+        component=component_type,
+        list_settings=doe["list_settings"],
+        options=kwargs,
+        tech=get_tech_settings(),
+    )
+    settings_json = json.dumps(settings, sort_keys=True, default=clean_value)
+    code_hash = get_code_hash(component_factory.get(component_type))
+    return hashlib.sha1((settings_json + code_hash).encode()).hexdigest()
+
+
+def test_local_artifact_store(tmp_path):
+    from pp.components import component_factory
+
+    store = get_artifact_store(f"file://{tmp_path / 'store'}")
+    assert isinstance(store, LocalArtifactStore)
+
+    doe = dict(component="mmi1x2", list_settings=[dict(length_mmi=5)])
+    key = get_doe_key(doe, component_factory)
+    assert key == get_doe_key(doe, component_factory)
+    doe2 = dict(component="mmi1x2", list_settings=[dict(length_mmi=6)])
+    assert key != get_doe_key(doe2, component_factory)
+    conf.tech.deferred_cladding = True
+    try:
+        assert key != get_doe_key(doe, component_factory)
+    finally:
+        conf.tech.deferred_cladding = False
+
+    build = tmp_path / "build"
+    build.mkdir()
+    (build / "content.txt").write_text("mmi1x2")
+    assert not store.exists(key)
+    assert not store.get(key, tmp_path / "fetched")
+    store.put(key, build)
+    store.put(key, build)
+    assert store.exists(key)
+    assert store.get(key, tmp_path / "fetched")
+    assert (tmp_path / "fetched" / "content.txt").read_text() == "mmi1x2"
+    assert not [p for p in store.root.rglob(".*")]  # no temporary directories
+
+
+def test_artifact_store_abstract():
+    import pytest
+
+    with pytest.raises(TypeError):
+        ArtifactStore()
+
+    class _Store(ArtifactStore):
+        def exists(self, key):
+            return False
+
+    with pytest.raises(TypeError):
+        _Store()
+
+
+def test_rsync_artifact_store(tmp_path):
+    import pytest
+
+    class _Store(RsyncArtifactStore):
+        """ rsync between local directories, with a copy """
+
+        def _rsync(self, *args):
+            self.calls.append(args)
+            if args[0] == "--list-only":
+                return pathlib.Path(args[1]).exists()
+            source, destination = args[-2:]
+            if self.fail:
+                return False
+            for filepath in pathlib.Path(source).rglob("*"):
+                target = pathlib.Path(destination) / filepath.relative_to(source)
+                if filepath.is_file() and filepath.name not in self.excluded(args):
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(filepath, target)
+            return True
+
+        def excluded(self, args):
+            return [a.split("=", 1)[1] for a in args if a.startswith("--exclude=")]
+
+    store = _Store(str(tmp_path / "store"))
+    store.calls, store.fail = [], True
+    build = tmp_path / "build"
+    build.mkdir()
+    (build / "content.txt").write_text("mmi1x2")
+    with pytest.raises(OSError):
+        store.put("abcd", build)
+    assert not store.exists("abcd")
+
+    store.fail = False
+    store.put("abcd", build)
+    assert store.exists("abcd")
+    assert (tmp_path / "store" / "ab" / "abcd" / RsyncArtifactStore.marker).exists()
+    assert not any("--mkpath" in call for call in store.calls)
+    assert store.get("abcd", tmp_path / "fetched")
+    assert [p.name for p in (tmp_path / "fetched").iterdir()] == ["content.txt"]
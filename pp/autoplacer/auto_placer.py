@@ -5,6 +5,8 @@ import klayout.db as pya
 import pp.autoplacer.functions as ap
 from pp.autoplacer.cell_list import CellList
 from pp.autoplacer.library import Library
+from pp.autoplacer.helpers import import_cell
+from pp.oasis import save_options
 
 
 class AutoPlacer(pya.Layout):
@@ -65,27 +67,9 @@ class AutoPlacer(pya.Layout):
             return max(w for (w, s, e, n) in collisions) - ap.GRID - bbox.width()
 
     def import_cell(self, cell):
-        """ Imports a cell from another Layout """
-        # If the cell is already in the library, skip loading
-        if self.cell(cell.name):
-            return self.cell(cell.name)
-
-        # Create a holder cell and copy in the shapes
-        new_cell = self.create_cell(cell.name)
-        new_cell.copy_shapes(cell)
-
-        # Import all the child cells
-        for child_index in cell.each_child_cell():
-            self.import_cell(cell.layout().cell(child_index))
-
-        # Import all of the instances, doing the mapping from Layout to Layout
-        for instance in cell.each_inst():
-            cell_index = self.cell(instance.cell.name).cell_index()
-            # new_instance = pya.CellInstArray(cell_index, instance.trans)
-            new_instance = instance.cell_inst.dup()
-            new_instance.cell_index = cell_index
-            new_cell.insert(new_instance)
-        return new_cell
+        """ Imports a cell from another Layout
+        (subcells are deduplicated by content across all imported layouts) """
+        return import_cell(self, cell)
 
     def inside(self, bbox):
         """ Check that something is inside the mask """
@@ -210,6 +194,33 @@ class AutoPlacer(pya.Layout):
         new_instance = pya.CellInstArray(new_cell.cell_index(), transform)
         self.cell(self.name).insert(new_instance)
 
+    def pack_array(self, cell, x, y, columns, rows, dx, dy):
+        """
+        Pack columns x rows copies of a cell as one array instance (GDS AREF)
+        """
+        box = cell.bbox()
+        for col in range(columns):
+            for row in range(rows):
+                tbox = (
+                    x + col * dx,
+                    y + row * dy,
+                    x + col * dx + box.width(),
+                    y + row * dy + box.height(),
+                )
+                self.quadtree.insert(tbox, tbox)
+
+        new_cell = self.import_cell(cell)
+        transform = pya.Trans(int(x - box.left), int(y - box.bottom))
+        new_instance = pya.CellInstArray(
+            new_cell.cell_index(),
+            transform,
+            pya.Vector(int(dx), 0),
+            pya.Vector(0, int(dy)),
+            columns,
+            rows,
+        )
+        self.cell(self.name).insert(new_instance)
+
     def pack_auto(self, cell, origin=ap.SOUTH_WEST, direction=ap.VERTICAL):
         """
         Pack a cell automatically
@@ -253,12 +264,16 @@ class AutoPlacer(pya.Layout):
             pya.Box(0, 0, self.max_width, self.max_height)
         )
 
-    def write(self, *args, **kwargs):
-        """ Draw boundary on write """
-        if not kwargs.get("shrink", False):
+    def write(self, filename, *args, **kwargs):
+        """ Draw boundary on write
+        .oas files are written as OASIS with CBLOCK compression
+        """
+        if not kwargs.pop("shrink", False):
             self.draw_boundary()
 
-        super(AutoPlacer, self).write(*args, **kwargs)
+        if not args and not kwargs:
+            args = (save_options(filename),)
+        super(AutoPlacer, self).write(str(filename), *args, **kwargs)
 
     """
     Below here we have high-level utility functions
@@ -342,11 +357,19 @@ class AutoPlacer(pya.Layout):
         bbox = cells[0].bbox()
         w, h = bbox.width(), bbox.height()
 
-        # Place
+        # Place, copies of the same cell in a column become one array
         assert cols * rows >= len(cells)
         grid = itertools.product(list(range(int(cols))), list(range(int(rows))))
-        for cell, (col, row) in zip(cells, grid):
-            block.pack_manual(cell, w * col, h * row)
+        placements = zip(cells, grid)
+        for _, run in itertools.groupby(
+            placements, key=lambda p: (p[1][0], p[0].cell_index(), p[0].name)
+        ):
+            run = list(run)
+            cell, (col, row) = run[0]
+            if len(run) > 1:
+                block.pack_array(cell, w * col, h * row, 1, len(run), w, h)
+            else:
+                block.pack_manual(cell, w * col, h * row)
 
         # Shrink and add a boundary
         block.shrink()
@@ -1,9 +1,57 @@
 import os
 import itertools
+import multiprocessing
+import time
 import klayout.db as pya
 import pp.autoplacer.functions as ap
 from pp.autoplacer.library import Library
 from pp.autoplacer.auto_placer import AutoPlacer
+from pp.oasis import get_suffix, write_layout
+
+WORKER_LIBRARY = {}
+
+
+def _worker_library(root):
+    """ Returns the Library of this worker process (loaded once per process) """
+    if root not in WORKER_LIBRARY:
+        WORKER_LIBRARY[root] = Library(root)
+    return WORKER_LIBRARY[root]
+
+
+def fill_factor(chip):
+    """ Fraction of the chip area covered by the bboxes of its instances """
+    area = sum(instance.bbox().area() for instance in chip.top_cell().each_inst())
+    return area / (chip.max_width * chip.max_height)
+
+
+def _pack_chip(args):
+    """ Builds one chip in its own Layout and writes it to gdspath
+
+    Runs in a worker process, so only the report travels back
+    """
+    name, row, col, width, height, root, align, fill_chip, kwargs, gdspath = args
+    t0 = time.time()
+    lib = _worker_library(root) if root else None
+    # the placeholder chip of the parent process may be registered here too
+    ap.AUTOPLACER_REGISTRY.pop(name, None)
+    chip = AutoPlacer(name, width, height)
+    if align:
+        aligntree = lib.get(align)[0]
+        for corner in ap.CORNERS:
+            chip.pack_auto(aligntree, corner)
+
+    fill_chip(chip, lib=lib, row=row, col=col, **kwargs)
+    report = dict(
+        name=name,
+        row=row,
+        col=col,
+        gdspath=gdspath,
+        cells=chip.top_cell().child_instances(),
+        fill_factor=fill_factor(chip),
+    )
+    chip.write(gdspath)
+    report["time"] = time.time() - t0
+    return report
 
 
 class ChipArray(AutoPlacer):
@@ -98,6 +146,70 @@ class ChipArray(AutoPlacer):
                     box = pya.Box(x - lw, y1, x + lw, y2)
                     container.shapes(layer).insert(box)
 
+    def pack_chips(
+        self, fill_chip, processes=None, path=None, extension=None, **kwargs
+    ):
+        """ Packs all the chips in parallel, one worker process per chip at a time
+
+        Each worker owns its own Layout (and its own copy of the Library),
+        writes the chip to `path` and only sends back a report.
+        The chips are merged into the mask by instance on `write`.
+
+        Args:
+            fill_chip: function(chip, lib, row, col, **kwargs) that packs an AutoPlacer chip
+                needs to be importable (module level) to be sent to the workers.
+                Each worker has its own Library, so cells popped in a chip are
+                not removed for the other chips: select them by row/col
+            processes: number of worker processes (defaults to cpu count)
+            path: directory for the chip files (build/mask)
+            extension: .gds or .oas (defaults to conf.tech.layout_format)
+            **kwargs: for fill_chip
+
+        Returns:
+            list of per-chip reports (name, row, col, gdspath, cells, fill_factor, time)
+        """
+        path = path or os.path.join("build", "mask")
+        extension = extension or get_suffix()
+        os.makedirs(path, exist_ok=True)
+        jobs = [
+            (
+                chip.name,
+                chip.row,
+                chip.col,
+                self.chip_width,
+                self.chip_height,
+                self.lib.root,
+                self.align,
+                fill_chip,
+                kwargs,
+                os.path.join(path, "{}_{}{}".format(self.name, chip.name, extension)),
+            )
+            for chip in self.chips
+        ]
+
+        t0 = time.time()
+        reports = []
+        with multiprocessing.Pool(processes) as pool:
+            for report in pool.imap_unordered(_pack_chip, jobs):
+                print(
+                    "chip {name}: {cells} cells, {fill_factor:.1%} filled in {time:.2f}s".format(
+                        **report
+                    )
+                )
+                reports.append(report)
+        print("Packed {} chips in {:.2f}s".format(len(reports), time.time() - t0))
+
+        self.chips = []
+        for report in sorted(reports, key=lambda r: (r["row"], r["col"])):
+            chip = pya.Layout()
+            chip.read(report["gdspath"])
+            ap.WORKING_MEMORY[report["gdspath"]] = chip
+            chip.name = report["name"]
+            chip.row, chip.col = report["row"], report["col"]
+            self.chips.append(chip)
+        self.reports = reports
+        return reports
+
     def write(self, *args, **kwargs):
         """ Write to disk. We pack the chips at the last minute. """
         self.draw_boundary(ap.DEVREC_LAYER)
@@ -115,7 +227,7 @@ class ChipArray(AutoPlacer):
             path = os.path.join("build", "mask")
         filename = os.path.join(path, name)
         for chip in self.chips:
-            chip.write(filename + "_" + chip.name + ".gds")
+            write_layout(chip, filename + "_" + chip.name + get_suffix())
 
 
 if __name__ == "__main__":
@@ -1,8 +1,13 @@
 import functools
+import hashlib
+import weakref
 import klayout.db as pya
 
 CELLS = {}
 
+# target layout -> {content hash: (cell_index, cell_name)} of the imported cells
+IMPORT_CACHE = weakref.WeakKeyDictionary()
+
 
 @functools.lru_cache()
 def load_gds(filepath):
@@ -22,25 +27,104 @@ def load_gds(filepath):
     return layout
 
 
+def cell_content_hash(cell, hashes=None):
+    """returns a hash of the shapes and instances of a cell and its children
+    (independent of cell names and of shapes and instances order)
+
+    Args:
+        cell: klayout cell
+        hashes: {cell_index: hash} memo for the cells of the same layout
+    """
+    hashes = {} if hashes is None else hashes
+    cell_index = cell.cell_index()
+    if cell_index in hashes:
+        return hashes[cell_index]
+
+    layout = cell.layout()
+    h = hashlib.md5(str(layout.dbu).encode())
+
+    for layer_index in layout.layer_indexes():
+        shapes = sorted(str(shape) for shape in cell.shapes(layer_index).each())
+        if shapes:
+            h.update(str(layout.get_info(layer_index)).encode())
+            h.update("\n".join(shapes).encode())
+
+    instances = []
+    for instance in cell.each_inst():
+        child_hash = cell_content_hash(instance.cell, hashes)
+        array = ""
+        if instance.is_regular_array():
+            array = f"{instance.a} {instance.b} {instance.na} {instance.nb}"
+        instances.append(f"{child_hash} {instance.cplx_trans} {array}")
+    h.update("\n".join(sorted(instances)).encode())
+
+    hashes[cell_index] = h.hexdigest()
+    return hashes[cell_index]
+
+
 def import_cell(layout, cell):
-    """ Imports a cell from another Layout into a given layout"""
+    """ Imports a cell from another Layout into a given layout
+
+    If a cell with the same name is already in the layout it is reused.
+    Child cells are deduplicated by content, so structurally identical subcells
+    coming from different layouts map to a single cell, even if their names differ.
+    """
     # If the cell is already in the library, skip loading
     if layout.cell(cell.name):
         return layout.cell(cell.name)
+    return _import_cell(layout, cell, hashes={}, reuse=False)
+
+
+def _import_cell(layout, cell, hashes, reuse=True):
+    cache = IMPORT_CACHE.setdefault(layout, {})
+    content_hash = cell_content_hash(cell, hashes)
+
+    if reuse and content_hash in cache:
+        cell_index, cell_name = cache[content_hash]
+        cached_cell = layout.cell(cell_index)
+        # cells can be deleted from the layout after being imported
+        if cached_cell is not None and cached_cell.name == cell_name:
+            return cached_cell
 
     # Create a holder cell and copy in the shapes
     new_cell = layout.create_cell(cell.name)
     new_cell.copy_shapes(cell)
 
-    # Import all the child cells
-    for child_index in cell.each_child_cell():
-        import_cell(layout, cell.layout().cell(child_index))
-
     # Import all of the instances, doing the mapping from Layout to Layout
     for instance in cell.each_inst():
-        cell_index = layout.cell(instance.cell.name).cell_index()
-        # new_instance = pya.CellInstArray(cell_index, instance.trans)
+        child = _import_cell(layout, instance.cell, hashes)
         new_instance = instance.cell_inst.dup()
-        new_instance.cell_index = cell_index
+        new_instance.cell_index = child.cell_index()
         new_cell.insert(new_instance)
+
+    cache[content_hash] = (new_cell.cell_index(), new_cell.name)
     return new_cell
+
+
+def test_import_cell_deduplicates_subcells():
+    gc_layouts = []
+    for name in ["gc_a", "gc_b"]:
+        source = pya.Layout()
+        top = source.create_cell(f"top_{name}")
+        gc = source.create_cell(name)
+        gc.shapes(source.layer(1, 0)).insert(pya.Box(0, 0, 10, 10))
+        top.insert(pya.CellInstArray(gc.cell_index(), pya.Trans(0, 0)))
+        top.insert(pya.CellInstArray(gc.cell_index(), pya.Trans(100, 0)))
+        gc_layouts.append(source)
+
+    layout = pya.Layout()
+    for source in gc_layouts:
+        import_cell(layout, source.top_cell())
+
+    names = sorted(c.name for c in layout.each_cell())
+    assert names == ["gc_a", "top_gc_a", "top_gc_b"]
+
+    # a subcell with the same name and a different content is not reused
+    source = pya.Layout()
+    top = source.create_cell("top_gc_c")
+    gc = source.create_cell("gc_a")
+    gc.shapes(source.layer(1, 0)).insert(pya.Box(0, 0, 20, 20))
+    top.insert(pya.CellInstArray(gc.cell_index(), pya.Trans(0, 0)))
+    new_cell = import_cell(layout, top)
+    assert new_cell.bbox() == pya.Box(0, 0, 20, 20)
+    assert layout.cells() == 5
@@ -6,6 +6,7 @@ from collections import defaultdict
 import klayout.db as pya
 from pp.autoplacer.functions import area, WORKING_MEMORY
 from pp.autoplacer.cell_list import CellList
+from pp.oasis import LAYOUT_SUFFIXES
 
 
 class Library(object):
@@ -44,18 +45,33 @@ class Library(object):
         # Same selection, without attempting to align gratings
         library.pop("ring.*euler.*", normalize=False)
 
+        # Free the memory of cells once they are packed
+        cells = library.pop("ring.*")
+        name = cells[0].name
+        mask.pack_grid(cells)
+        library.release(cells)
+
+        # a released cell is read again from its file
+        cell = library.get_cell(name)
+
     """
 
     def __init__(self, root="build/devices"):
         self.root = root
         self.cells = {}
+        self.filenames = {}
+        self.released = {}  # cell name: filename
         self.does = defaultdict(list)
         self.load_all_gds()
         self.load_all_json()
 
     def load_all_gds(self):
-        """ Loads all the gds files """
-        filenames = glob.glob(self.root + "/*.gds")
+        """ Loads all the GDS and OASIS files """
+        filenames = [
+            filename
+            for suffix in LAYOUT_SUFFIXES
+            for filename in glob.glob(self.root + "/*" + suffix)
+        ]
         print("Loading {} GDS files...".format(len(filenames)))
         for filename in filenames:
             self.load_gds(filename)
@@ -74,6 +90,7 @@ class Library(object):
         layout.read(str(filename))
         self.cells[layout.top_cell().name] = layout.top_cell()
         self.cells[layout.top_cell().name].metadata = {}
+        self.filenames[layout.top_cell().name] = filename
 
     def load_json(self, filename):
         """ Load json metadata"""
@@ -85,6 +102,12 @@ class Library(object):
                     if cell_name in self.cells:
                         self.does[doe_name].append(self.cells[cell_name])
 
+    def get_cell(self, name):
+        """ returns a cell, read again from its file if it was released """
+        if name not in self.cells and name in self.released:
+            self.load_gds(self.released.pop(name))
+        return self.cells[name]
+
     def get(self, regex):
         cells = [
             cell
@@ -131,6 +154,20 @@ class Library(object):
 
         return CellList(cells)
 
+    def release(self, cells):
+        """ Frees the layouts of cells that were already packed into an AutoPlacer
+        (the cell objects can not be used anymore once released,
+        get_cell reads them again) """
+        names = {cell.name for cell in cells}
+        for doe_name, doe_cells in self.does.items():
+            self.does[doe_name] = [c for c in doe_cells if c.name not in names]
+        for name in names:
+            self.cells.pop(name, None)
+            filename = self.filenames.pop(name, None)
+            if filename is not None:
+                self.released[name] = filename
+                WORKING_MEMORY.pop(filename, None)
+
     def delete_cells(self, cells):
         for cell in cells:
             try:
@@ -1,3 +1,4 @@
+import klayout.db as pya
 from pp import klive
 from pp.autoplacer.library import Library
 from pp.autoplacer.chip_array import ChipArray
@@ -12,5 +13,54 @@ def test_autplacer():
     klive.show("chip_array.gds")
 
 
+def test_release(tmp_path):
+    devices = tmp_path / "devices"
+    devices.mkdir()
+    for name in ("box1", "box2"):
+        layout = pya.Layout()
+        cell = layout.create_cell(name)
+        cell.shapes(layout.layer(1, 0)).insert(pya.Box(0, 0, 1000, 1000))
+        layout.write(str(devices / f"{name}.gds"))
+    (devices / "doe.json").write_text(
+        '{"type": "doe", "name": "doe", "cells": ["box1", "box2"]}'
+    )
+
+    lib = Library(str(devices))
+    lib.release(lib.get("box1"))
+    assert [c.name for c in lib.get(".*")] == ["box2"]
+    assert [c.name for c in lib.does["doe"]] == ["box2"]
+    cell = lib.get_cell("box1")
+    assert cell.name == "box1"
+    assert cell.bbox().width() == 1000
+
+
+def fill_chip_with_boxes(chip, lib, row, col, n=3):
+    """ packs n boxes of (row + col + 1) x 1 mm into a chip """
+    layout = pya.Layout()
+    cell = layout.create_cell("box")
+    cell.shapes(layout.layer(1, 0)).insert(pya.Box(0, 0, (row + col + 1) * 1e6, 1e6))
+    for _ in range(n):
+        chip.pack_auto(cell)
+
+
+def test_pack_chips(tmp_path):
+    lib = Library(str(tmp_path / "devices"))
+    mask = ChipArray("chip_array_parallel", 10e6, 10e6, 2, 2, lib)
+    reports = mask.pack_chips(fill_chip_with_boxes, processes=2, path=str(tmp_path))
+    assert len(reports) == 4
+    for report in reports:
+        assert report["cells"] == 3
+        area = 3 * (report["row"] + report["col"] + 1) * 1e12
+        assert abs(report["fill_factor"] - area / mask.chip_width ** 2) < 1e-9
+
+    gdspath = tmp_path / "chip_array_parallel.gds"
+    mask.write(str(gdspath))
+    layout = pya.Layout()
+    layout.read(str(gdspath))
+    assert len(list(layout.top_cell().each_inst())) == 4
+    # identical boxes from different workers are merged, different ones kept
+    assert len([c for c in layout.each_cell() if c.name.startswith("box")]) == 3
+
+
 if __name__ == "__main__":
     test_autplacer()
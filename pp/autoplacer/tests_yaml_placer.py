@@ -17,5 +17,44 @@ def test1():
     print(new_dict)
 
 
+def test_place_and_write_incremental(tmp_path):
+    import json
+    import pp
+    from pp.autoplacer.yaml_placer import place_and_write
+    from pp.generate_does import generate_does
+
+    does_path = pp.CONFIG["samples_path"] / "mask" / "does.yml"
+    doe_root_path = tmp_path / "cache_doe"
+    gdspath = tmp_path / "mask.gds"
+    generate_does(
+        str(does_path), doe_root_path=doe_root_path, doe_metadata_path=tmp_path / "doe"
+    )
+
+    manifest = place_and_write(does_path, doe_root_path, gdspath, incremental=True)
+    assert manifest["replaced"] == []
+    assert sorted(manifest["does"]) == ["mmi_width", "mmi_width_length"]
+
+    # nothing changed: the previous layout is reused as is
+    manifest = place_and_write(does_path, doe_root_path, gdspath, incremental=True)
+    assert manifest["replaced"] == []
+
+    # a smaller component fits in the area reserved for its DOE
+    doe_dir = doe_root_path / "mmi_width"
+    cell_name = (doe_dir / "content.txt").read_text().split(" , ")[0]
+    c = pp.c.rectangle(size=(1, 1))
+    c.name = cell_name
+    pp.write_gds(c, doe_dir / f"{cell_name}.gds")
+    manifest = place_and_write(does_path, doe_root_path, gdspath, incremental=True)
+    assert manifest["replaced"] == ["mmi_width"]
+
+    # a bigger component does not fit, so the mask is placed from scratch
+    c = pp.c.rectangle(size=(500, 1))
+    c.name = cell_name
+    pp.write_gds(c, doe_dir / f"{cell_name}.gds")
+    manifest = place_and_write(does_path, doe_root_path, gdspath, incremental=True)
+    assert manifest["replaced"] == []
+    assert json.loads(gdspath.with_suffix(".placer.json").read_text()) == manifest
+
+
 if __name__ == "__main__":
     test1()
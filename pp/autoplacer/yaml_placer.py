@@ -21,6 +21,10 @@ iso_lines_coarse1:
 
 import os
 import sys
+import json
+import hashlib
+import itertools
+import pathlib
 import collections
 import numpy as np
 from omegaconf import OmegaConf
@@ -29,6 +33,8 @@ import klayout.db as pya
 import pp.autoplacer.text as text
 from pp.autoplacer.helpers import import_cell, load_gds, CELLS
 from pp.config import CONFIG
+from pp.oasis import find_layout, get_suffix, write_layout
+from pp import profiler
 
 UM_TO_GRID = 1e3
 DEFAULT_BBOX_LAYER_IGNORE = [(8484, 8484)]
@@ -120,23 +126,40 @@ def placer_grid_cell_refs(
     um_to_grid=UM_TO_GRID,
     **settings,
 ):
-    """cells: list of cells - order matters for placing"""
-
-    indices = [(i, j) for j in range(cols) for i in range(rows)]
+    """cells: list of cells - order matters for placing
+    consecutive copies of the same cell in a column are placed as one array
+    """
 
     if rows * cols < len(cells):
         raise ValueError(
             "Shape ({}, {}): Not enough emplacements ({}) for all these components"
-            " ({}).".format(rows, cols, len(indices), len(cells))
+            " ({}).".format(rows, cols, rows * cols, len(cells))
         )
-    components = []
-    for cell, (i, j) in zip(cells, indices):
-        _x = int((x0 + j * dx) * um_to_grid)
-        _y = int((y0 + i * dy) * um_to_grid)
 
-        transform = pya.Trans(_x, _y)
-        c_ref = pya.CellInstArray(cell.cell_index(), transform)
-        components += [c_ref]
+    a = pya.Vector(int(dx * um_to_grid), 0)
+    b = pya.Vector(0, int(dy * um_to_grid))
+    cell_indices = [cell.cell_index() for cell in cells]
+
+    if len(cells) == rows * cols and len(set(cell_indices)) == 1:
+        transform = pya.Trans(int(x0 * um_to_grid), int(y0 * um_to_grid))
+        return [pya.CellInstArray(cell_indices[0], transform, a, b, cols, rows)]
+
+    components = []
+    for j in range(cols):
+        i = 0
+        column = cell_indices[j * rows : (j + 1) * rows]
+        for cell_index, run in itertools.groupby(column):
+            n = len(list(run))
+            _x = int((x0 + j * dx) * um_to_grid)
+            _y = int((y0 + i * dy) * um_to_grid)
+
+            transform = pya.Trans(_x, _y)
+            if n > 1:
+                c_ref = pya.CellInstArray(cell_index, transform, a, b, 1, n)
+            else:
+                c_ref = pya.CellInstArray(cell_index, transform)
+            components += [c_ref]
+            i += n
 
     return components
 
@@ -459,7 +482,7 @@ def load_doe(doe_name, doe_root):
                 """
                 component_names = line.split(" , ")
                 gdspaths = [
-                    os.path.join(doe_dir, name + ".gds") for name in component_names
+                    find_layout(os.path.join(doe_dir, name)) for name in component_names
                 ]
                 cells = [load_gds(gdspath) for gdspath in gdspaths]
 
@@ -471,6 +494,34 @@ def load_doe(doe_name, doe_root):
         return cells
 
 
+def doe_content_hash(doe_name, doe_root):
+    """returns a hash of the cached GDS files of a DOE (follows templates)"""
+    doe_dir = pathlib.Path(doe_root) / doe_name
+    content_file = doe_dir / "content.txt"
+    h = hashlib.md5()
+
+    if content_file.is_file():
+        line = content_file.read_text().split("\n")[0]
+        if line.startswith("TEMPLATE:"):
+            template_name = line.split(":")[1].strip()
+            return doe_content_hash(template_name, doe_root)
+
+        h.update(line.encode())
+        for name in line.split(" , "):
+            h.update(find_layout(doe_dir / name).read_bytes())
+    return h.hexdigest()
+
+
+def _settings_hash(settings):
+    return hashlib.md5(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class IncrementalPlacementError(Exception):
+    """raised when a previous placement can not be reused"""
+
+
 PLACER_NAME2FUNC = {
     "grid": placer_grid_cell_refs,
     "pack_row": pack_row,
@@ -525,6 +576,29 @@ def place_from_yaml(
         filepath_yaml:
         root_does: used for cache, requires content.txt
     """
+    top_level, _ = _place_from_yaml(
+        filepath_yaml, root_does=root_does, precision=precision, fontpath=fontpath
+    )
+    return top_level
+
+
+@profiler.profile("placement", "place_from_yaml")
+def _place_from_yaml(
+    filepath_yaml,
+    root_does=CONFIG["cache_doe_directory"],
+    precision=1e-9,
+    fontpath=text.FONT_PATH,
+    previous_gdspath=None,
+    previous_manifest=None,
+):
+    """Returns the top level cell and its placement manifest
+    {name, dbu, does: {doe_name: {content, settings, bbox}}, replaced: [doe_names]}
+
+    If previous_gdspath and previous_manifest are given, the previous layout is
+    reloaded and only the DOEs whose content or settings changed are re-imported
+    and re-placed inside the bbox they had before.
+    Raises IncrementalPlacementError if the previous layout can not be reused.
+    """
     transform_identity = pya.Trans(0, 0)
     dicts, mask_settings = load_yaml(filepath_yaml)
 
@@ -541,7 +615,27 @@ def place_from_yaml(
     dbu = top_level_layout.dbu
     um_to_grid = int(1 / dbu)
 
-    top_level = top_level_layout.create_cell(top_level_name)
+    incremental = previous_manifest is not None
+    manifest = dict(name=top_level_name, dbu=dbu, does={}, replaced=[])
+
+    if incremental:
+        if (
+            previous_manifest["name"] != top_level_name
+            or previous_manifest["dbu"] != dbu
+            or list(previous_manifest["does"]) != list(does)
+        ):
+            raise IncrementalPlacementError("mask name, precision or DOE list changed")
+        top_level_layout.read(str(previous_gdspath))
+        top_level = top_level_layout.cell(top_level_name)
+        if top_level is None:
+            raise IncrementalPlacementError(
+                f"{top_level_name} not in {previous_gdspath}"
+            )
+        # DOE GDS files may have changed on disk since they were cached
+        load_gds.cache_clear()
+    else:
+        top_level = top_level_layout.create_cell(top_level_name)
+
     global CELLS
     CELLS[top_level_name] = top_level_layout
 
@@ -568,6 +662,31 @@ def place_from_yaml(
                     raise
         doe = update_dicts_recurse(doe, default_doe_settings)
 
+        doe_manifest = dict(
+            content=doe_content_hash(doe_name, root_does), settings=_settings_hash(doe),
+        )
+        manifest["does"][doe_name] = doe_manifest
+
+        if incremental:
+            previous_doe = previous_manifest["does"][doe_name]
+            doe_cell = top_level_layout.cell(doe_name)
+            if doe_cell is None or previous_doe["bbox"] is None:
+                raise IncrementalPlacementError(f"no DOE cell for {doe_name}")
+            doe_manifest["bbox"] = previous_doe["bbox"]
+
+            if (
+                previous_doe["content"] == doe_manifest["content"]
+                and previous_doe["settings"] == doe_manifest["settings"]
+            ):
+                placed_does[doe_name] = doe_cell
+                placed_doe = doe_cell
+                continue
+
+            # remove the previous components that are not used by other DOEs
+            doe_cell.prune_subcells()
+            doe_cell.clear_insts()
+            manifest["replaced"].append(doe_name)
+
         # Get all the components
         components = load_doe(doe_name, root_does)
 
@@ -627,15 +746,15 @@ def place_from_yaml(
         ## Check if the cell should be attached to a specific parent cell
         if "parent" in settings:
             parent_name = settings.pop("parent")
-            if parent_name not in CELLS:
+            if top_level_layout.cell(parent_name) is None:
                 # Create parent cell in layout and insert it under top level
                 parent_cell = top_level_layout.create_cell(parent_name)
-                CELLS[parent_name] = parent_cell
                 parent_cell_instance = pya.CellInstArray(
                     parent_cell.cell_index(), transform_identity
                 )
                 top_level.insert(parent_cell_instance)
-            doe_parent_cell = CELLS[parent_name]
+            doe_parent_cell = top_level_layout.cell(parent_name)
+            CELLS[parent_name] = doe_parent_cell
         else:
             # If no parent specified, insert the DOE at top level
             doe_parent_cell = top_level
@@ -718,9 +837,28 @@ def place_from_yaml(
 
         placed_components = _placer(components, **settings)
 
+        if incremental:
+            # Replace the components of the existing DOE cell
+            # as long as they fit in the area reserved for this DOE
+            for instance in placed_components:
+                doe_cell.insert(instance)
+            bbox = doe_cell.bbox()
+            previous_bbox = pya.Box(*previous_doe["bbox"])
+            has_label = doe["add_doe_label"] or doe["add_doe_visual_label"]
+
+            if not bbox.inside(previous_bbox) or (has_label and bbox != previous_bbox):
+                raise IncrementalPlacementError(f"{doe_name} does not fit anymore")
+            placed_does[doe_name] = doe_cell
+            placed_doe = doe_cell
+            continue
+
         # Place components within a cell having the DOE name
 
-        if with_doe_cell or len(placed_components) > 1:
+        if (
+            with_doe_cell
+            or len(placed_components) > 1
+            or placed_components[0].is_regular_array()
+        ):
             doe_cell = top_level_layout.create_cell(doe_name)
             CELLS[doe_name] = doe_cell
             for instance in placed_components:
@@ -761,15 +899,56 @@ def place_from_yaml(
 
         doe_parent_cell.insert(doe_instance)
 
-    return top_level
+        # incremental placement can only update DOEs placed in their own cell
+        b = doe_instance.bbox(top_level_layout)
+        doe_manifest["bbox"] = (
+            [b.left, b.bottom, b.right, b.top]
+            if isinstance(placed_doe, pya.Cell)
+            else None
+        )
+
+    return top_level, manifest
 
 
 def place_and_write(
-    filepath_yaml, root_does=CONFIG["cache_doe_directory"], filepath_gds="top_level.gds"
+    filepath_yaml,
+    root_does=CONFIG["cache_doe_directory"],
+    filepath_gds="top_level.gds",
+    incremental=False,
 ):
-    c = place_from_yaml(filepath_yaml, root_does)
+    """places the DOEs defined in filepath_yaml and writes the mask GDS
+    (OASIS if filepath_gds ends with .oas)
+
+    Args:
+        filepath_yaml:
+        root_does: used for cache, requires content.txt
+        filepath_gds: mask GDS, with a placement manifest saved next to it
+        incremental: reuses the GDS and manifest of a previous run and only
+            re-imports and re-places the DOEs that changed, falling back to a
+            full rebuild when they do not fit in their previous bbox
+    """
+    manifest_path = pathlib.Path(filepath_gds).with_suffix(".placer.json")
+    c = None
+
+    if incremental and manifest_path.exists() and os.path.isfile(filepath_gds):
+        try:
+            c, manifest = _place_from_yaml(
+                filepath_yaml,
+                root_does,
+                previous_gdspath=filepath_gds,
+                previous_manifest=json.loads(manifest_path.read_text()),
+            )
+            _print(f"incremental placement, replaced {manifest['replaced']}")
+        except IncrementalPlacementError as e:
+            _print(f"full placement: {e}")
+
+    if c is None:
+        c, manifest = _place_from_yaml(filepath_yaml, root_does)
+
     _print("writing...")
-    c.write(filepath_gds)
+    write_layout(c, filepath_gds)
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
 
 
 def assemble_subdies_from_yaml(filepath, subdies_directory, mask_directory=None):
@@ -805,7 +984,7 @@ def assemble_subdies(
         mask_directory = subdies_directory
 
     for subdie_name, (x_um, y_um, R) in dict_subdies.items():
-        gdspath = os.path.join(subdies_directory, subdie_name + ".gds")
+        gdspath = find_layout(os.path.join(subdies_directory, subdie_name))
         subdie = load_gds(gdspath).top_cell()
 
         _subdie = import_cell(top_level_layout, subdie)
@@ -815,7 +994,7 @@ def assemble_subdies(
         subdie_instance = pya.CellInstArray(_subdie.cell_index(), t)
         top_level.insert(subdie_instance)
 
-    top_level.write(os.path.join(mask_directory, mask_name + ".gds"))
+    write_layout(top_level, os.path.join(mask_directory, mask_name + get_suffix()))
     return top_level
 
 
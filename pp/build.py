@@ -1,11 +1,36 @@
+""" build devices, DOEs and the build cache
+
+`build_devices` runs the python scripts in devices/:
+
+- mode="subprocess": one `python <script>` process per script
+- mode="pool": warm workers (pp imported, component caches hot) run the scripts
+  with runpy, `isolated=True` gives each script a fresh worker forked from the
+  main process, so scripts do not see each other's cells
+
+Each script returns a BuildResult (ok, error, timeout or skipped).
+With `skip_unchanged=True` the scripts whose content and pp code (sources and
+version) did not change since their last successful build are skipped, unless
+one of their outputs (files written to the gds directory) was removed.
+"""
+import contextlib
+import functools
+import hashlib
+import io
+import json
 from glob import glob
 import itertools
-from subprocess import Popen, PIPE, check_call
+from subprocess import Popen, PIPE, TimeoutExpired, check_call
 import os
+import pathlib
+import runpy
+import signal
 import sys
+import traceback
+from dataclasses import dataclass
 from multiprocessing import Pool
 import multiprocessing
 import shutil
+from typing import Any, Dict, List, Optional
 
 import time
 import re
@@ -14,33 +39,213 @@ from pp.components import component_factory
 from pp.config import CONFIG
 from pp.config import logging
 from pp.doe import load_does
+from pp import profiler
 
 
-def run_python(filename):
-    """ Run a python script and keep track of some context """
-    logging.debug("Running `{}`.".format(filename))
-    command = ["python", filename]
+@dataclass
+class BuildResult:
+    """ outcome of a device script """
 
-    # Run the process
-    t = time.time()
-    process = Popen(command, stdout=PIPE, stderr=PIPE)
-    stdout, _ = process.communicate()
-    total_time = time.time() - t
-    if process.returncode == 0:
-        logging.info("v {} ({:.1f}s)".format(os.path.relpath(filename), total_time))
+    filename: str
+    status: str  # ok, error, timeout or skipped
+    duration: float = 0.0
+    output: str = ""
+    error: str = ""
+    start: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("ok", "skipped")
+
+
+class ScriptTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ScriptTimeout()
+
+
+def _log_result(result: BuildResult) -> None:
+    filename = os.path.relpath(result.filename)
+    if result.ok:
+        logging.info("v {} ({:.1f}s)".format(filename, result.duration))
     else:
         logging.info(
-            "! Error in {} {:.1f}s)".format(os.path.relpath(filename), total_time)
+            "! {} in {} {:.1f}s)".format(
+                result.status.capitalize(), filename, result.duration
+            )
         )
-        # message = "! Error in `{}`".format(basename(filename))
-        # logging.error(message, exc_info=(Exception, stderr.strip(), None))
-    if len(stdout.decode().strip()) > 0:
-        logging.debug("Output of python {}:\n{}".format(filename, stdout.strip()))
-    return filename, process.returncode
+        logging.debug(result.error)
+    if result.output.strip():
+        logging.debug("Output of python {}:\n{}".format(filename, result.output))
+
+
+def run_python(filename: str, timeout: Optional[float] = None) -> BuildResult:
+    """ Run a python script in a new interpreter and keep track of some context """
+    logging.debug("Running `{}`.".format(filename))
+    command = [sys.executable, filename]
+
+    # Run the process
+    t = time.time()
+    with profiler.span("run_python", os.path.relpath(filename)):
+        process = Popen(command, stdout=PIPE, stderr=PIPE)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+            status = "ok" if process.returncode == 0 else "error"
+        except TimeoutExpired:
+            process.kill()
+            stdout, stderr = process.communicate()
+            status = "timeout"
+    result = BuildResult(
+        filename=filename,
+        status=status,
+        duration=time.time() - t,
+        output=stdout.decode(),
+        error=stderr.decode(),
+        start=t,
+    )
+    _log_result(result)
+
+    # run_python runs in a pool worker, the main process merges the events
+    profiler.flush()
+    return result
+
+
+def run_script(filename: str, timeout: Optional[float] = None) -> BuildResult:
+    """ Run a python script in this (warm) process with runpy
+
+    The script runs as `__main__` with its directory in sys.path, like
+    `python <script>`. sys.argv, sys.path and the working directory are restored.
+    The timeout uses SIGALRM (unix, main thread).
+    """
+    logging.debug("Running `{}`.".format(filename))
+    argv, path, cwd = sys.argv, list(sys.path), os.getcwd()
+    sys.argv = [filename]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(filename)))
+    if timeout:
+        handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    status, error = "ok", ""
+    stdout = io.StringIO()
+    t = time.time()
+    try:
+        with profiler.span("run_script", os.path.relpath(filename)):
+            with contextlib.redirect_stdout(stdout):
+                runpy.run_path(filename, run_name="__main__")
+    except ScriptTimeout:
+        status = "timeout"
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status, error = "error", "exit code {}".format(e.code)
+    except Exception:
+        status, error = "error", traceback.format_exc()
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, handler)
+        sys.argv, sys.path[:] = argv, path
+        os.chdir(cwd)
+
+    result = BuildResult(
+        filename=filename,
+        status=status,
+        duration=time.time() - t,
+        output=stdout.getvalue(),
+        error=error,
+        start=t,
+    )
+    _log_result(result)
+    profiler.flush()
+    return result
+
+
+def _init_worker() -> None:
+    """ warms up a pool worker """
+    import pp  # noqa: F401
+
+
+def get_script_digest(filename: str) -> str:
+    """ returns the hash of the script content and pp code (sources and version) """
+    from pp.artifact_store import get_code_hash
+
+    content = pathlib.Path(filename).read_bytes()
+    return hashlib.sha1(content + get_code_hash().encode()).hexdigest()
+
+
+def _get_mtimes() -> Dict[str, float]:
+    """ returns the modification time of the files in the gds directory """
+    dirpath = pathlib.Path(CONFIG["gds_directory"])
+    if not dirpath.is_dir():
+        return {}
+    return {
+        str(p.absolute()): p.stat().st_mtime for p in dirpath.rglob("*") if p.is_file()
+    }
 
 
-def build_devices(regex=".*", overwrite=True):
-    """ Builds all the python files in devices/ """
+def _get_outputs(result: BuildResult, mtimes: Dict[str, float]) -> List[str]:
+    """returns the files written while a script ran
+    (with parallel scripts, also the files of the scripts that ran at the same time)
+    """
+    # one second margin for the file systems with a coarse mtime
+    start, end = result.start - 1, result.start + result.duration + 1
+    return sorted(f for f, mtime in mtimes.items() if start <= mtime <= end)
+
+
+def _is_unchanged(entry: Any, digest: str) -> bool:
+    """ True if a manifest entry has the digest and all its outputs exist """
+    return (
+        isinstance(entry, dict)
+        and entry["digest"] == digest
+        and all(os.path.exists(f) for f in entry["outputs"])
+    )
+
+
+def _get_manifest_path() -> pathlib.Path:
+    return pathlib.Path(CONFIG["build_directory"]) / "build_devices.json"
+
+
+def _load_manifest() -> Dict[str, Any]:
+    filepath = _get_manifest_path()
+    return json.loads(filepath.read_text()) if filepath.exists() else {}
+
+
+def _write_manifest(manifest: Dict[str, Any]) -> None:
+    filepath = _get_manifest_path()
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def build_devices(
+    regex: str = ".*",
+    overwrite: bool = True,
+    mode: str = "subprocess",
+    isolated: bool = False,
+    timeout: Optional[float] = None,
+    skip_unchanged: bool = False,
+    processes: Optional[int] = None,
+    devices_directory: Optional[str] = None,
+) -> List[BuildResult]:
+    """ Builds all the python files in devices/
+
+    Args:
+        regex: only builds the files that match
+        overwrite: builds even if there are already GDS files
+        mode: subprocess (one python process per script) or pool (warm workers)
+        isolated: pool mode, each script runs in a fresh worker
+        timeout: per script (seconds)
+        skip_unchanged: skips the scripts that did not change since their last
+            successful build and whose outputs still exist
+        processes: number of workers (defaults to the number of CPUs)
+        devices_directory: defaults to CONFIG["devices_directory"]
+
+    Returns:
+        list of BuildResult, in file order
+    """
+    if mode not in ("subprocess", "pool"):
+        raise ValueError(f"mode = {mode} not in ('subprocess', 'pool')")
+
     # Avoid accidentally rebuilding devices
     if (
         os.path.isdir(CONFIG["gds_directory"])
@@ -51,38 +256,79 @@ def build_devices(regex=".*", overwrite=True):
         sys.exit(0)
 
     # Collect all the files to run.
+    devices_directory = devices_directory or CONFIG["devices_directory"]
     all_files = [
         os.path.join(dp, f)
-        for dp, dn, filenames in os.walk(CONFIG["devices_directory"])
+        for dp, dn, filenames in os.walk(devices_directory)
         for f in filenames
         if os.path.splitext(f)[1] == ".py"
     ]
     all_files = sorted(all_files)
     all_files = [f for f in all_files if re.search(regex, f)]
 
+    manifest = _load_manifest() if skip_unchanged else {}
+    digests = {f: get_script_digest(f) for f in all_files}
+    results = {
+        f: BuildResult(filename=f, status="skipped")
+        for f in all_files
+        if _is_unchanged(manifest.get(os.path.abspath(f)), digests[f])
+    }
+    files = [f for f in all_files if f not in results]
+    processes = processes or multiprocessing.cpu_count()
+
     # Notify user
     logging.info(
-        "Building splits on {} threads. {} files to run.".format(
-            multiprocessing.cpu_count(), len(all_files)
+        "Building splits on {} {}. {} files to run, {} unchanged.".format(
+            processes,
+            "threads" if mode == "subprocess" else "workers",
+            len(files),
+            len(results),
         )
     )
     logging.info(
         "Debug information at {}".format(
-            os.path.relpath(os.path.join(CONFIG["log_directory"], "debug.log"))
+            os.path.relpath(os.path.join(CONFIG["build_directory"], "log.log"))
         )
     )
 
-    # Now run all the files in batches of $CPU_SIZE.
-    with Pool(processes=multiprocessing.cpu_count()) as pool:
-        for filename, rc in pool.imap_unordered(run_python, all_files):
-            logging.debug("Finished {} {}".format(filename, rc))
+    if mode == "subprocess":
+        run, pool = run_python, Pool(processes=processes)
+    else:
+        run = run_script
+        pool = Pool(
+            processes=processes,
+            initializer=_init_worker,
+            maxtasksperchild=1 if isolated else None,
+        )
+    with pool:
+        for result in pool.imap_unordered(
+            functools.partial(run, timeout=timeout), files
+        ):
+            logging.debug("Finished {} {}".format(result.filename, result.status))
+            results[result.filename] = result
+
+    if files:
+        manifest = _load_manifest()
+        mtimes = _get_mtimes()
+        for f in files:
+            if results[f].ok:
+                manifest[os.path.abspath(f)] = dict(
+                    digest=digests[f], outputs=_get_outputs(results[f], mtimes)
+                )
+            else:
+                manifest.pop(os.path.abspath(f), None)
+        _write_manifest(manifest)
 
     # Report on what we did.
+    failed = [r for r in results.values() if not r.ok]
     devices = glob(os.path.join(CONFIG["gds_directory"], "*.gds"))
     countmsg = "There are now {} GDS files in {}.".format(
         len(devices), os.path.relpath(CONFIG["gds_directory"])
     )
-    logging.info("Finished building devices. {}".format(countmsg))
+    logging.info(
+        "Finished building devices, {} failed. {}".format(len(failed), countmsg)
+    )
+    return [results[f] for f in all_files]
 
 
 def build_clean():
@@ -94,7 +340,10 @@ def build_clean():
 
 
 def build_cache_pull():
-    """ Pull devices from the cache """
+    """ Pull devices from the cache (mirrors the whole build directory)
+
+    generate_does with `tech.artifact_store` only fetches the DOEs it needs
+    """
     if CONFIG.get("cache_url"):
         logging.info("Loading devices from cache...")
         check_call(
@@ -109,7 +358,10 @@ def build_cache_pull():
 
 
 def build_cache_push():
-    """ Push devices to the cache """
+    """ Push devices to the cache (mirrors the whole build directory)
+
+    generate_does with `tech.artifact_store` stores each DOE it builds
+    """
     if not os.listdir(CONFIG["build_directory"]):
         logging.info("Nothing to push")
         return
@@ -127,13 +379,12 @@ def build_cache_push():
         )
 
 
-def _build_doe(doe_name, config, component_factory=component_factory):
+def _build_doe(doe_name, doe, component_factory=component_factory):
     from pp.write_doe import write_doe
 
-    doe = config["does"][doe_name]
     component_type = doe.get("component")
     component_function = component_factory[component_type]
-    write_doe(
+    return write_doe(
         component_type=component_function,
         doe_name=doe_name,
         do_permutations=doe.get("do_permutations", True),
@@ -158,20 +409,76 @@ def build_does(filepath, component_factory=component_factory):
     - json metadata
     - ports CSV
     - markdown report, with DOE settings
+
+    Returns:
+        dict of doe_name: write_doe result
     """
 
     does = load_does(filepath)
-    doe_names = does.keys()
+    doe_names = list(does.keys())
 
     doe_params = zip(
-        doe_names, itertools.repeat(filepath), itertools.repeat(component_factory)
+        doe_names,
+        [does[name] for name in doe_names],
+        itertools.repeat(component_factory),
     )
-    p = multiprocessing.Pool(multiprocessing.cpu_count())
-    p.starmap(_build_doe, doe_params)
-
-    # for doe_name in doe_names:
-    #     p = multiprocessing.Process(target=_build_doe, args=(doe_name, config, component_factory=component_factory))
-    #     p.start()
+    with multiprocessing.Pool(multiprocessing.cpu_count()) as p:
+        results = p.starmap(_build_doe, doe_params)
+    return dict(zip(doe_names, results))
+
+
+def test_build_devices(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, "build_directory", tmp_path / "build")
+    monkeypatch.setitem(CONFIG, "gds_directory", tmp_path / "build" / "devices")
+    devices = tmp_path / "devices"
+    devices.mkdir()
+    (devices / "ok.py").write_text("if __name__ == '__main__':\n    print('built')\n")
+    (devices / "error.py").write_text("raise ValueError('bad device')\n")
+    (devices / "slow.py").write_text("import time\ntime.sleep(5)\n")
+
+    for mode in ("subprocess", "pool"):
+        results = build_devices(
+            mode=mode, timeout=1, processes=2, devices_directory=devices
+        )
+        status = {os.path.basename(r.filename): r.status for r in results}
+        assert status == {"error.py": "error", "ok.py": "ok", "slow.py": "timeout"}
+        assert "bad device" in results[0].error
+        assert "built" in results[1].output
+
+    results = build_devices(
+        mode="pool",
+        isolated=True,
+        skip_unchanged=True,
+        processes=2,
+        regex="ok|error",
+        devices_directory=devices,
+    )
+    assert [r.status for r in results] == ["error", "skipped"]
+
+    # a script whose output was removed is built again
+    gds = tmp_path / "build" / "devices" / "device.gds"
+    (devices / "device.py").write_text(
+        f"import pathlib\ngds = pathlib.Path({str(gds)!r})\n"
+        "gds.parent.mkdir(parents=True, exist_ok=True)\n"
+        "gds.write_text('gds')\n"
+    )
+    for status in ("ok", "skipped"):
+        results = build_devices(
+            mode="pool",
+            skip_unchanged=True,
+            regex=r"/device\.py",
+            devices_directory=devices,
+        )
+        assert [r.status for r in results] == [status]
+    gds.unlink()
+    results = build_devices(
+        mode="pool",
+        skip_unchanged=True,
+        regex=r"/device\.py",
+        devices_directory=devices,
+    )
+    assert [r.status for r in results] == ["ok"]
+    assert gds.exists()
 
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ import hashlib
 import sys
 import json
 import numpy as np
+import gdspy
 
 
 def _print(*args, **kwargs):
@@ -125,6 +126,10 @@ def hash_cells(cell, dict_hashes={}, precision=1e-4, dbg_indent=0, dbg=False):
         )
         cell_hash = dict_hashes[_cell.name]
         tr_str = "x{}y{}R{}H{}".format(*get_transform(cell_ref, precision))
+        if isinstance(cell_ref, gdspy.CellArray):
+            tr_str += "C{}R{}S{}_{}".format(
+                cell_ref.columns, cell_ref.rows, *np.round(cell_ref.spacing, 6)
+            )
 
         cell_ref_uid = cell_hash + "_" + tr_str
         cell_ref_uids += [cell_ref_uid]
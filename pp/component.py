@@ -1,4 +1,5 @@
 import itertools
+import json
 import uuid
 import copy as python_copy
 import pathlib
@@ -9,13 +10,15 @@ from omegaconf import OmegaConf
 import networkx as nx
 
 from phidl.device_layout import Label
+from phidl.device_layout import CellArray
 from phidl.device_layout import Device
 from phidl.device_layout import DeviceReference
 from phidl.device_layout import _parse_layer
 
-from pp.port import Port, select_ports
+from pp.port import Port, PortDict, PortIndex, select_ports
 from pp.config import CONFIG, conf, connections
 from pp.compare_cells import hash_cells
+from pp import profiler
 
 
 def copy(D):
@@ -23,13 +26,25 @@ def copy(D):
     D_copy = Component(name=D._internal_name)
     D_copy.info = python_copy.deepcopy(D.info)
     for ref in D.references:
-        new_ref = ComponentReference(
-            ref.parent,
-            origin=ref.origin,
-            rotation=ref.rotation,
-            magnification=ref.magnification,
-            x_reflection=ref.x_reflection,
-        )
+        if isinstance(ref, CellArray):
+            new_ref = ComponentArray(
+                ref.parent,
+                columns=ref.columns,
+                rows=ref.rows,
+                spacing=ref.spacing,
+                origin=ref.origin,
+                rotation=ref.rotation,
+                magnification=ref.magnification,
+                x_reflection=ref.x_reflection,
+            )
+        else:
+            new_ref = ComponentReference(
+                ref.parent,
+                origin=ref.origin,
+                rotation=ref.rotation,
+                magnification=ref.magnification,
+                x_reflection=ref.x_reflection,
+            )
         new_ref.owner = D_copy
         D_copy.add(new_ref)
         for alias_name, alias_ref in D.aliases.items():
@@ -238,6 +253,12 @@ class ComponentReference(DeviceReference):
             print("R", self.parent.name, len(labels))
         return labels
 
+    def get_port_index(self) -> PortIndex:
+        """returns the index of the ports (rebuilt every time,
+        as the ports of a reference are recomputed on every access)
+        """
+        return PortIndex(self.ports)
+
     @property
     def ports(self) -> Dict[str, Port]:
         """This property allows you to access myref.ports, and receive a copy
@@ -507,6 +528,122 @@ class ComponentReference(DeviceReference):
         return self.ref_cell.get_property(property)
 
 
+class ComponentArray(CellArray):
+    """GDS array reference (AREF) of columns x rows copies of a component
+
+    ports are named `{port_name}_{row}_{col}`
+    bbox is computed from the component bbox (no flattening)
+    """
+
+    def __init__(
+        self,
+        component,
+        columns: int = 2,
+        rows: int = 2,
+        spacing: Tuple[float, float] = (100, 100),
+        origin: Tuple[float, float] = (0, 0),
+        rotation: int = 0,
+        magnification: None = None,
+        x_reflection: bool = False,
+    ) -> None:
+        super().__init__(
+            device=component,
+            columns=int(round(columns)),
+            rows=int(round(rows)),
+            spacing=spacing,
+            origin=origin,
+            rotation=rotation,
+            magnification=magnification,
+            x_reflection=x_reflection,
+        )
+
+    def __repr__(self):
+        return (
+            f'ComponentArray (parent Component "{self.parent.name}", {self.columns}'
+            f" columns, {self.rows} rows, spacing {self.spacing}, origin"
+            f" {self.origin}, rotation {self.rotation}, x_reflection"
+            f" {self.x_reflection})"
+        )
+
+    def _transform_port(
+        self,
+        point: ndarray,
+        orientation: Union[float64, int64],
+        origin: Union[Tuple[int, int], ndarray] = (0, 0),
+        rotation: Optional[Union[float64, int, int64]] = None,
+        x_reflection: bool = False,
+    ) -> Tuple[ndarray, float64]:
+        """transforms a port of the array frame (element offset included)
+        to the owner frame
+        """
+        return ComponentReference._transform_port(
+            self, point, orientation, origin, rotation, x_reflection
+        )
+
+    def get_offsets(self) -> ndarray:
+        """ returns the (x, y) offsets of the elements, row by row """
+        cols, rows = np.meshgrid(np.arange(self.columns), np.arange(self.rows))
+        return np.stack(
+            [cols.ravel() * self.spacing[0], rows.ravel() * self.spacing[1]], axis=1
+        )
+
+    def _transform(self, points: ndarray) -> ndarray:
+        """ transforms points from the array frame to the owner frame """
+        points = np.array(points, dtype=float)
+        if self.x_reflection:
+            points[:, 1] = -points[:, 1]
+        if self.rotation:
+            points = _rotate_points(points, angle=self.rotation, center=[0, 0])
+        return points + np.array(self.origin)
+
+    @property
+    def bbox(self):
+        """ bbox of the array from the bbox of one element """
+        if self.rotation and self.rotation % 90:
+            return super().bbox
+
+        (xmin, ymin), (xmax, ymax) = np.array(self.parent.bbox) * (
+            self.magnification or 1
+        )
+        dx = (self.columns - 1) * self.spacing[0]
+        dy = (self.rows - 1) * self.spacing[1]
+        xs = [xmin, xmax, xmin + dx, xmax + dx]
+        ys = [ymin, ymax, ymin + dy, ymax + dy]
+        corners = self._transform([(min(xs), min(ys)), (max(xs), max(ys))])
+        return np.array([corners.min(axis=0), corners.max(axis=0)])
+
+    @property
+    def ports(self) -> Dict[str, Port]:
+        """ports of all the elements, correctly placed"""
+        ports = {}
+        mag = self.magnification or 1
+        orientation_sign = -1 if self.x_reflection else 1
+        for name, port in self.parent.ports.items():
+            orientation = mod(
+                orientation_sign * port.orientation + (self.rotation or 0), 360
+            )
+            for row in range(self.rows):
+                for col in range(self.columns):
+                    midpoint = np.array(port.midpoint) * mag + (
+                        col * self.spacing[0],
+                        row * self.spacing[1],
+                    )
+                    new_port = port._copy(new_uid=True)
+                    new_port.midpoint = self._transform([midpoint])[0]
+                    new_port.orientation = orientation
+                    new_port.parent = self
+                    ports[f"{name}_{row}_{col}"] = new_port
+        return ports
+
+    @property
+    def info(self) -> Dict[str, Union[float64, float]]:
+        return self.parent.info
+
+    @property
+    def size_info(self) -> SizeInfo:
+        return SizeInfo(self.bbox)
+
+
 class Component(Device):
     """adds some functions to phidl.Device
 
@@ -547,6 +684,22 @@ class Component(Device):
         self.name_long = None
         self.function_name = None
 
+    @property
+    def ports(self) -> Dict[str, Port]:
+        return self.__dict__["ports"]
+
+    @ports.setter
+    def ports(self, ports: Dict[str, Port]) -> None:
+        if not isinstance(ports, PortDict):
+            ports = PortDict(ports)
+        self.__dict__["ports"] = ports
+
+    def get_port_index(self) -> PortIndex:
+        """returns the index of the ports
+        (kept until a port is added, removed or changed)
+        """
+        return self.ports.get_index()
+
     def plot_netlist(
         self, label_index_end=1, with_labels=True, font_weight="normal",
     ):
@@ -636,13 +789,11 @@ class Component(Device):
 
     def get_ports_dict(self, port_type="optical", prefix=None):
         """ returns a list of ports """
-        return select_ports(self.ports, port_type=port_type, prefix=prefix)
+        return select_ports(self, port_type=port_type, prefix=prefix)
 
     def get_ports_list(self, port_type="optical", prefix=None) -> List[Port]:
         """ returns a lit of  ports """
-        return list(
-            select_ports(self.ports, port_type=port_type, prefix=prefix).values()
-        )
+        return list(select_ports(self, port_type=port_type, prefix=prefix).values())
 
     def get_ports_array(self) -> Dict[str, ndarray]:
         """ returns ports as a dict of np arrays"""
@@ -662,6 +813,40 @@ class Component(Device):
         }
         return ports_array
 
+    def get_ports(self, depth: Optional[int] = None) -> List[Port]:
+        """returns copies of all the ports of the component and its references
+        in their top-level position (one copy per element for the arrays)
+        the copies keep the uid of the original ports
+
+        Args:
+            depth: number of reference levels to get the ports from (None: all)
+        """
+        port_list = [p._copy(new_uid=False) for p in self.ports.values()]
+        if depth is not None and depth <= 0:
+            return port_list
+
+        new_depth = None if depth is None else depth - 1
+        for r in self.references:
+            ref_ports = r.parent.get_ports(depth=new_depth)
+            if isinstance(r, ComponentArray):
+                offsets = r.get_offsets()
+            else:
+                offsets = np.zeros((1, 2))
+            for rp in ref_ports:
+                for offset in offsets:
+                    new_port = rp._copy(new_uid=False)
+                    midpoint, orientation = r._transform_port(
+                        np.array(rp.midpoint) + offset,
+                        rp.orientation,
+                        r.origin,
+                        r.rotation,
+                        r.x_reflection,
+                    )
+                    new_port.midpoint = midpoint
+                    new_port.orientation = orientation
+                    port_list.append(new_port)
+        return port_list
+
     def get_properties(self):
         """ returns name, uid, ports, aliases and numer of references """
         return (
@@ -733,20 +918,10 @@ class Component(Device):
     def get_settings(self) -> Dict[str, Any]:
         """Returns settings dictionary"""
         output = {}
-        ignore = set(
-            dir(Component())
-            + [
-                "path",
-                "settings",
-                "properties",
-                "function_name",
-                "type",
-                "netlist",
-                "pins",
-                "settings_changed",
-            ]
-        )
-        params = set(dir(self)) - ignore
+        if type(self) is Component:
+            params = self.__dict__.keys() - _get_settings_ignore()
+        else:
+            params = set(dir(self)) - _get_settings_ignore()
         output["name"] = self.name
 
         if hasattr(self, "function_name") and self.function_name:
@@ -824,11 +999,42 @@ class Component(Device):
         for port in self.ports.values():
             port.snap_to_grid(nm=nm)
 
+    def snap_to_grid(self, nm=1):
+        """snaps polygons, ports and references of all unique cells to a nm grid
+        returns off-grid statistics"""
+        from pp.drc.snap_component_to_grid import snap_component_to_grid
+
+        return snap_component_to_grid(self, nm=nm)
+
     def get_json(self, **kwargs) -> Dict[str, Any]:
         """ returns JSON metadata """
+        return self._get_json(cells=recurse_structures(self), **kwargs)
+
+    def write_json(self, filepath, **kwargs) -> str:
+        """writes JSON metadata (same as get_json)
+        streams the cells one per line, numpy values are converted
+        """
+        jsondata = self._get_json(cells=None, **kwargs)
+        encode = _JSON_ENCODER.encode
+        with open(filepath, "w") as f:
+            f.write("{\n")
+            for i, (key, value) in enumerate(jsondata.items()):
+                f.write(",\n" if i else "")
+                if key == "cells" and value is None:
+                    f.write('"cells": {')
+                    for j, (name, settings) in enumerate(_iter_structures(self, set())):
+                        f.write(",\n" if j else "\n")
+                        f.write(f"{encode(name)}: {encode(settings)}")
+                    f.write("\n}")
+                else:
+                    f.write(f"{encode(key)}: {encode(value)}")
+            f.write("\n}\n")
+        return str(filepath)
+
+    def _get_json(self, cells, **kwargs) -> Dict[str, Any]:
         jsondata = {
             "json_version": 7,
-            "cells": recurse_structures(self),
+            "cells": cells,
             "test_protocol": self.test_protocol,
             "data_analysis_protocol": self.data_analysis_protocol,
             "git_hash": conf["git_hash"],
@@ -847,7 +1053,8 @@ class Component(Device):
     def hash_geometry(self):
         """returns geometrical hash"""
         if self.references or self.polygons:
-            h = hash_cells(self, {})[self.name]
+            with profiler.span("hash", self.function_name or "Component"):
+                h = hash_cells(self, {})[self.name]
         else:
             h = "empty_geometry"
 
@@ -919,6 +1126,36 @@ class Component(Device):
             self.aliases[alias] = d
         return d
 
+    def add_array(
+        self,
+        component,
+        columns: int = 2,
+        rows: int = 2,
+        spacing: Tuple[float, float] = (100, 100),
+        alias: Optional[str] = None,
+    ) -> ComponentArray:
+        """Adds a GDS array reference (AREF) of columns x rows copies of a component
+
+        Args:
+            component: to repeat
+            columns: number of columns
+            rows: number of rows
+            spacing: (x, y) pitch between columns and rows
+            alias: optional alias for the array
+
+        """
+        if not isinstance(component, Device):
+            raise TypeError(
+                f"[PP] add_array() was passed a {type(component)}. This is not a"
+                " Component object."
+            )
+        a = ComponentArray(component, columns=columns, rows=rows, spacing=spacing)
+        a.owner = self
+        self.add(a)
+        if alias is not None:
+            self.aliases[alias] = a
+        return a
+
     def get_layers(self):
         """returns a set of (layer, datatype)
 
@@ -955,6 +1192,29 @@ def test_get_layers():
     assert c.get_layers() == {(1, 0)}
 
 
+def test_add_array():
+    import pp
+
+    c = pp.Component()
+    pad = pp.c.pad(width=10, height=20)
+    a = c.add_array(pad, columns=3, rows=2, spacing=(50, 100))
+    a.rotate(90)
+    a.move((1, 2))
+    assert np.allclose(a.bbox, a.get_bounding_box())
+    assert np.allclose(c.bbox, a.get_bounding_box())
+    assert len(a.ports) == 4 * 6
+    assert np.allclose(a.ports["E_1_2"].midpoint, (1 - 100, 2 + 5 + 100))
+    assert a.ports["E_1_2"].orientation == 90
+    assert len(c.get_polygons()) == 6
+    assert len(c.copy().get_polygons()) == 6
+
+    ports = c.get_ports()
+    assert len(ports) == 4 * 6
+    midpoints = {tuple(np.round(p.midpoint, 6)) for p in ports}
+    assert midpoints == {tuple(np.round(p.midpoint, 6)) for p in a.ports.values()}
+    assert len(pp.c.pad_array(n=4).get_ports()) == 4 + 4 * 4  # own ports + pads
+
+
 def _filter_polys(polygons, layers_excl):
     return [
         p
@@ -963,34 +1223,81 @@ def _filter_polys(polygons, layers_excl):
     ]
 
 
+_SETTINGS_IGNORE = None
 IGNORE_FUNCTION_NAMES = set()
 IGNORE_STRUCTURE_NAME_PREFIXES = set(["zz_conn"])
 
 
-def recurse_structures(structure: Component) -> Dict[str, Any]:
-    """ Recurse over structures """
+def _get_settings_ignore() -> set:
+    """returns the attributes that are not settings (computed once)"""
+    global _SETTINGS_IGNORE
+    if _SETTINGS_IGNORE is None:
+        _SETTINGS_IGNORE = frozenset(
+            dir(Component())
+            + [
+                "path",
+                "settings",
+                "properties",
+                "function_name",
+                "type",
+                "netlist",
+                "pins",
+                "settings_changed",
+            ]
+        )
+    return _SETTINGS_IGNORE
+
+
+def _json_default(value: Any) -> Any:
+    """ converts the values that the json module does not know """
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, pathlib.PurePath):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_JSON_ENCODER = json.JSONEncoder(default=_json_default)
+
+
+def _iter_structures(structure: Component, visited: set):
+    """ yields (name, settings) for a structure and its references (depth first) """
     if (
         hasattr(structure, "function_name")
         and structure.function_name in IGNORE_FUNCTION_NAMES
     ):
-        return {}
+        return
 
     if hasattr(structure, "name") and any(
         [structure.name.startswith(i) for i in IGNORE_STRUCTURE_NAME_PREFIXES]
     ):
-        return {}
+        return
     if not hasattr(structure, "get_json"):
-        return {}
+        return
+
+    if structure.name not in visited:
+        visited.add(structure.name)
+        yield structure.name, structure.get_settings()
 
-    output = {structure.name: structure.get_settings()}
     for element in structure.references:
         if (
             isinstance(element, ComponentReference)
-            and element.ref_cell.name not in output
+            and element.ref_cell.name not in visited
         ):
-            output.update(recurse_structures(element.ref_cell))
+            yield from _iter_structures(element.ref_cell, visited)
 
-    return output
+
+def recurse_structures(structure: Component) -> Dict[str, Any]:
+    """ Recurse over structures """
+    return dict(_iter_structures(structure, set()))
 
 
 def clean_dict(d):
@@ -1028,6 +1335,38 @@ def _clean_value(value: Any) -> Any:
     return value
 
 
+def test_get_settings_updates():
+    c = Component(name="settings_updates", length=3, layers=[[1, 0]])
+    c.info = {"a": np.float64(1.5)}
+    assert c.get_settings()["length"] == 3
+    c.settings["length"] = 4
+    assert c.get_settings()["length"] == 4
+    c.settings["layers"].append([2, 0])
+    assert c.get_settings()["layers"] == [[1, 0], [2, 0]]
+    c.update_settings(width=np.int64(2))
+    assert c.get_settings()["width"] == 2
+
+
+def test_json_default():
+    import pytest
+
+    encode = _JSON_ENCODER.encode
+    assert (
+        encode({"a": np.arange(2), "p": pathlib.Path("a")}) == '{"a": [0, 1], "p": "a"}'
+    )
+    with pytest.raises(TypeError):
+        encode({"a": object()})
+
+
+def test_write_json(tmp_path):
+    import pp
+
+    c = pp.c.mzi()
+    filepath = c.write_json(tmp_path / "mzi.json", doe="mzi", size=np.arange(2))
+    expected = json.loads(json.dumps(c.get_json(doe="mzi", size=[0, 1])))
+    assert json.loads(pathlib.Path(filepath).read_text()) == expected
+
+
 def test_same_uid():
     import pp
 
@@ -4,6 +4,7 @@ import numpy as np
 import pp
 from pp.layers import LAYER
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 from typing import List, Tuple, Union
 
 
@@ -141,7 +142,7 @@ def bend_circular(
     xpts = inner_points_x + outer_points_x[::-1]
     ypts = inner_points_y + outer_points_y[::-1]
 
-    for layer_cladding in layers_cladding:
+    for layer_cladding in inline_cladding(layers_cladding):
         component.add_polygon(points=(xpts, ypts), layer=layer_cladding)
 
     midpoint1 = (radius * cos(angle1), radius * sin(angle1))
@@ -3,6 +3,7 @@ import numpy as np
 import pp
 from pp.components.bezier import bezier
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 from typing import List, Tuple
 
 
@@ -52,7 +53,7 @@ def bend_s(
         [c.xmax, c.ymax + y],
         [c.xmin, c.ymax + y],
     ]
-    for layer in layers_cladding:
+    for layer in inline_cladding(layers_cladding):
         c.add_polygon(points, layer=layer)
 
     # c.ports["W0"] = c.ports.pop("0")
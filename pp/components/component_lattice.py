@@ -1,4 +1,8 @@
+import hashlib
 import itertools
+
+import numpy as np
+
 import pp
 from pp.components.coupler import coupler
 from pp.components.crossing_waveguide import crossing45
@@ -14,26 +18,14 @@ def gen_tmp_port_name():
     return "{}".format(next(COUNTER))
 
 
-def swap(waveguides, i, j):
-    a = waveguides[i]
-    waveguides[i] = waveguides[j]
-    waveguides[j] = a
-    return waveguides
-
-
-def dist(i, wgs1, wgs2):
-    a = wgs1.index(i)
-    b = wgs2.index(i)
-    return b - a
-
-
 def get_sequence_cross(
-    waveguides_start, waveguides_end, iter_max=100, symbols=["X", "-"]
+    waveguides_start, waveguides_end, iter_max=None, symbols=["X", "-"]
 ):
     """
     Args:
         waveguides_start : list of the input port indices
         waveguides_end : list of the output port indices
+        iter_max: maximum number of rounds (defaults to the number of waveguides)
         symbols : [`X` , `S`]
         symbols to be used in the returned sequence:
         `X`: represents the crossing symbol: two Xs next
@@ -42,61 +34,38 @@ def get_sequence_cross(
 
     Returns:
         sequence of crossings to achieve the permutations between two columns of I/O
+
+    The crossings are an odd-even transposition sorting network:
+    even then odd neighbours are swapped when they are in the wrong order,
+    which sorts N waveguides in at most N columns (columns without swaps are skipped)
     """
-    wgs = list(waveguides_start)
-    waveguides_end = list(waveguides_end)
-    N = len(wgs)
-    sequence = []
     X, S = symbols  # Cross, Straight symbols
-    nb_iters = 0
-    while wgs != waveguides_end:
-        if nb_iters > iter_max:
+    end_index = {wg: i for i, wg in enumerate(waveguides_end)}
+    positions = np.array([end_index[wg] for wg in waveguides_start], dtype=int)
+    N = len(positions)
+    iter_max = N if iter_max is None else iter_max
+    sequence = []
+
+    for nb_iters in itertools.count():
+        if (positions[:-1] < positions[1:]).all():
+            break
+        if nb_iters >= iter_max:
             print(
                 "Exceeded max number of iterations. The following I/O are mismatched:"
             )
-            for i in range(len(waveguides_end)):
-                print(wgs[i], "<->", waveguides_end[i])
-            return sequence
-
-        if nb_iters > 2 and sequence[-1] == sequence[-2]:
-            print("Two consecutive sequences are the same. Got stuck")
-            return sequence
-
-        swaps = []
-        i = 0
-        total_dist = 0
-        while i < N - 1:
-            a = wgs[i]
-            b = wgs[i + 1]
-            d1 = dist(a, wgs, waveguides_end)
-            d2 = dist(b, wgs, waveguides_end)
-            total_dist += abs(d1) + abs(d2)
-
-            """
-            # The equality cases are very important:
-            # if one waveguide needs to cross, then even if the other one is
-            # already at the right place, it must swap to allow the other one
-            # to cross
-            """
-
-            if d1 >= 0 and d2 <= 0 and not (d1 == 0 and d2 == 0):
-                wgs = swap(wgs, i, i + 1)
-                swaps += [X, X]
-                i += 1
-                # We cannot swap twice the same waveguide on the same iteration, so we skip the next waveguide by incrementing
-
-                # Edge case: Cannot swap if only one wg left so it has to be a straight
-                if i == N - 2:
-                    swaps += [S]
-            else:
-                # Edge case if only one wg remain it is straight
-                swaps += [S]
-                if i == N - 2:
-                    swaps += [S]
-            i += 1
-
-        sequence.append(swaps)
-        nb_iters += 1
+            for wg, wg_end in zip(positions, waveguides_end):
+                print(waveguides_end[wg], "<->", wg_end)
+            break
+
+        i = np.arange(nb_iters % 2, N - 1, 2)
+        i = i[positions[i] > positions[i + 1]]
+        if len(i) == 0:
+            continue
+        positions[i], positions[i + 1] = positions[i + 1], positions[i].copy()
+        column = [S] * N
+        for j in i:
+            column[j] = column[j + 1] = X
+        sequence.append(column)
     return sequence
 
 
@@ -120,7 +89,7 @@ def component_sequence_to_str(sequence):
     return component_txt_lattice
 
 
-def get_sequence_cross_str(waveguides_start, waveguides_end, iter_max=100):
+def get_sequence_cross_str(waveguides_start, waveguides_end, iter_max=None):
     seq = get_sequence_cross(
         waveguides_start, waveguides_end, iter_max=iter_max, symbols=["X", "-"]
     )
@@ -128,6 +97,57 @@ def get_sequence_cross_str(waveguides_start, waveguides_end, iter_max=100):
     return component_sequence_to_str(seq)
 
 
+def _column(col, components, components_to_nb_input_ports, a, name):
+    """returns the cell of one lattice column and its W and E ports
+    (kept out of the cell so that its references do not copy them)
+    """
+    key = "".join(col) + "".join(sorted(c.name for c in components.values()))
+    column = pp.Component(f"{name}_column_{hashlib.md5(key.encode()).hexdigest()[:8]}")
+
+    j = 0
+    skip = 0  # number of lines to skip depending on the number of ports
+    placements = []  # (symbol, y, nb of ports to skip)
+    for c in col:
+        y = -j * a
+        if skip == 1:
+            j += skip
+            skip = 0
+            continue
+
+        if c in components.keys():
+            # Compute the number of ports to skip: They will already be
+            # connected since they belong to this component
+
+            nb_inputs = components_to_nb_input_ports[c]
+            skip = nb_inputs - 1
+            placements.append((c, y, skip))
+        else:
+            raise ValueError(
+                "component symbol {} is not part of                 components"
+                " dictionnary".format(c)
+            )
+
+        j += 1
+
+    ports = []
+    # consecutive copies of the same component in a column are one array
+    for c, run in itertools.groupby(placements, key=lambda p: p[0]):
+        run = list(run)
+        _, y, skip = run[0]
+        _ref = components[c].ref((0, y), port_id="W{}".format(skip))
+        if len(run) > 1:
+            _cmp = column.add_array(
+                components[c], columns=1, rows=len(run), spacing=(0, run[1][1] - y),
+            )
+            _cmp.origin = _ref.origin
+        else:
+            _cmp = _ref
+            column.add(_cmp)
+
+        ports += get_ports_facing(_cmp.ports, "W") + get_ports_facing(_cmp.ports, "E")
+    return column, ports
+
+
 def component_lattice(
     lattice="""
         C-X
@@ -204,45 +224,26 @@ def component_lattice(
         components_to_nb_input_ports[c] = len(get_ports_facing(components[c], "W"))
 
     component = pp.Component(name)
+    column_cells = {}  # identical columns are one cell
     x = 0
     for i in keys:
         col = columns[i]
-        j = 0
         L = columns_to_length[i]
-        skip = 0  # number of lines to skip depending on the number of ports
-        for c in col:
-            y = -j * a
-            if skip == 1:
-                j += skip
-                skip = 0
-                continue
-
-            if c in components.keys():
-                # Compute the number of ports to skip: They will already be
-                # connected since they belong to this component
-
-                nb_inputs = components_to_nb_input_ports[c]
-                skip = nb_inputs - 1
-                _cmp = components[c].ref((x, y), port_id="W{}".format(skip))
-                component.add(_cmp)
-
-                if i == 0:
-                    _ports = get_ports_facing(_cmp, "W")
-                    for _p in _ports:
-                        component.add_port(gen_tmp_port_name(), port=_p)
-
-                if i == keys[-1]:
-                    _ports = get_ports_facing(_cmp, "E")
-                    for _p in _ports:
-                        component.add_port(gen_tmp_port_name(), port=_p)
-
-            else:
-                raise ValueError(
-                    "component symbol {} is not part of                 components"
-                    " dictionnary".format(c)
-                )
 
-            j += 1
+        if tuple(col) not in column_cells:
+            column_cells[tuple(col)] = _column(
+                col, components, components_to_nb_input_ports, a, name
+            )
+        column, column_ports = column_cells[tuple(col)]
+        component.add_ref(column).movex(x)
+
+        for direction, add in (("W", i == 0), ("E", i == keys[-1])):
+            if add:
+                for _p in get_ports_facing(column_ports, direction):
+                    _p = _p._copy()
+                    _p.midpoint = _p.midpoint + np.array([x, 0])
+                    component.add_port(gen_tmp_port_name(), port=_p)
+
         x += L
 
     component = pp.port.rename_ports_by_orientation(component)
@@ -262,7 +263,7 @@ def parse_lattice(lattice, components):
                     columns[i] = []
 
                 columns[i].append(c)
-                if c in components.keys():
+                if i not in columns_to_length and c in components.keys():
                     cmp = components[c]
                     columns_to_length[i] = cmp.ports["E0"].x - cmp.ports["W0"].x
 
@@ -271,6 +272,31 @@ def parse_lattice(lattice, components):
     return columns, columns_to_length
 
 
+def test_get_sequence_cross():
+    rng = np.random.RandomState(0)
+    n = 64
+    waveguides_end = list(rng.permutation(n))
+    sequence = get_sequence_cross(list(range(n)), waveguides_end)
+    assert len(sequence) <= n
+
+    wgs = list(range(n))
+    for col in sequence:
+        j = 0
+        while j < n:
+            if col[j] == "X":
+                assert col[j + 1] == "X"
+                wgs[j], wgs[j + 1] = wgs[j + 1], wgs[j]
+                j += 1
+            j += 1
+    assert wgs == waveguides_end
+
+    lattice = get_sequence_cross_str(list(range(8)), list(range(8))[::-1])
+    c = component_lattice(lattice=lattice)
+    assert len(c.ports) == 16
+    assert len(c.references) == 8
+    assert len(c.get_dependencies()) == 2  # the odd and even columns
+
+
 if __name__ == "__main__":
     components = {
         "C": package_optical2x2(component=pp.c.coupler, port_spacing=40.0),
@@ -1,6 +1,7 @@
 from typing import List, Tuple
 import pp
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 
 
 @pp.autoname
@@ -46,7 +47,7 @@ def coupler_straight(
 
     # cladding
     ymax = 2 * width + gap + cladding_offset
-    for layer_cladding in layers_cladding:
+    for layer_cladding in inline_cladding(layers_cladding):
         c.add_polygon(
             [
                 (0, -cladding_offset),
@@ -46,7 +46,7 @@ def pad_array(
     height: float = 100.0,
     layer: Tuple[int, int] = LAYER.M3,
 ) -> Component:
-    """array of rectangular pads
+    """array of rectangular pads (one GDS array reference)
 
     Args:
         pad: pad element
@@ -69,12 +69,13 @@ def pad_array(
     c = Component()
     pad = pad(width=width, height=height, layer=layer) if callable(pad) else pad
 
+    pads = c.add_array(pad, columns=n, rows=1, spacing=(spacing[0], 0))
+    pads.x = (n - 1) * spacing[0] / 2
+    ports = pads.ports
     for i in range(n):
-        p = c << pad
-        p.x = i * spacing[0]
         for port_name in port_list:
             port_name_new = "{}{}".format(port_name, i)
-            c.add_port(port=p.ports[port_name], name=port_name_new)
+            c.add_port(port=ports[f"{port_name}_0_{i}"], name=port_name_new)
 
     return c
 
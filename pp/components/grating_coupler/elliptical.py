@@ -2,7 +2,7 @@ from typing import Tuple, Union
 from numpy import float64, ndarray
 import numpy as np
 import pp
-from pp.geo_utils import extrude_path
+from pp.geo_utils import extrude_paths
 from pp.geo_utils import DEG2RAD
 from pp.layers import LAYER
 from pp.component import Component
@@ -22,6 +22,24 @@ def ellipse_arc(
     return np.column_stack([xs, ys])
 
 
+def ellipse_arcs(
+    a: ndarray,
+    b: ndarray,
+    x0: ndarray,
+    theta_min: float,
+    theta_max: float,
+    angle_step: float = 0.5,
+) -> ndarray:
+    """returns the (n_arcs, n_points, 2) points of ellipse arcs
+    with the same angles and different a, b and x0
+    """
+    theta = np.arange(theta_min, theta_max + angle_step, angle_step) * DEG2RAD
+    a, b, x0 = [np.reshape(np.asarray(v, dtype=float), (-1, 1)) for v in (a, b, x0)]
+    xs = a * np.cos(theta) + x0
+    ys = b * np.sin(theta)
+    return np.stack([xs, ys], axis=-1)
+
+
 def grating_tooth_points(
     ap: float64,
     bp: float64,
@@ -31,15 +49,32 @@ def grating_tooth_points(
     spiked: bool = True,
     angle_step: float = 1.0,
 ) -> ndarray:
+    return grating_teeth_points(
+        [ap], [bp], [xp], width, taper_angle, spiked=spiked, angle_step=angle_step
+    )[0]
+
+
+def grating_teeth_points(
+    ap: ndarray,
+    bp: ndarray,
+    xp: ndarray,
+    width: Union[float64, float],
+    taper_angle: float,
+    spiked: bool = True,
+    angle_step: float = 1.0,
+) -> ndarray:
+    """returns the (n_teeth, n_points, 2) points of all the grating teeth
+    with backbones computed and extruded at once
+    """
     theta_min = -taper_angle / 2
     theta_max = taper_angle / 2
 
-    backbone_points = ellipse_arc(ap, bp, xp, theta_min, theta_max, angle_step)
+    backbone_points = ellipse_arcs(ap, bp, xp, theta_min, theta_max, angle_step)
     if spiked:
         spike_length = width / 3
     else:
         spike_length = 0.0
-    points = extrude_path(
+    points = extrude_paths(
         backbone_points,
         width,
         with_manhattan_facing_angles=False,
@@ -200,12 +235,12 @@ def grating_coupler_elliptical(
     c.polarization = polarization
     c.wavelength = int(lambda_c * 1e3)
 
-    # Make each grating line
-    for p in range(p_start, p_start + n_periods + 1):
-        pts = grating_tooth_points(
-            p * a1, p * b1, p * x1, grating_line_width, taper_angle
-        )
-        c.add_polygon(pts, layer)
+    # Make all the grating lines at once
+    p = np.arange(p_start, p_start + n_periods + 1)
+    teeth = grating_teeth_points(
+        p * a1, p * b1, p * x1, grating_line_width, taper_angle
+    )
+    c.add_polygon(list(teeth), layer)
 
     # Make the taper
     p_taper = p_start - 1
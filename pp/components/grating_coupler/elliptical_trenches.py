@@ -1,7 +1,7 @@
 import numpy as np
 import pp
 from pp.geo_utils import DEG2RAD
-from pp.components.grating_coupler.elliptical import grating_tooth_points
+from pp.components.grating_coupler.elliptical import grating_teeth_points
 from pp.component import Component
 from typing import Tuple
 
@@ -71,16 +71,16 @@ def grating_coupler_elliptical_trenches(
     c.polarization = polarization
     c.wavelength = int(lambda_c * 1e3)
 
-    # Make each grating line
-    for p in range(p_start, p_start + n_periods + 1):
-        pts = grating_tooth_points(
-            p * a1,
-            p * b1,
-            p * x1,
-            width=trench_line_width,
-            taper_angle=taper_angle + trenches_extra_angle,
-        )
-        c.add_polygon(pts, layer_trench)
+    # Make all the grating lines at once
+    p = np.arange(p_start, p_start + n_periods + 1)
+    teeth = grating_teeth_points(
+        p * a1,
+        p * b1,
+        p * x1,
+        width=trench_line_width,
+        taper_angle=taper_angle + trenches_extra_angle,
+    )
+    c.add_polygon(list(teeth), layer_trench)
 
     # Make the taper
     p_taper = p_start - 1
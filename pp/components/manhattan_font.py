@@ -1,6 +1,7 @@
 import numpy as np
 from omegaconf.listconfig import ListConfig
-from pp.component import Component
+from pp.component import Component, ComponentReference
+from pp.derived_layers import inline_cladding
 from typing import List, Tuple
 
 import pp
@@ -41,11 +42,9 @@ def manhattan_text(
     for i, line in enumerate(text.split("\n")):
         component = pp.Component(name=t.name + "{}".format(i))
         for c in line:
-            try:
-                if c not in CHARAC_MAP:
-                    c = c.upper()
-                pixels = CHARAC_MAP[c]
-            except:
+            if c not in CHARAC_MAP:
+                c = c.upper()
+            if c not in CHARAC_MAP:
                 print(
                     "character {} could not be written (probably not part of dictionnary)".format(
                         c
@@ -53,11 +52,8 @@ def manhattan_text(
                 )
                 continue
 
-            _c = component.add_ref(
-                pixel_array(pixels=pixels, pixel_size=pixel_size, layer=layer)
-            )
-            _c.move((xoffset, yoffset))
-            component.absorb(_c)
+            glyph = manhattan_glyph(character=c, pixel_size=pixel_size, layer=layer)
+            component.add(ComponentReference(glyph, origin=(xoffset, yoffset)))
             xoffset += pixel_size * 6
 
         t.add_ref(component)
@@ -72,17 +68,34 @@ def manhattan_text(
         if justify == "center":
             ref.move(origin=ref.center, destination=position, axis="x")
 
-    points = [
-        [t.xmin - cladding_offset / 2, t.ymin - cladding_offset],
-        [t.xmax + cladding_offset / 2, t.ymin - cladding_offset],
-        [t.xmax + cladding_offset / 2, t.ymax + cladding_offset],
-        [t.xmin - cladding_offset / 2, t.ymax + cladding_offset],
-    ]
-    for layer in layers_cladding:
+    if layers_cladding:
+        (xmin, ymin), (xmax, ymax) = t.bbox
+        points = [
+            [xmin - cladding_offset / 2, ymin - cladding_offset],
+            [xmax + cladding_offset / 2, ymin - cladding_offset],
+            [xmax + cladding_offset / 2, ymax + cladding_offset],
+            [xmin - cladding_offset / 2, ymax + cladding_offset],
+        ]
+    for layer in inline_cladding(layers_cladding):
         t.add_polygon(points, layer=layer)
     return t
 
 
+@pp.autoname
+def manhattan_glyph(
+    character: str = "A", pixel_size: float = 10.0, layer: ListConfig = LAYER.M1
+) -> Component:
+    """ returns one cached character cell
+    shared by all the manhattan_text with the same pixel_size and layer
+    """
+    c = pp.Component()
+    _c = c << pixel_array(
+        pixels=CHARAC_MAP[character], pixel_size=pixel_size, layer=layer
+    )
+    c.absorb(_c)
+    return c
+
+
 @pp.autoname
 def pixel_array(
     pixels: str = """
@@ -1,5 +1,6 @@
 import pp
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 from typing import Any, List, Tuple
 
 
@@ -59,7 +60,7 @@ def mmi1x2(
     )
     mmi.y = 0
 
-    for layer_cladding in layers_cladding:
+    for layer_cladding in inline_cladding(layers_cladding):
         clad = c << pp.c.rectangle(
             size=(length_mmi, w_mmi + 2 * cladding_offset), layer=layer_cladding
         )
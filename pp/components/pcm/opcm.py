@@ -12,6 +12,7 @@ from pp.layers import LAYER
 from pp.port import rename_ports_by_orientation
 from pp.components.manhattan_font import manhattan_text
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 
 LINE_LENGTH = 420.0
 
@@ -27,7 +28,7 @@ def square_middle(
     a = side / 2
     component.add_polygon([(-a, -a), (a, -a), (a, a), (-a, a)], layer=layer)
     a += cladding_offset
-    for layer_cladding in layers_cladding:
+    for layer_cladding in inline_cladding(layers_cladding):
         component.add_polygon(
             [(-a, -a), (a, -a), (a, a), (-a, a)], layer=layer_cladding
         )
@@ -44,7 +45,7 @@ def double_square(side=0.5, layer=LAYER.WG, layers_cladding=[], cladding_offset=
         component.add_polygon(pts, layer=layer)
 
     a += cladding_offset
-    for layer in layers_cladding:
+    for layer in inline_cladding(layers_cladding):
         component.add_polygon([(-a, -a), (a, -a), (a, a), (-a, a)], layer=layer)
 
     return component
@@ -64,7 +65,7 @@ def rectangle(
     component.add_polygon([(-a, -b), (a, -b), (a, b), (-a, b)], layer=layer)
     a += cladding_offset
     b += cladding_offset
-    for layer in layers_cladding:
+    for layer in inline_cladding(layers_cladding):
         component.add_polygon([(-a, -b), (a, -b), (a, b), (-a, b)], layer=layer)
     return component
 
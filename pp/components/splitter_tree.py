@@ -1,4 +1,5 @@
 from typing import Callable
+import numpy as np
 import pp
 
 from pp.components.mmi1x2 import mmi1x2
@@ -87,8 +88,16 @@ def splitter_tree(
             v_mirror=False,  # True,
         )
 
-        c.add(connect_strip(coupler.ports["E1"], tree_top.ports["W0"]))
-        c.add(connect_strip(coupler.ports["E0"], tree_bot.ports["W0"]))
+        route_top = connect_strip(coupler.ports["E1"], tree_top.ports["W0"])
+        c.add(route_top)
+
+        e0, e1, w0 = [coupler.ports[name].position for name in ("E0", "E1", "W0")]
+        if np.allclose(e0 + e1, 2 * np.array([e1[0], w0[1]])):
+            # symmetric coupler: the bottom route reuses the top route cell
+            route_bot = c.add_ref(route_top.parent)
+            route_bot.reflect((0, w0[1]), (1, w0[1]))
+        else:
+            c.add(connect_strip(coupler.ports["E0"], tree_bot.ports["W0"]))
 
     i = 0
     for p in get_ports_facing(tree_bot, "E"):
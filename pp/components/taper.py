@@ -2,6 +2,7 @@ from typing import Any, List, Optional, Tuple
 import pp
 from pp.config import TAPER_LENGTH
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 
 
 @pp.autoname
@@ -53,7 +54,7 @@ def taper(
     o = cladding_offset
     ypts = [y1 + o, y2 + o, -y2 - o, -y1 - o]
 
-    for layer in layers_cladding:
+    for layer in inline_cladding(layers_cladding):
         c.add_polygon((xpts, ypts), layer=layer)
 
     c.info["length"] = length
@@ -3,6 +3,7 @@
 import pathlib
 
 import pp
+from pp.derived_layers import inline_cladding
 
 data_path = pathlib.Path(__file__).parent / "csv_data"
 
@@ -17,9 +18,10 @@ def taper_from_csv(csv_path, wg_layer=1, clad_offset=3, clad_layer=pp.LAYER.WGCL
 
     c = pp.Component()
     c.add_polygon(list(zip(xs, ys)) + list(zip(xs, -ys))[::-1], layer=wg_layer)
-    c.add_polygon(
-        list(zip(xs, ys_trench)) + list(zip(xs, -ys_trench))[::-1], layer=clad_layer
-    )
+    for layer in inline_cladding([clad_layer]):
+        c.add_polygon(
+            list(zip(xs, ys_trench)) + list(zip(xs, -ys_trench))[::-1], layer=layer
+        )
 
     c.add_port(
         name="W0",
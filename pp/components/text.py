@@ -8,10 +8,24 @@ import pp
 from pp.layers import LAYER
 from pp.components.manhattan_font import manhattan_text
 from pp.name import clean_name
-from pp.component import Component
+from pp.component import Component, ComponentReference
 from typing import Tuple
 
 
+@pp.autoname
+def glyph(
+    ascii_value: int = 97, size: float = 10.0, layer: Tuple[int, int] = LAYER.TEXT
+) -> Component:
+    """ returns one character of the phidl font,
+    cached so that all the text with the same size and layer share the glyph cells
+    """
+    scaling = size / 1000
+    c = pp.Component()
+    for poly in _glyph[ascii_value]:
+        c.add_polygon(np.array(poly) * scaling, layer=layer)
+    return c
+
+
 def text(
     text: str = "abcd",
     size: float = 10.0,
@@ -19,7 +33,7 @@ def text(
     justify: str = "left",
     layer: Tuple[int, int] = LAYER.TEXT,
 ) -> Component:
-    """ adds text
+    """ adds text as references to glyph cells
 
     .. plot::
       :include-source:
@@ -43,10 +57,8 @@ def text(
             if c == " ":
                 xoffset += 500 * scaling
             elif 33 <= ascii_val <= 126:
-                for poly in _glyph[ascii_val]:
-                    xpts = np.array(poly)[:, 0] * scaling
-                    ypts = np.array(poly)[:, 1] * scaling
-                    label.add_polygon([xpts + xoffset, ypts + yoffset], layer=layer)
+                _glyph_cell = glyph(ascii_value=ascii_val, size=size, layer=layer)
+                label.add(ComponentReference(_glyph_cell, origin=(xoffset, yoffset)))
                 xoffset += (_width[ascii_val] + _indent[ascii_val]) * scaling
             else:
                 ValueError(
@@ -100,6 +112,17 @@ def githash(text=[], size=0.4, hash_length=6, layer=LAYER.WG):
     return c
 
 
+def test_text_shares_glyphs():
+    c1 = text(text="abca", size=3)
+    c2 = text(text="ab", size=3, position=(0, 20))
+    glyphs1 = c1.references[0].parent.references
+    glyphs2 = c2.references[0].parent.references
+    assert len(glyphs1) == 4
+    assert glyphs1[0].parent is glyphs1[3].parent is glyphs2[0].parent
+    assert len(c1.get_dependencies(recursive=True)) == 4
+    assert np.allclose(glyphs2[1].origin, (glyphs1[1].origin[0], 20))
+
+
 if __name__ == "__main__":
     c = text(
         text=".[,ABCDEFGHIKKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789:/",
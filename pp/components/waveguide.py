@@ -6,6 +6,7 @@ from pp.name import autoname
 from pp.components.hline import hline
 
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 
 
 @autoname
@@ -37,7 +38,7 @@ def waveguide(
 
     wc = w + cladding_offset
 
-    for layer_cladding in layers_cladding:
+    for layer_cladding in inline_cladding(layers_cladding):
         c.add_polygon(
             [(0, -wc), (length, -wc), (length, wc), (0, wc)], layer=layer_cladding
         )
@@ -42,13 +42,20 @@ config_base = OmegaConf.load(
 tech:
     name: generic
     cache_url:
+    artifact_store:
     with_settings_label: False
+    layout_format: gds
     add_pins: True
     wg_expanded_width: 2.5
     taper_length: 35.0
     grid_unit: 1e-6
     grid_resolution: 1e-9
     bend_radius: 10.0
+    deferred_cladding: False
+    derived_layers:
+        - layer: [111, 0]
+          layers: [[1, 0]]
+          offset: 3.0
 """
     )
 )
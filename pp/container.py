@@ -5,10 +5,95 @@ it makes sure that some of the important settings are copied from the original c
 
 """
 
-from typing import Callable
+from typing import Any, Callable
 import functools
+import weakref
 from inspect import signature
+
+import numpy as np
+from phidl.device_layout import Device
+
 import pp
+from pp.compare_cells import hash_cells
+
+CONTAINER_CACHE = {}
+GEOMETRY_HASHES = weakref.WeakKeyDictionary()
+
+
+def _get_geometry_state(component: Device) -> tuple:
+    """returns a cheap fingerprint of the geometry of a component:
+    bbox, sum of the polygon points and reference transforms
+    (changes when the component or its polygons are moved or edited)
+    """
+    points = sum(
+        float(np.sum(p))
+        for polygonset in component.polygons
+        for p in polygonset.polygons
+    )
+    references = tuple(
+        (
+            id(r.parent),
+            tuple(r.origin),
+            r.rotation,
+            r.magnification,
+            r.x_reflection,
+            getattr(r, "columns", 1),
+            getattr(r, "rows", 1),
+            tuple(getattr(r, "spacing", ())),
+        )
+        for r in component.references
+    )
+    return (len(component.polygons), points, references, component.bbox.tobytes())
+
+
+def _get_geometry_hash(component: Device) -> str:
+    """returns the geometry hash of a component
+    memoized on the component until its geometry state changes
+    """
+    state = _get_geometry_state(component)
+    memo = GEOMETRY_HASHES.get(component)
+    if memo is None or memo[0] != state:
+        memo = (state, hash_cells(component, {})[component.name])
+        GEOMETRY_HASHES[component] = memo
+    return memo[1]
+
+
+def _get_component_key(component: Device) -> tuple:
+    """returns a key for the name, geometry and ports of a component"""
+    geometry = (
+        _get_geometry_hash(component)
+        if component.references or component.polygons
+        else None
+    )
+    ports = tuple(
+        (
+            p.name,
+            tuple(p.midpoint),
+            p.width,
+            p.orientation,
+            tuple(getattr(p, "layer", ())),
+            getattr(p, "port_type", None),
+        )
+        for p in component.ports.values()
+    )
+    return (component.name, geometry, ports)
+
+
+def _get_key(value: Any) -> Any:
+    """returns a hashable key for an argument of a container function"""
+    if isinstance(value, Device):
+        return _get_component_key(value)
+    if isinstance(value, np.ndarray):
+        return tuple(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return tuple(_get_key(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _get_key(v)) for k, v in value.items()))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
 
 
 def container(component_function: Callable) -> Callable:
@@ -21,6 +106,12 @@ def container(component_function: Callable) -> Callable:
 
     Functions decorated with container will return a new component
 
+    The new component is cached by function, name, geometry and ports of the
+    original component and arguments. You can over-ride this with `cache = False`
+
+    Cached components are shared by all the callers: do not mutate them,
+    call the container with `cache = False` to get a component you can modify.
+
     .. plot::
       :include-source:
 
@@ -43,6 +134,7 @@ def container(component_function: Callable) -> Callable:
 
     @functools.wraps(component_function)
     def wrapper(*args, **kwargs):
+        cache = kwargs.pop("cache", True)
         old = kwargs.get("component")
         if not old and args:
             old = args[0]
@@ -53,6 +145,17 @@ def container(component_function: Callable) -> Callable:
                 f"container {component_function.__name__} requires a component, got `{old}`"
             )
         old = old or kwargs.get("component")
+
+        if cache:
+            key = (
+                component_function,
+                _get_component_key(old),
+                _get_key(args[1:]),
+                _get_key({k: v for k, v in kwargs.items() if k != "component"}),
+            )
+            if key in CONTAINER_CACHE:
+                return CONTAINER_CACHE[key]
+
         new = component_function(*args, **kwargs)
 
         sig = signature(component_function)
@@ -68,6 +171,8 @@ def container(component_function: Callable) -> Callable:
         new.wavelength = new.wavelength or old.wavelength
         new.polarization = new.polarization or old.polarization
         new.settings.pop("kwargs", "")
+        if cache:
+            CONTAINER_CACHE[key] = new
         return new
 
     return wrapper
@@ -118,6 +223,34 @@ def test_container2():
     return new
 
 
+def test_container_cache():
+    old = pp.c.waveguide()
+    new = add_padding(component=old, x=10)
+    assert add_padding(component=old, x=10) is new
+    assert add_padding(old, x=10) is new
+    assert add_padding(component=old, x=20) is not new
+    assert add_padding(component=old, x=10, cache=False) is not new
+    assert add_padding(component=pp.c.waveguide(length=5), x=10) is not new
+
+
+def test_container_cache_geometry():
+    old = pp.c.waveguide(length=7)
+    new = add_padding(component=old, x=10)
+    old.add_polygon([(0, 0), (1, 0), (1, 1)], layer=pp.LAYER.M1)
+    new = add_padding(component=old, x=10)
+    assert add_padding(component=old, x=10) is new
+
+    # port-less components moved or edited in place
+    c = pp.Component("container_cache_geometry")
+    c.add_polygon([(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)], layer=pp.LAYER.WG)
+    new = add_padding(component=c, x=10)
+    c.move((5, 0))
+    moved = add_padding(component=c, x=10)
+    assert moved is not new
+    c.polygons[0].polygons[0][0] += 0.5  # inside the bbox
+    assert add_padding(component=c, x=10) is not moved
+
+
 def test_container_error():
     import pytest
 
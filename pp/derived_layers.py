@@ -0,0 +1,252 @@
+""" derived layers
+
+Cladding and exclusion layers derived from the core layers by a grow + merge
+rule set in the tech config
+
+.. code:: yaml
+
+    tech:
+        deferred_cladding: True
+        derived_layers:
+            - layer: [111, 0]  # WGCLAD
+              layers: [[1, 0]]  # grown from WG
+              offset: 3.0
+
+With `deferred_cladding` the components do not draw the cladding layers that a
+rule derives (`layers_cladding` and the `clad_layer` of picwriter waveguide
+templates go through `inline_cladding`) and `write_gds` adds the derived layers
+once per unique cell, merged into one polygon per connected region instead of
+one cladding polygon per component. The results are cached by the geometry
+they are derived from, so cells changed after a first call are derived again.
+
+Polygons drawn directly on a derived layer, such as the macro and NOOPC covers
+of `pcm.ppe`, are not a grown core: they are always drawn and merged into the
+derived layer.
+"""
+
+import hashlib
+
+from typing import List, Optional, Tuple
+
+import gdspy
+import numpy as np
+
+from pp.config import conf
+from pp import profiler
+
+DERIVED_LAYERS_CACHE = {}
+
+
+def inline_cladding(layers_cladding: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """returns the cladding layers that a component draws itself
+    (the layers derived by add_derived_layers are left out when the cladding is deferred)
+    """
+    if not conf.tech.deferred_cladding:
+        return layers_cladding
+    derived = {tuple(rule["layer"]) for rule in conf.tech.derived_layers}
+    return [layer for layer in layers_cladding if tuple(layer) not in derived]
+
+
+def get_rules(rules: Optional[List[dict]] = None) -> Tuple[tuple, ...]:
+    """returns the derived layer rules as hashable
+    (layer, source layers, offset, join) tuples
+
+    Args:
+        rules: list of dicts with layer, layers, offset and join (miter)
+            defaults to the tech config `derived_layers`
+    """
+    rules = conf.tech.derived_layers if rules is None else rules
+    return tuple(
+        (
+            tuple(rule["layer"]),
+            tuple(tuple(layer) for layer in rule["layers"]),
+            float(rule["offset"]),
+            rule.get("join", "miter"),
+        )
+        for rule in rules
+    )
+
+
+def _remove_polygons(cell, layer: Tuple[int, int]) -> None:
+    """removes the polygons of a cell (not its references) on a layer"""
+    for polygonset in cell.polygons:
+        keep = [spec != layer for spec in zip(polygonset.layers, polygonset.datatypes)]
+        if all(keep):
+            continue
+        polygonset.polygons = [p for p, k in zip(polygonset.polygons, keep) if k]
+        polygonset.layers = [p for p, k in zip(polygonset.layers, keep) if k]
+        polygonset.datatypes = [p for p, k in zip(polygonset.datatypes, keep) if k]
+    cell.polygons = [p for p in cell.polygons if p.polygons]
+
+
+def _get_polygons(cell, layers: Tuple[Tuple[int, int], ...]) -> List[np.ndarray]:
+    """returns the polygons of a cell (not its references) on some layers"""
+    return [
+        polygon
+        for polygonset in cell.polygons
+        for polygon, spec in zip(
+            polygonset.polygons, zip(polygonset.layers, polygonset.datatypes)
+        )
+        if spec in layers
+    ]
+
+
+def _get_digest(polygons: List[np.ndarray]) -> str:
+    """returns a digest of the points of polygons"""
+    digest = hashlib.sha1()
+    for polygon in polygons:
+        points = np.asarray(polygon, dtype=float)
+        digest.update(np.int64(len(points)).tobytes())
+        digest.update(points.tobytes())
+    return digest.hexdigest()
+
+
+def get_derived_polygons(
+    sources: List[np.ndarray],
+    existing: List[np.ndarray],
+    offset: float,
+    join: str = "miter",
+    precision: float = 1e-3,
+) -> List[np.ndarray]:
+    """returns the merged union of the grown sources and the existing polygons
+    (one polygon per connected region)
+    """
+    grown = (
+        gdspy.offset(sources, offset, join=join, precision=precision, join_first=True)
+        if sources
+        else None
+    )
+    if existing:
+        grown = gdspy.boolean(grown, existing, "or", precision=precision)
+    return grown.polygons if grown else []
+
+
+@profiler.profile("derived_layers")
+def add_derived_layers(
+    component,
+    rules: Optional[List[dict]] = None,
+    hierarchical: bool = True,
+    precision: float = 1e-3,
+):
+    """adds derived layers (cladding, exclusion ...) to a component (in place)
+
+    Args:
+        component: to derive the layers for
+        rules: list of dicts with layer, layers, offset and join
+            defaults to the tech config `derived_layers`
+        hierarchical: derives the layers in each unique cell from its own polygons,
+            otherwise from the flattened component into the top cell
+            (one region, the cells below should not draw the derived layers)
+        precision: of the grow and merge operations
+
+    Returns:
+        component
+    """
+    rules = get_rules(rules)
+    if hierarchical:
+        cells = component.get_dependencies(recursive=True)
+        cells.add(component)
+    else:
+        cells = [component]
+
+    for cell in cells:
+        derived = {}
+        by_spec = None if hierarchical else cell.get_polygons(by_spec=True)
+        for layer, layers, offset, join in rules:
+            if hierarchical:
+                sources = _get_polygons(cell, layers)
+            else:
+                sources = [p for spec in layers for p in by_spec.get(spec, [])]
+            existing = _get_polygons(cell, (layer,))
+            key = (offset, join, precision, _get_digest(sources), _get_digest(existing))
+            polygons = DERIVED_LAYERS_CACHE.get(key)
+            if polygons is None:
+                polygons = get_derived_polygons(
+                    sources, existing, offset=offset, join=join, precision=precision,
+                )
+                DERIVED_LAYERS_CACHE[key] = polygons
+            derived[layer] = polygons
+
+        for layer, polygons in derived.items():
+            _remove_polygons(cell, layer)
+            for polygon in polygons:
+                cell.add_polygon(polygon, layer=layer)
+    return component
+
+
+def test_add_derived_layers():
+    import pp
+
+    wgclad = pp.LAYER.WGCLAD
+    rules = [dict(layer=wgclad, layers=[pp.LAYER.WG], offset=3.0)]
+
+    conf.tech.deferred_cladding = True
+    try:
+        wg = pp.c.waveguide(length=10, cache=False)
+        bend = pp.c.bend_circular(cache=False)
+    finally:
+        conf.tech.deferred_cladding = False
+    assert wgclad not in wg.get_layers()
+
+    c = pp.Component()
+    w1 = c << wg
+    b = c << bend
+    w2 = c << wg
+    b.connect("W0", w1.ports["E0"])
+    w2.connect("W0", b.ports["N0"])
+
+    add_derived_layers(c, rules=rules)
+    assert len(_get_polygons(wg, (wgclad,))) == 1
+    assert len(c.get_polygons(by_spec=True)[wgclad]) == 3  # one per instance
+    assert np.allclose(wg.bbox, [[-3, -3.25], [13, 3.25]])
+
+    for cell in (wg, bend):
+        _remove_polygons(cell, wgclad)
+    add_derived_layers(c, rules=rules, hierarchical=False)
+    assert len(c.get_polygons(by_spec=True)[wgclad]) == 1  # merged
+    assert not _get_polygons(wg, (wgclad,))
+
+    # inline cladding is merged with the grown core
+    DERIVED_LAYERS_CACHE.clear()
+    wg = pp.c.waveguide(length=10, cache=False)
+    add_derived_layers(wg, rules=rules)
+    assert len(_get_polygons(wg, (wgclad,))) == 1
+    assert np.allclose(wg.bbox, [[-3, -3.25], [13, 3.25]])
+
+
+def test_add_derived_layers_changed_cell():
+    import pp
+
+    wgclad = pp.LAYER.WGCLAD
+    rules = [dict(layer=wgclad, layers=[pp.LAYER.WG], offset=3.0)]
+    c = pp.Component()
+    c.add_polygon([(0, 0), (10, 0), (10, 1), (0, 1)], layer=pp.LAYER.WG)
+    add_derived_layers(c, rules=rules)
+    assert np.allclose(c.bbox, [[-3, -3], [13, 4]])
+
+    c.add_polygon([(0, 0), (1, 0), (1, 20), (0, 20)], layer=pp.LAYER.WG)
+    add_derived_layers(c, rules=rules)
+    assert np.allclose(c.bbox, [[-3, -3], [13, 23]])
+
+
+def test_inline_cladding():
+    import pp
+
+    layers_cladding = [pp.LAYER.WGCLAD, pp.LAYER.SLAB90]
+    assert inline_cladding(layers_cladding) == layers_cladding
+    conf.tech.deferred_cladding = True
+    try:
+        assert inline_cladding(layers_cladding) == [pp.LAYER.SLAB90]
+    finally:
+        conf.tech.deferred_cladding = False
+
+
+def test_get_derived_polygons_outlines():
+    from pp.rectangles import rectangles_to_polygons
+
+    # two L shapes made of overlapping rectangles
+    rectangles = np.array(
+        [[0, 0, 10, 2], [8, 0, 10, 10], [30, 0, 40, 2], [38, 0, 40, 10]]
+    )
+    polygons = get_derived_polygons(rectangles_to_polygons(rectangles), [], offset=1)
+    assert len(polygons) == 2
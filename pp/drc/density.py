@@ -2,6 +2,7 @@ import sys
 import numpy as np
 import gdspy as gp
 from pp.geo_utils import area
+from pp.rectangles import rectangles_area, split_rectangles
 
 
 def _print(*args, **kwargs):
@@ -12,6 +13,7 @@ def _print(*args, **kwargs):
 def compute_area(c, target_layer):
     """
     Compute area of the component on a given layer
+    axis-aligned rectangles are merged analytically, other polygons with gdspy
     """
     _print("Computing area ", c.name)
     c.flatten()
@@ -21,6 +23,10 @@ def compute_area(c, target_layer):
     for (layer, polys) in polys_by_spec.items():
         _print(layer)
         if layer == target_layer:
+            rectangles, others = split_rectangles(polys)
+            if not others:
+                _area += rectangles_area(rectangles)
+                continue
             joined_polys = gp.boolean(polys, None, operation="or")
             _print(joined_polys)
             try:
@@ -188,6 +194,13 @@ def test_density():
     area = compute_area(c, layer)
     assert np.isclose(8, area)
 
+    c = pp.Component()
+    c << pp.c.rectangle(size=(4, 2), layer=layer)
+    c << pp.c.rectangle(size=(2, 4), layer=layer)
+    assert np.isclose(compute_area(c, layer), 12)
+    c << pp.c.circle(radius=1, layer=layer)
+    assert np.isclose(compute_area(c, layer), 12 + 3 * np.pi / 4, rtol=1e-3)
+
 
 if __name__ == "__main__":
     test_density()
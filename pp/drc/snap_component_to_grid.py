@@ -0,0 +1,146 @@
+""" snap a whole Component hierarchy to the manufacturing grid """
+from typing import Any, Dict
+
+import numpy as np
+
+from pp.drc import snap_to_grid
+
+
+def _snap_polygons(cell, nm: int, stats: Dict[str, Any]) -> None:
+    """snaps all the polygons of a cell in one numpy pass
+    and removes the duplicated vertices created by snapping
+
+    phidl stores one PolygonSet per polygon, so the polygons of all the
+    PolygonSets are concatenated and snapped together
+    """
+    polygonsets = [p for p in cell.polygons if p.polygons]
+    polygons = [polygon for p in polygonsets for polygon in p.polygons]
+    if not polygons:
+        cell.polygons = polygonsets
+        return
+
+    sizes = np.array([len(p) for p in polygons])
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    points = np.concatenate(polygons)
+    snapped = snap_to_grid(points, nm=nm)
+
+    off_grid = ~np.isclose(snapped, points).all(axis=1)
+    layers = [layer for p in polygonsets for layer in zip(p.layers, p.datatypes)]
+    off_grid_by_polygon = np.add.reduceat(off_grid, starts)
+    off_grid_by_layer = stats["off_grid_by_layer"]
+    for i in np.flatnonzero(off_grid_by_polygon):
+        layer = tuple(int(j) for j in layers[i])
+        off_grid_by_layer[layer] = off_grid_by_layer.get(layer, 0) + int(
+            off_grid_by_polygon[i]
+        )
+
+    # a vertex is redundant if it matches the previous vertex of its polygon
+    previous = np.roll(snapped, 1, axis=0)
+    previous[starts] = snapped[starts + sizes - 1]
+    keep = ~(previous == snapped).all(axis=1)
+    kept_sizes = np.add.reduceat(keep, starts)
+    new_polygons = np.split(snapped[keep], np.cumsum(kept_sizes)[:-1])
+
+    i = 0
+    for polygonset in polygonsets:
+        n = len(polygonset.polygons)
+        kept = [j for j in range(i, i + n) if kept_sizes[j] >= 3]
+        polygonset.polygons = [new_polygons[j] for j in kept]
+        polygonset.layers = [layers[j][0] for j in kept]
+        polygonset.datatypes = [layers[j][1] for j in kept]
+        i += n
+
+    stats["polygons"] += len(polygons)
+    stats["polygons_removed"] += int((kept_sizes < 3).sum())
+    stats["vertices"] += len(points)
+    stats["vertices_off_grid"] += int(off_grid.sum())
+    stats["vertices_removed"] += int((~keep).sum())
+    cell.polygons = [p for p in polygonsets if p.polygons]
+
+
+def snap_component_to_grid(component, nm: int = 1) -> Dict[str, Any]:
+    """Snaps all polygons, ports, labels and reference origins of a Component
+    and all its dependencies to a grid of `nm` nanometers (in place).
+
+    Each unique cell is visited once regardless of how many times it is
+    instantiated, so the hierarchy is preserved.
+
+    Args:
+        component: to snap
+        nm: grid size in nm
+
+    Returns:
+        dict with off-grid statistics (cells, polygons, vertices,
+        vertices_off_grid, vertices_removed, polygons_removed, ports_off_grid,
+        references_off_grid, off_grid_by_layer)
+    """
+    stats = dict(
+        cells=0,
+        polygons=0,
+        vertices=0,
+        vertices_off_grid=0,
+        vertices_removed=0,
+        polygons_removed=0,
+        ports_off_grid=0,
+        references_off_grid=0,
+        off_grid_by_layer={},
+    )
+
+    cells = component.get_dependencies(recursive=True)
+    cells.add(component)
+
+    for cell in cells:
+        stats["cells"] += 1
+        _snap_polygons(cell, nm=nm, stats=stats)
+
+        for port in getattr(cell, "ports", {}).values():
+            midpoint = snap_to_grid(port.midpoint, nm=nm)
+            if not np.allclose(midpoint, port.midpoint):
+                stats["ports_off_grid"] += 1
+                port.midpoint = midpoint
+
+        for reference in cell.references:
+            origin = snap_to_grid(reference.origin, nm=nm)
+            if not np.allclose(origin, reference.origin):
+                stats["references_off_grid"] += 1
+                reference.origin = origin
+
+        for label in cell.labels:
+            label.position = snap_to_grid(label.position, nm=nm)
+
+        cell._bb_valid = False
+
+    return stats
+
+
+def test_snap_component_to_grid():
+    import pp
+
+    c = pp.Component()
+    c.add_polygon([(0, 0), (1.0004, 0), (1.0006, 0.0001), (0.3, 1.1111)], layer=(1, 0))
+    c.add_polygon([(0, 0), (0.0001, 0), (0, 0.0004)], layer=(2, 0))
+    c.add_port(name="W0", midpoint=(0.0004, 0.1234))
+    r1 = c << pp.c.rectangle()
+    r2 = c << pp.c.rectangle()
+    r1.move((0.1234, 0))
+    r2.move((0.1234, 10))
+
+    stats = snap_component_to_grid(c, nm=5)
+    assert stats["cells"] == 2
+    assert stats["references_off_grid"] == 2
+    assert stats["ports_off_grid"] == 1
+    assert stats["polygons_removed"] == 1
+    assert stats["vertices_removed"] == 4
+    assert stats["off_grid_by_layer"] == {(1, 0): 3, (2, 0): 2}
+
+    for x, y in c.get_polygons()[0]:
+        assert pp.drc.on_grid(x, 5)
+        assert pp.drc.on_grid(y, 5)
+    assert len(c.get_polygons()) == 3
+
+
+if __name__ == "__main__":
+    import pp
+
+    c = pp.c.mzi()
+    print(snap_component_to_grid(c, nm=5))
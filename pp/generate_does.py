@@ -1,6 +1,7 @@
 import sys
 import collections
-from multiprocessing import Process
+import queue as _queue
+from multiprocessing import Process, Queue
 import time
 from pprint import pprint
 from omegaconf import OmegaConf
@@ -16,6 +17,13 @@ from pp.write_doe import write_doe_metadata
 from pp.doe import get_settings_list
 
 from pp.config import logging
+from pp import profiler
+from pp.shared_memory import import_shared_memory
+from pp.shared_memory import read_shared_memory
+from pp.shared_memory import unlink_shared_memory
+from pp.shared_memory import write_shared_memory
+from pp.routing.quantize import warm_routing_cache
+from pp.artifact_store import get_artifact_store, get_doe_key
 
 
 def _print(*args, **kwargs):
@@ -88,31 +96,84 @@ def write_doe(
     regenerate_report_if_doe_exists=False,
     precision=1e-9,
     logger=logging,
+    queue=None,
+    write_to_disk=True,
     **kwargs,
 ):
+    """builds the components of a DOE and saves them
+
+    Args:
+        queue: sends the components to the main process through shared memory
+            before they are written to disk
+        write_to_disk: saves the GDS and the metadata
+    """
     doe_name = doe["name"]
     list_settings = doe["list_settings"]
 
     line = "Building - {} ...".format(doe_name)
     logger.info(line)
 
-    # Otherwise generate each component using the component factory
-    component_type = doe["component"]
-    components = build_components(
-        component_type, list_settings, component_factory=component_factory
-    )
+    with profiler.span("doe", doe_name):
+        # Otherwise generate each component using the component factory
+        component_type = doe["component"]
+        components = build_components(
+            component_type, list_settings, component_factory=component_factory
+        )
+
+        components = [component_filter(c) for c in components]
+        component_names = [c.name for c in components]
+        if queue is not None:
+            descriptor = write_shared_memory(components)
+            try:
+                queue.put((doe_name, descriptor))
+            except Exception:
+                unlink_shared_memory(descriptor)
+                raise
+
+        if write_to_disk:
+            save_doe(
+                doe_name, components, doe_root_path=doe_root_path, precision=precision
+            )
+            write_doe_metadata(
+                doe_name=doe["name"],
+                cell_names=component_names,
+                list_settings=doe["list_settings"],
+                doe_settings=kwargs,
+                doe_metadata_path=doe_metadata_path,
+            )
 
-    components = [component_filter(c) for c in components]
-    component_names = [c.name for c in components]
-    save_doe(doe_name, components, doe_root_path=doe_root_path, precision=precision)
+    # write_doe runs in its own process, the main process merges the events
+    profiler.flush()
+
+
+def _put_artifact(artifact_store, key, doe_dir, process):
+    """ stores a DOE built by a process that succeeded """
+    process.join()
+    if process.exitcode == 0 and (doe_dir / "content.txt").exists():
+        try:
+            artifact_store.put(key, doe_dir)
+        except OSError as e:  # the DOE is built, only the upload failed
+            logging.warning(f"Could not store {doe_dir.name}: {e}")
 
-    write_doe_metadata(
-        doe_name=doe["name"],
-        cell_names=component_names,
-        list_settings=doe["list_settings"],
-        doe_settings=kwargs,
-        doe_metadata_path=doe_metadata_path,
-    )
+
+def _receive_components(queue, doe_name_to_components):
+    """ maps the components sent by the DOE processes """
+    while True:
+        try:
+            doe_name, descriptor = queue.get_nowait()
+        except _queue.Empty:
+            return
+        doe_name_to_components[doe_name] = read_shared_memory(descriptor)
+
+
+def _discard_components(queue):
+    """ removes the shared memory blocks sent by the DOE processes, unread """
+    while True:
+        try:
+            _, descriptor = queue.get(timeout=0.1)
+        except _queue.Empty:
+            return
+        unlink_shared_memory(descriptor)
 
 
 def load_does(filepath, defaults={"do_permutation": True, "settings": {}}):
@@ -140,10 +201,25 @@ def generate_does(
     logger=logging,
     regenerate_report_if_doe_exists=False,
     precision=1e-9,
+    shared_memory=False,
+    write_to_disk=True,
+    artifact_store=None,
 ):
     """ Generates a DOEs of components specified in a yaml file
     allows for each DOE to have its own x and y spacing (more flexible than method1)
     similar to write_doe
+
+    Args:
+        shared_memory: the DOE processes send their components to this process
+            through shared memory (no GDS round trip)
+        write_to_disk: the DOE processes also save GDS and metadata
+            (after sending the components)
+        artifact_store: ArtifactStore or URL (defaults to tech.artifact_store)
+            DOEs found in the store are fetched instead of built,
+            the DOEs built are stored
+
+    Returns:
+        dict of doe_name: list of components built by this call (shared_memory)
     """
 
     doe_root_path.mkdir(parents=True, exist_ok=True)
@@ -188,100 +264,218 @@ def generate_does(
 
         list_args += [doe]
 
+    if shared_memory:
+        import_shared_memory()
+    queue = Queue() if shared_memory else None
+    doe_name_to_components = {}
+    if artifact_store is None or isinstance(artifact_store, str):
+        artifact_store = get_artifact_store(artifact_store)
+    doe_keys = {}
+    # the DOE processes inherit the common routing bends and tapers
+    warm_routing_cache()
+
     does_running = []
     start_times = {}
     finish_times = {}
     doe_name_to_process = {}
-    while list_args:
-        while len(does_running) < n_cores:
-            if not list_args:
-                break
-            doe = list_args.pop()
-            doe_name = doe["name"]
-
-            """
-            Only launch a build process if we do not use the cache
-            Or if the DOE is not built
-            """
+    try:
+        while list_args:
+            while len(does_running) < n_cores:
+                if not list_args:
+                    break
+                doe = list_args.pop()
+                doe_name = doe["name"]
 
-            list_settings = doe["list_settings"]
-
-            use_cached_does = (
-                default_use_cached_does if "cache" not in doe else doe["cache"]
-            )
-
-            _doe_exists = False
-
-            if "doe_template" in doe:
                 """
-                In that case, the DOE is not built: this DOE points to another existing component
+                Only launch a build process if we do not use the cache
+                Or if the DOE is not built
                 """
-                _doe_exists = True
-                logger.info("Using template - {}".format(doe_name))
-                save_doe_use_template(doe)
 
-            elif use_cached_does:
-                _doe_exists = doe_exists(doe_name, list_settings)
-                if _doe_exists:
-                    logger.info("Cached - {}".format(doe_name))
-                    if regenerate_report_if_doe_exists:
-                        component_names = load_doe_component_names(doe_name)
+                list_settings = doe["list_settings"]
 
+                use_cached_does = (
+                    default_use_cached_does if "cache" not in doe else doe["cache"]
+                )
+
+                _doe_exists = False
+
+                if "doe_template" in doe:
+                    """
+                    In that case, the DOE is not built: this DOE points to another existing component
+                    """
+                    _doe_exists = True
+                    logger.info("Using template - {}".format(doe_name))
+                    save_doe_use_template(doe)
+
+                elif use_cached_does:
+                    _doe_exists = doe_exists(doe_name, list_settings)
+                    if _doe_exists:
+                        logger.info("Cached - {}".format(doe_name))
+                        if regenerate_report_if_doe_exists:
+                            component_names = load_doe_component_names(doe_name)
+
+                            write_doe_metadata(
+                                doe_name=doe["name"],
+                                cell_names=component_names,
+                                list_settings=doe["list_settings"],
+                                doe_metadata_path=doe_metadata_path,
+                            )
+
+                if not _doe_exists and artifact_store is not None:
+                    doe_keys[doe_name] = get_doe_key(
+                        doe,
+                        component_factory,
+                        precision=precision,
+                        component_filter=component_filter.__qualname__,
+                    )
+                    if artifact_store.get(doe_keys[doe_name], doe_root_path / doe_name):
+                        _doe_exists = True
+                        logger.info("Fetched - {}".format(doe_name))
                         write_doe_metadata(
                             doe_name=doe["name"],
-                            cell_names=component_names,
+                            cell_names=load_doe_component_names(
+                                doe_name, doe_root_path
+                            ),
                             list_settings=doe["list_settings"],
                             doe_metadata_path=doe_metadata_path,
                         )
 
-            if not _doe_exists:
-                start_times[doe_name] = time.time()
-                p = Process(
-                    target=write_doe,
-                    args=(doe, component_factory),
-                    kwargs={
-                        "component_filter": component_filter,
-                        "doe_root_path": doe_root_path,
-                        "doe_metadata_path": doe_metadata_path,
-                        "regenerate_report_if_doe_exists": regenerate_report_if_doe_exists,
-                        "precision": precision,
-                        "logger": logger,
-                    },
-                )
-                doe_name_to_process[doe_name] = p
-                does_running += [doe_name]
-                try:
-                    p.start()
-                except Exception:
-                    print("Issue starting process for {}".format(doe_name))
-                    print(type(component_factory))
-                    raise
+                if not _doe_exists:
+                    start_times[doe_name] = time.time()
+                    p = Process(
+                        target=write_doe,
+                        args=(doe, component_factory),
+                        kwargs={
+                            "component_filter": component_filter,
+                            "doe_root_path": doe_root_path,
+                            "doe_metadata_path": doe_metadata_path,
+                            "regenerate_report_if_doe_exists": regenerate_report_if_doe_exists,
+                            "precision": precision,
+                            "logger": logger,
+                            "queue": queue,
+                            "write_to_disk": write_to_disk,
+                        },
+                    )
+                    doe_name_to_process[doe_name] = p
+                    does_running += [doe_name]
+                    try:
+                        p.start()
+                    except Exception:
+                        print("Issue starting process for {}".format(doe_name))
+                        print(type(component_factory))
+                        raise
+
+            to_rm = []
+            for i, doe_name in enumerate(does_running):
+                _p = doe_name_to_process[doe_name]
+                if not _p.is_alive():
+                    to_rm += [i]
+                    finish_times[doe_name] = time.time()
+                    dt = finish_times[doe_name] - start_times[doe_name]
+                    line = "Done - {} ({:.1f}s)".format(doe_name, dt)
+                    logger.info(line)
+                    if write_to_disk and doe_name in doe_keys:
+                        _put_artifact(
+                            artifact_store,
+                            doe_keys[doe_name],
+                            doe_root_path / doe_name,
+                            _p,
+                        )
 
-        to_rm = []
-        for i, doe_name in enumerate(does_running):
-            _p = doe_name_to_process[doe_name]
-            if not _p.is_alive():
-                to_rm += [i]
-                finish_times[doe_name] = time.time()
-                dt = finish_times[doe_name] - start_times[doe_name]
-                line = "Done - {} ({:.1f}s)".format(doe_name, dt)
-                logger.info(line)
-
-        for i in to_rm[::-1]:
-            does_running.pop(i)
-
-        time.sleep(0.001)
-
-    while does_running:
-        to_rm = []
-        for i, _doe_name in enumerate(does_running):
-            _p = doe_name_to_process[_doe_name]
-            if not _p.is_alive():
-                to_rm += [i]
-        for i in to_rm[::-1]:
-            does_running.pop(i)
-
-        time.sleep(0.05)
+            for i in to_rm[::-1]:
+                does_running.pop(i)
+
+            if queue is not None:
+                _receive_components(queue, doe_name_to_components)
+            time.sleep(0.001)
+
+        while does_running:
+            to_rm = []
+            for i, _doe_name in enumerate(does_running):
+                _p = doe_name_to_process[_doe_name]
+                if not _p.is_alive():
+                    to_rm += [i]
+                    if write_to_disk and _doe_name in doe_keys:
+                        _put_artifact(
+                            artifact_store,
+                            doe_keys[_doe_name],
+                            doe_root_path / _doe_name,
+                            _p,
+                        )
+            for i in to_rm[::-1]:
+                does_running.pop(i)
+
+            if queue is not None:
+                _receive_components(queue, doe_name_to_components)
+            time.sleep(0.05)
+
+        if queue is not None:
+            _receive_components(queue, doe_name_to_components)
+    except BaseException:
+        # do not leak the blocks of the DOEs that will not be read
+        if queue is not None:
+            for _doe_name in does_running:
+                doe_name_to_process[_doe_name].terminate()
+            _discard_components(queue)
+        raise
+    return doe_name_to_components
+
+
+def test_generate_does_shared_memory(tmp_path):
+    import pytest
+    from pp.placer import component_grid_from_yaml
+
+    pytest.importorskip("multiprocessing.shared_memory")
+
+    filepath = CONFIG["samples_path"] / "placer" / "config.yml"
+    doe_name_to_components = generate_does(
+        filepath,
+        doe_root_path=tmp_path / "cache",
+        doe_metadata_path=tmp_path / "does",
+        shared_memory=True,
+        write_to_disk=False,
+    )
+    assert len(doe_name_to_components["mzi2x2"]) == 9
+    assert not list((tmp_path / "cache").iterdir())
+
+    c = component_grid_from_yaml(
+        filepath, doe_name_to_components=doe_name_to_components
+    )
+    names = {d.name for d in c.get_dependencies(recursive=True)}
+    assert {d.name for d in doe_name_to_components["mzi2x2"]} <= names
+
+
+def test_generate_does_artifact_store(tmp_path):
+    from pp.artifact_store import LocalArtifactStore
+
+    class _Logger:
+        def __init__(self):
+            self.lines = []
+
+        def info(self, line):
+            self.lines.append(line.split(" - ")[0])
+
+    filepath = CONFIG["samples_path"] / "placer" / "config.yml"
+    store = LocalArtifactStore(tmp_path / "store")
+    loggers = []
+    for build in ("build1", "build2"):
+        loggers.append(_Logger())
+        generate_does(
+            filepath,
+            doe_root_path=tmp_path / build / "cache",
+            doe_metadata_path=tmp_path / build / "does",
+            artifact_store=store,
+            logger=loggers[-1],
+        )
+
+    n = len(list(store.root.glob("*/*")))
+    assert n and "Fetched" not in loggers[0].lines
+    assert loggers[1].lines == ["Fetched"] * n
+    for doe_dir in (tmp_path / "build1" / "cache").iterdir():
+        doe_dir2 = tmp_path / "build2" / "cache" / doe_dir.name
+        assert sorted(p.name for p in doe_dir.iterdir()) == sorted(
+            p.name for p in doe_dir2.iterdir()
+        )
 
 
 if __name__ == "__main__":
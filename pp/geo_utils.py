@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Tuple, Union
 import numpy as np
 from numpy import float64, ndarray, cos, sin
 from pp.coord2 import Coord2
@@ -23,24 +23,13 @@ def area(pts):
 
 
 def manhattan_direction(p0, p1, tol=1e-5):
+    """returns the sign (-1, 0, 1) of x and y from p0 to p1
+    also works on arrays of points of shape (N, 2)
     """
-    """
-    dp = p1 - p0
-    dx, dy = dp[0], dp[1]
-    if abs(dx) < tol:
-        sx = 0
-    elif dx > 0:
-        sx = 1
-    else:
-        sx = -1
-
-    if abs(dy) < tol:
-        sy = 0
-    elif dy > 0:
-        sy = 1
-    else:
-        sy = -1
-    return np.array((sx, sy))
+    dp = np.asarray(p1) - np.asarray(p0)
+    direction = np.sign(dp).astype(int)
+    direction[np.abs(dp) < tol] = 0
+    return direction
 
 
 def remove_flat_angles(points):
@@ -73,6 +62,78 @@ def remove_identicals(pts, grids_per_unit=1000, closed=True):
     return pts
 
 
+def pack_waypoints(list_of_waypoints) -> Tuple[ndarray, ndarray]:
+    """returns a list of waypoint arrays as (points, offsets)
+
+    points: all the points in one (N, 2) array
+    offsets: route i is points[offsets[i]:offsets[i + 1]]
+    """
+    sizes = [len(waypoints) for waypoints in list_of_waypoints]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+    points = np.vstack([np.asarray(w, dtype=float) for w in list_of_waypoints])
+    return points, offsets
+
+
+def unpack_waypoints(points: ndarray, offsets: ndarray) -> List[ndarray]:
+    """returns the list of waypoint arrays of a (points, offsets) pack"""
+    return np.split(points, offsets[1:-1])
+
+
+def _next_index(offsets: ndarray) -> ndarray:
+    """index of the next point of each point, wrapping around within each route"""
+    index = np.arange(offsets[-1]) + 1
+    index[offsets[1:] - 1] = offsets[:-1]
+    return index
+
+
+def _reduce_packed(keep: ndarray, points: ndarray, offsets: ndarray):
+    counts = np.add.reduceat(keep.astype(int), offsets[:-1])
+    return points[keep], np.concatenate([[0], np.cumsum(counts)]).astype(int)
+
+
+def path_length_packed(points: ndarray, offsets: ndarray) -> ndarray:
+    """returns the path length of every route of a (points, offsets) pack"""
+    d = (np.roll(points, -1, axis=0) - points) ** 2
+    segments = np.sqrt(d[:, 0] + d[:, 1])
+    # the last point of a route does not connect to the next route
+    segments[offsets[1:] - 1] = 0
+    return np.add.reduceat(segments, offsets[:-1])
+
+
+def angles_rad_packed(points: ndarray, offsets: ndarray) -> ndarray:
+    """returns the angles (radians) of the connection between each point and the
+    next one of the same route (the last point connects to the first)
+    """
+    d = points[_next_index(offsets)] - points
+    return np.arctan2(d[:, 1], d[:, 0])
+
+
+def remove_flat_angles_packed(
+    points: ndarray, offsets: ndarray
+) -> Tuple[ndarray, ndarray]:
+    """remove_flat_angles for all the routes of a (points, offsets) pack"""
+    a = angles_rad_packed(points, offsets) * RAD2DEG
+    da = a - np.roll(a, 1)
+    da = np.mod(np.round(da, 3), 180)
+
+    # To make sure we do not remove points at the edges
+    da[offsets[:-1]] = 1
+    da[offsets[1:] - 1] = 1
+    return _reduce_packed(da != 0, points, offsets)
+
+
+def remove_identicals_packed(
+    points: ndarray, offsets: ndarray, grids_per_unit=1000, closed=True
+) -> Tuple[ndarray, ndarray]:
+    """remove_identicals for all the routes of a (points, offsets) pack"""
+    next_points = points[_next_index(offsets)]
+    identicals = (abs(points - next_points) < 0.5 / grids_per_unit).all(axis=1)
+    identicals[offsets[1:] - 1] &= closed
+    # single point routes are kept
+    identicals[offsets[:-1][np.diff(offsets) == 1]] = False
+    return _reduce_packed(~identicals, points, offsets)
+
+
 def centered_diff(a: ndarray) -> ndarray:
     d = (np.roll(a, -1, axis=0) - np.roll(a, 1, axis=0)) / 2
     return d[1:-1]
@@ -228,6 +289,67 @@ def extrude_path(
     return pts
 
 
+def extrude_paths(
+    points: ndarray,
+    width: Union[ndarray, float64, float],
+    with_manhattan_facing_angles: bool = True,
+    spike_length: Union[float64, int, float] = 0,
+    grid: float = 0.001,
+) -> ndarray:
+    """
+    Extrude M paths of the same number of points at once (same as extrude_path)
+
+    Args:
+        points: numpy 3D array of shape (M, N, 2)
+        width: float or array of M widths
+
+    Return
+        numpy 3D array of shape (M, 2*N, 2) (M, 2*N + 2, 2) with spikes
+    """
+    points = np.asarray(points, dtype=float)
+    width = np.reshape(np.asarray(width, dtype=float), (-1, 1, 1))
+
+    _pts = np.roll(points, -1, axis=1)
+    a2 = np.arctan2(_pts[:, :, 1] - points[:, :, 1], _pts[:, :, 0] - points[:, :, 0])
+    start_angle = a2[:, 0] * RAD2DEG + 180
+    end_angle = a2[:, -2] * RAD2DEG
+    if with_manhattan_facing_angles:
+        start_angle = np.array([snap_angle(a) for a in start_angle])
+        end_angle = np.array([snap_angle(a) for a in end_angle])
+
+    a2 = a2 * 0.5
+    a1 = np.roll(a2, 1, axis=1)
+
+    a2[:, -1] = end_angle * DEG2RAD - a2[:, -2]
+    a1[:, 0] = start_angle * DEG2RAD - a1[:, 1]
+
+    a_plus = a2 + a1
+    cos_a_min = np.cos(a2 - a1)
+    offsets = np.stack((-sin(a_plus) / cos_a_min, cos(a_plus) / cos_a_min), axis=-1)
+    offsets = offsets * (0.5 * width)
+
+    points_back = (points - offsets)[:, ::-1]
+    if spike_length != 0:
+        d = spike_length
+        a_start = start_angle * DEG2RAD
+        a_end = end_angle * DEG2RAD
+        p_start_spike = points[:, :1] + d * np.stack(
+            [cos(a_start), sin(a_start)], axis=-1
+        ).reshape(-1, 1, 2)
+        p_end_spike = points[:, -1:] + d * np.stack(
+            [cos(a_end), sin(a_end)], axis=-1
+        ).reshape(-1, 1, 2)
+        pts = np.concatenate(
+            (p_start_spike, points + offsets, p_end_spike, points_back), axis=1
+        )
+    else:
+        pts = np.concatenate((points + offsets, points_back), axis=1)
+
+    pts = np.round(pts / grid) * grid
+
+    return pts
+
+
 def polygon_grow(polygon, offset):
     """
     polygon has to be a closed shape
@@ -255,3 +377,57 @@ def polygon_grow(polygon, offset):
 
     pts = s + offsets
     return pts
+
+
+def test_extrude_paths():
+    rng = np.random.RandomState(0)
+    theta = np.linspace(-0.3, 0.3, 20)
+    radius = rng.uniform(10, 20, (5, 1))
+    paths = np.stack([radius * np.cos(theta), radius * np.sin(theta)], axis=-1)
+    for spike_length in (0, 0.1):
+        polygons = extrude_paths(
+            paths, 0.3, with_manhattan_facing_angles=False, spike_length=spike_length
+        )
+        for path, polygon in zip(paths, polygons):
+            expected = extrude_path(
+                path,
+                0.3,
+                with_manhattan_facing_angles=False,
+                spike_length=spike_length,
+            )
+            assert np.array_equal(polygon, expected)
+
+    paths = np.array([[[0, 0], [10, 0], [10, 10.0]], [[0, 0], [0, 5], [3, 5.0]]])
+    polygons = extrude_paths(paths, [0.5, 1.0])
+    assert np.array_equal(polygons[1], extrude_path(paths[1], 1.0))
+
+
+def test_packed_waypoints():
+    rng = np.random.RandomState(0)
+    list_of_waypoints = []
+    for n in rng.randint(2, 12, 50):
+        steps = rng.randint(0, 3, (n - 1, 1)) * [[1, 0]] + rng.randint(
+            0, 3, (n - 1, 1)
+        ) * [[0, 1]]
+        list_of_waypoints.append(np.cumsum(np.vstack([[[0, 0]], steps]), axis=0) * 1.0)
+
+    points, offsets = pack_waypoints(list_of_waypoints)
+    assert np.allclose(
+        path_length_packed(points, offsets), [path_length(w) for w in list_of_waypoints]
+    )
+    assert np.allclose(
+        angles_rad_packed(points, offsets),
+        np.concatenate([angles_rad(w) for w in list_of_waypoints]),
+    )
+    for packed, single in [
+        (remove_flat_angles_packed, remove_flat_angles),
+        (remove_identicals_packed, remove_identicals),
+    ]:
+        routes = unpack_waypoints(*packed(points, offsets))
+        for route, waypoints in zip(routes, list_of_waypoints):
+            assert np.array_equal(route, single(waypoints))
+
+    assert np.array_equal(
+        manhattan_direction(points[:-1], points[1:]),
+        [manhattan_direction(p0, p1) for p0, p1 in zip(points[:-1], points[1:])],
+    )
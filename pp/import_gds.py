@@ -1,11 +1,14 @@
 from typing import Optional
 import gdspy
+import numpy as np
 
 from phidl.device_layout import DeviceReference
 
 import pp
-from pp.component import Component
+from pp.component import Component, ComponentArray
+from pp.drc.snap_component_to_grid import snap_component_to_grid
 from pp.name import NAME_TO_DEVICE
+from pp.oasis import get_gdspath
 from pp.port import read_port_markers, auto_rename_ports
 from pp.layers import port_layer2type, port_type2layer
 
@@ -132,9 +135,9 @@ def add_ports_from_markers_center(
 
 
 def import_gds_cells(gdspath):
-    """ returns top cells from GDS"""
+    """ returns top cells from GDS or OASIS"""
     gdsii_lib = gdspy.GdsLibrary()
-    gdsii_lib.read_gds(gdspath)
+    gdsii_lib.read_gds(get_gdspath(gdspath))
     top_level_cells = gdsii_lib.top_level()
     return top_level_cells
 
@@ -146,19 +149,19 @@ def import_gds(
     overwrite_cache: bool = True,
     snap_to_grid_nm: Optional[int] = None,
 ) -> Component:
-    """returns a Componenent from a GDS file
+    """returns a Componenent from a GDS or OASIS file
 
     Args:
-        gdspath: path of GDS file
+        gdspath: path of GDS or OASIS file
         cellname: cell of the name to import (None) imports top cell
         flatten: if True returns flattened (no hierarchy)
         overwrite_cache: overwrites device cache (caching by name)
-        snap_to_grid_nm: snap
+        snap_to_grid_nm: snaps polygons, ports and references to a nm grid
 
     """
     gdspath = str(gdspath)
     gdsii_lib = gdspy.GdsLibrary()
-    gdsii_lib.read_gds(gdspath)
+    gdsii_lib.read_gds(get_gdspath(gdspath))
     top_level_cells = gdsii_lib.top_level()
     cellnames = [c.name for c in top_level_cells]
 
@@ -213,13 +216,25 @@ def import_gds(
                 try:
                     ref_device = c2dmap[e.ref_cell.name]
 
-                    dr = DeviceReference(
-                        device=ref_device,
-                        origin=e.origin,
-                        rotation=e.rotation,
-                        magnification=e.magnification,
-                        x_reflection=e.x_reflection,
-                    )
+                    if isinstance(e, gdspy.CellArray):
+                        dr = ComponentArray(
+                            ref_device,
+                            columns=e.columns,
+                            rows=e.rows,
+                            spacing=e.spacing,
+                            origin=e.origin,
+                            rotation=e.rotation,
+                            magnification=e.magnification,
+                            x_reflection=e.x_reflection,
+                        )
+                    else:
+                        dr = DeviceReference(
+                            device=ref_device,
+                            origin=e.origin,
+                            rotation=e.rotation,
+                            magnification=e.magnification,
+                            x_reflection=e.x_reflection,
+                        )
                     converted_references.append(dr)
                 except Exception:
                     print("WARNING - Could not import", e.ref_cell.name)
@@ -229,13 +244,6 @@ def import_gds(
             temp_polygons = list(D.polygons)
             D.polygons = []
             for p in temp_polygons:
-                if snap_to_grid_nm:
-                    points_on_grid = pp.drc.snap_to_grid(
-                        p.polygons[0], nm=snap_to_grid_nm
-                    )
-                    p = gdspy.Polygon(
-                        points_on_grid, layer=p.layers[0], datatype=p.datatypes[0]
-                    )
                 D.add_polygon(p)
                 # else:
                 #     warnings.warn('[PHIDL] import_gds(). Warning an element which was not a ' \
@@ -243,6 +251,8 @@ def import_gds(
                 #         'The element was a: "%s"' % e)
 
         topdevice = c2dmap[topcell.name]
+        if snap_to_grid_nm:
+            snap_component_to_grid(topdevice, nm=snap_to_grid_nm)
         return topdevice
 
 
@@ -257,6 +267,15 @@ def test_import_gds_snap_to_grid():
         assert pp.drc.on_grid(y, 5)
 
 
+def test_import_gds_array():
+    c0 = pp.c.pad_array(n=4)
+    gdspath = pp.write_gds(c0)
+    c = import_gds(gdspath, overwrite_cache=True)
+    assert isinstance(c.references[0], ComponentArray)
+    assert len(c.get_polygons()) == len(c0.get_polygons()) == 4
+    assert np.allclose(c.bbox, c0.bbox)
+
+
 def test_import_gds_hierarchy():
     c0 = pp.c.mzi2x2()
     gdspath = pp.write_gds(c0)
@@ -10,17 +10,18 @@ from pathlib import PosixPath
 from pp import CONFIG
 import pp
 from pp.component import Component
+from pp.oasis import find_layout
 
 
 def get_component_path(name, dirpath=CONFIG["gdslib"]):
-    return dirpath / f"{name}.gds"
+    return find_layout(pathlib.Path(dirpath) / f"{name}.gds")
 
 
 def load_component_path(name, dirpath=CONFIG["gdslib"]):
-    """load component GDS from a library
+    """load component GDS (or OASIS) from a library
     returns a gdspath
     """
-    gdspath = dirpath / f"{name}.gds"
+    gdspath = find_layout(pathlib.Path(dirpath) / f"{name}.gds")
 
     if not os.path.isfile(gdspath):
         raise ValueError(f"cannot load `{gdspath}`")
@@ -35,7 +36,7 @@ def load_component(
     with_info_labels: bool = True,
     overwrite_cache: bool = False,
 ) -> Component:
-    """Returns Component from GDS, ports (CSV) and metadata (JSON)
+    """Returns Component from GDS (or OASIS), ports (CSV) and metadata (JSON)
 
     Args:
         name:
@@ -51,8 +52,9 @@ def load_component(
             )
 
         dirpath = pathlib.Path(dirpath)
-        gdspath = dirpath / f"{name}.gds"
+        gdspath = find_layout(dirpath / f"{name}.gds")
 
+    gdspath = pathlib.Path(gdspath)
     portspath = gdspath.with_suffix(".ports")
     jsonpath = gdspath.with_suffix(".json")
 
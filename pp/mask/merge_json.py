@@ -3,10 +3,14 @@
 """
 
 import json
+import itertools
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
 from omegaconf import OmegaConf
 import importlib
 from git import Repo
-from pp.config import CONFIG, logging, get_git_hash, write_config, conf
+from pp.config import CONFIG, logging, get_git_hash, complex_encoder, conf
+from pp import profiler
 
 
 def update_config_modules(config=conf):
@@ -27,47 +31,126 @@ def update_config_modules(config=conf):
     return config
 
 
+def _load_cells(filename):
+    with open(filename, "r") as f:
+        return json.load(f).get("cells") or {}
+
+
+def iter_cells(directories, max_workers=8, batch_size=1000):
+    """yields (cell_name, settings) from all the component JSON files
+    in directories. Files are loaded in parallel and cells are deduplicated by name.
+    A cell in several files takes the settings of the last file
+    (later directories override earlier ones)
+
+    Args:
+        directories: list of directories containing `*/*.json` component metadata
+        max_workers: number of threads loading JSON files
+        batch_size: number of files loaded at once
+    """
+    filenames = [
+        filename
+        for directory in directories
+        for filename in sorted(pathlib.Path(directory).glob("*/*.json"))
+    ]
+    # the last file wins: go through the files backwards and keep the first seen
+    filenames = iter(filenames[::-1])
+    seen = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # load in batches so we never hold more than batch_size files in memory
+        batch = list(itertools.islice(filenames, batch_size))
+        while batch:
+            for cells in executor.map(_load_cells, batch):
+                for name, settings in cells.items():
+                    if name not in seen:
+                        seen.add(name)
+                        yield name, settings
+            batch = list(itertools.islice(filenames, batch_size))
+
+
+@profiler.profile("metadata")
 def merge_json(
     doe_directory=CONFIG["doe_directory"],
     extra_directories=[CONFIG["gds_directory"]],
     jsonpath=CONFIG["mask_directory"] / "metadata.json",
     json_version=6,
     config=conf,
+    max_workers=8,
 ):
     """ Merge several JSON files from config.yml
     in the root of the mask directory, gets mask_name from there
 
+    cells are streamed into jsonpath as they are loaded, so they are never
+    all held in memory
+
     Args:
         mask_config_directory: defaults to current working directory
         json_version:
+        max_workers: number of threads loading JSON files
+
+    Returns:
+        metadata dict without cells
 
     """
     logging.debug("Merging JSON files:")
-    cells = {}
     config = config or {}
     update_config_modules(config=config)
 
-    for directory in extra_directories + [doe_directory]:
-        for filename in directory.glob("*/*.json"):
-            logging.debug(filename)
-            with open(filename, "r") as f:
-                data = json.load(f)
-                cells.update(data.get("cells"))
-
     does = {d.stem: json.loads(open(d).read()) for d in doe_directory.glob("*.json")}
     metadata = dict(
-        json_version=json_version,
-        cells=cells,
-        does=does,
-        config=OmegaConf.to_container(config),
+        json_version=json_version, does=does, config=OmegaConf.to_container(config),
     )
 
-    write_config(metadata, jsonpath)
+    cells = iter_cells(extra_directories + [doe_directory], max_workers=max_workers)
+    with open(jsonpath, "w") as f:
+        f.write('{\n  "cells": {')
+        for i, (name, settings) in enumerate(cells):
+            f.write(",\n    " if i else "\n    ")
+            f.write(f"{json.dumps(name)}: ")
+            f.write(json.dumps(settings, sort_keys=True, default=complex_encoder))
+        f.write("\n  }")
+        for key, value in sorted(metadata.items()):
+            f.write(f",\n  {json.dumps(key)}: ")
+            f.write(json.dumps(value, sort_keys=True, default=complex_encoder))
+        f.write("\n}\n")
+
     print(f"Wrote  metadata in {jsonpath}")
     logging.info(f"Wrote  metadata in {jsonpath}")
     return metadata
 
 
+def test_merge_json(tmp_path):
+    doe_directory = tmp_path / "doe"
+    for doe_name, cell_names in dict(doe1=["wg1", "wg2"], doe2=["wg2", "bend"]).items():
+        (doe_directory / doe_name).mkdir(parents=True)
+        for cell_name in cell_names:
+            cells = {cell_name: dict(name=cell_name), "pad": dict(name="pad")}
+            with open(doe_directory / doe_name / f"{cell_name}.json", "w") as f:
+                json.dump(dict(cells=cells), f)
+        with open(doe_directory / f"{doe_name}.json", "w") as f:
+            json.dump(dict(cells=cell_names), f)
+
+    jsonpath = tmp_path / "mask.json"
+    metadata = merge_json(
+        doe_directory=doe_directory, extra_directories=[], jsonpath=jsonpath
+    )
+    with open(jsonpath) as f:
+        data = json.load(f)
+    assert sorted(data["cells"]) == ["bend", "pad", "wg1", "wg2"]
+    assert data["does"] == metadata["does"]
+    assert data["does"]["doe2"] == dict(cells=["wg2", "bend"])
+
+
+def test_iter_cells_last_wins(tmp_path):
+    for directory, version in (("gds", 1), ("doe", 2)):
+        (tmp_path / directory / "mmi").mkdir(parents=True)
+        with open(tmp_path / directory / "mmi" / "mmi.json", "w") as f:
+            json.dump(dict(cells=dict(mmi=dict(version=version))), f)
+
+    directories = [tmp_path / "gds", tmp_path / "doe"]
+    assert dict(iter_cells(directories)) == dict(mmi=dict(version=2))
+    assert dict(iter_cells(directories[::-1])) == dict(mmi=dict(version=1))
+
+
 if __name__ == "__main__":
     d = merge_json()
     print(d)
@@ -2,8 +2,10 @@ import os
 from glob import glob
 
 from pp.config import logging, CONFIG
+from pp import profiler
 
 
+@profiler.profile("metadata")
 def merge_markdown(
     reports_directory=CONFIG["doe_directory"],
     mdpath=CONFIG["mask_directory"] / "report.md",
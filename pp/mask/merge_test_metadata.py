@@ -40,28 +40,27 @@ doe02:
     ...
 """
 
+import csv
 import pathlib
 import json
 import yaml
 from pp.config import CONFIG
+from pp import profiler
 
 
-def parse_csv_data(csv_labels_path):
-    with open(csv_labels_path) as f:
-        # Get all lines
-        lines = [line.replace("\n", "") for line in f.readlines()]
-
-        # Ignore labels for metrology structures
-        lines = [line for line in lines if not line.startswith("METR_")]
+def iter_csv_data(csv_labels_path):
+    """yields the non empty rows of a CSV labels file, one at a time"""
+    with open(csv_labels_path, newline="") as f:
+        for row in csv.reader(f):
+            row = [s.strip() for s in row if s.strip()]
 
-        # Split lines in fields
-        lines = [line.split(",") for line in lines]
+            # Ignore empty lines and labels for metrology structures
+            if row and not row[0].startswith("METR_"):
+                yield row
 
-        lines = [[s.strip() for s in splitted if s.strip()] for splitted in lines]
 
-        # Remove empty lines
-        lines = [line for line in lines if line]
-    return lines
+def parse_csv_data(csv_labels_path):
+    return list(iter_csv_data(csv_labels_path))
 
 
 def get_cell_from_label(label):
@@ -86,6 +85,7 @@ def load_yaml(filepath):
     return data
 
 
+@profiler.profile("metadata")
 def merge_test_metadata(gdspath=CONFIG["mask_gds"], labels_prefix="opt"):
     """ from a gds mask combines test_protocols and labels positions for each DOE
     Do a map cell: does
@@ -107,14 +107,13 @@ def merge_test_metadata(gdspath=CONFIG["mask_gds"], labels_prefix="opt"):
     assert csv_labels_path.exists(), f"missing CSV labels {csv_labels_path}"
 
     metadata = load_json(mask_json_path)
-    labels_list = parse_csv_data(csv_labels_path)
 
     does = metadata.pop("does")
     cells = metadata.pop("cells")
 
     c = {}
 
-    for label, x, y in labels_list:
+    for label, x, y in iter_csv_data(csv_labels_path):
         cell = get_cell_from_label(label)
         c[cell] = c.get(cell, dict())
         c[cell][label] = dict(x=x, y=y)
@@ -127,6 +126,19 @@ def merge_test_metadata(gdspath=CONFIG["mask_gds"], labels_prefix="opt"):
     return metadata
 
 
+def test_parse_csv_data(tmp_path):
+    csv_labels_path = tmp_path / "labels.csv"
+    csv_labels_path.write_text(
+        "opt_te_1550_(wg1)_0_W0, 0.0, 1.0\n\nMETR_1, 2, 3\nopt_te_1550_(wg2)_0_W0,5,6\n"
+    )
+    rows = parse_csv_data(csv_labels_path)
+    assert rows == [
+        ["opt_te_1550_(wg1)_0_W0", "0.0", "1.0"],
+        ["opt_te_1550_(wg2)_0_W0", "5", "6"],
+    ]
+    assert get_cell_from_label(rows[0][0]) == "wg1"
+
+
 if __name__ == "__main__":
     from pp import CONFIG
 
@@ -7,6 +7,7 @@ import csv
 import klayout.db as pya
 
 from pp import LAYER
+from pp import profiler
 
 
 def find_labels(gdspath, label_layer=LAYER.LABEL, prefix="opt_"):
@@ -35,9 +36,11 @@ def find_labels(gdspath, label_layer=LAYER.LABEL, prefix="opt_"):
                 yield text.string, transformed.x * dbu, transformed.y * dbu
 
 
+@profiler.profile("metadata")
 def write_labels(gdspath, label_layer=LAYER.LABEL, csv_filename=None, prefix="opt_"):
-    """Load  GDS mask and extracts the labels and coordinates from a GDS file"""
-    labels = list(find_labels(gdspath, label_layer=label_layer, prefix=prefix))
+    """Load  GDS mask and extracts the labels and coordinates from a GDS file
+    labels are streamed into the CSV file as they are found"""
+    labels = find_labels(gdspath, label_layer=label_layer, prefix=prefix)
 
     # Save the coordinates somewhere sensible
     if csv_filename is None:
@@ -8,6 +8,7 @@ import hashlib
 import numpy as np
 from phidl import Device
 from pp.add_pins import add_pins_and_outline
+from pp import profiler
 
 MAX_NAME_LENGTH = 32
 
@@ -99,7 +100,8 @@ def autoname(component_function: Callable) -> Callable:
         if cache and name in NAME_TO_DEVICE:
             return NAME_TO_DEVICE[name]
         else:
-            component = component_function(**kwargs)
+            with profiler.span("component", component_type):
+                component = component_function(**kwargs)
             component.name = name
             component.module = component_function.__module__
             component.function_name = component_function.__name__
@@ -0,0 +1,131 @@
+""" OASIS support
+
+gdspy only reads and writes GDSII, so OASIS files go through klayout,
+which writes them with CBLOCK compression and repetition detection.
+
+The output format is set in the config (`tech.layout_format: oas`)
+and every reader accepts both `.gds` and `.oas` paths.
+"""
+
+import hashlib
+import pathlib
+import tempfile
+from typing import Optional, Union
+
+import klayout.db as pya
+import numpy as np
+
+from pp.config import conf
+
+LAYOUT_SUFFIXES = (".gds", ".oas")
+OASIS_COMPRESSION_LEVEL = 10  # repetition detection effort (0 to 10)
+CACHE_DIRECTORY = pathlib.Path(tempfile.gettempdir()) / "pp_oasis"
+
+
+def get_suffix(layout_format: Optional[str] = None) -> str:
+    """returns the file suffix for a layout format (gds or oas)
+    defaults to the config `tech.layout_format`
+    """
+    layout_format = layout_format or conf.tech.layout_format
+    if layout_format not in ("gds", "oas"):
+        raise ValueError(f"layout_format `{layout_format}` not in (gds, oas)")
+    return "." + layout_format
+
+
+def find_layout(path: Union[str, pathlib.Path]) -> pathlib.Path:
+    """returns the existing GDS or OASIS file for a path (with or without suffix)
+    prefers the configured format when both exist
+    """
+    path = pathlib.Path(path)
+    if path.suffix in LAYOUT_SUFFIXES and path.exists():
+        return path
+
+    suffixes = sorted(LAYOUT_SUFFIXES, key=lambda suffix: suffix != get_suffix())
+    stem = path.with_suffix("") if path.suffix in LAYOUT_SUFFIXES else path
+    for suffix in suffixes:
+        if stem.with_name(stem.name + suffix).exists():
+            return stem.with_name(stem.name + suffix)
+    return path
+
+
+def is_oasis(path: Union[str, pathlib.Path]) -> bool:
+    return pathlib.Path(path).suffix == ".oas"
+
+
+def save_options(path: Union[str, pathlib.Path]) -> pya.SaveLayoutOptions:
+    """returns klayout save options for a GDS or OASIS path"""
+    options = pya.SaveLayoutOptions()
+    if is_oasis(path):
+        options.format = "OASIS"
+        options.oasis_compression_level = OASIS_COMPRESSION_LEVEL
+        options.oasis_write_cblocks = True
+        options.oasis_strict_mode = True
+    else:
+        options.format = "GDS2"
+    return options
+
+
+def write_layout(layout: Union[pya.Layout, pya.Cell], path: Union[str, pathlib.Path]):
+    """writes a klayout Layout (or Cell and its children) to GDS or OASIS"""
+    layout.write(str(path), save_options(path))
+
+
+def convert(src: Union[str, pathlib.Path], dst: Union[str, pathlib.Path]) -> str:
+    """converts between GDS and OASIS (formats from the suffixes)"""
+    layout = pya.Layout()
+    layout.read(str(src))
+    write_layout(layout, dst)
+    return str(dst)
+
+
+def get_gdspath(path: Union[str, pathlib.Path]) -> str:
+    """returns a GDS path that gdspy can read
+
+    OASIS files are converted once into a GDS cache, keyed by path and mtime
+    """
+    path = pathlib.Path(path)
+    if not is_oasis(path):
+        return str(path)
+
+    stat = path.stat()
+    key = f"{path.resolve()}{stat.st_mtime_ns}{stat.st_size}"
+    gdspath = CACHE_DIRECTORY / f"{hashlib.md5(key.encode()).hexdigest()}.gds"
+    if not gdspath.exists():
+        CACHE_DIRECTORY.mkdir(exist_ok=True, parents=True)
+        tmppath = gdspath.with_suffix(".tmp.gds")
+        convert(path, tmppath)
+        tmppath.replace(gdspath)
+    return str(gdspath)
+
+
+def test_oasis_roundtrip(tmp_path):
+    import pp
+
+    c = pp.c.mzi()
+    gdspath = pp.write_gds(c, tmp_path / "mzi.gds")
+    oaspath = pp.write_gds(c, tmp_path / "mzi.oas")
+    assert pathlib.Path(oaspath).stat().st_size < pathlib.Path(gdspath).stat().st_size
+
+    c2 = pp.import_gds(oaspath)
+    assert c2.name == c.name
+    assert c2.get_layers() == pp.import_gds(gdspath).get_layers()
+    assert np.allclose(c2.bbox, c.bbox)
+
+    # klayout may reorder polygon points, so compare the geometry with a XOR
+    gds, oas = pya.Layout(), pya.Layout()
+    gds.read(gdspath)
+    oas.read(oaspath)
+    for layer_index in gds.layer_indexes():
+        layer = oas.layer(gds.get_info(layer_index))
+        r1 = pya.Region(gds.top_cell().begin_shapes_rec(layer_index))
+        r2 = pya.Region(oas.top_cell().begin_shapes_rec(layer))
+        assert (r1 ^ r2).is_empty()
+    assert find_layout(tmp_path / "mzi") == tmp_path / f"mzi{get_suffix()}"
+
+
+if __name__ == "__main__":
+    import pp
+
+    c = pp.c.mzi()
+    oaspath = pp.write_gds(c, "mzi.oas")
+    pp.show(oaspath)
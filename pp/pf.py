@@ -14,6 +14,7 @@ from pp import CONFIG
 from pp.layers import LAYER
 from pp.config import logging
 from pp import klive
+from pp import profiler
 from pp.config import print_config
 
 # from pp.write_doe_from_yaml import write_doe_from_yaml
@@ -191,9 +192,31 @@ def build_clean(force):
 
 @click.command(name="build_devices")
 @click.argument("regex", required=False, default=".*")
-def build_devices(regex):
+@click.option(
+    "--pool", is_flag=True, default=False, help="Run the scripts in warm workers"
+)
+@click.option(
+    "--isolated", is_flag=True, default=False, help="One fresh worker per script"
+)
+@click.option("--timeout", default=None, type=float, help="Per script (seconds)")
+@click.option(
+    "--skip-unchanged",
+    is_flag=True,
+    default=False,
+    help="Skip the scripts that did not change since their last successful build",
+)
+def build_devices(regex, pool, isolated, timeout, skip_unchanged):
     """ Build all devices described in devices/"""
-    pb.build_devices(regex)
+    results = pb.build_devices(
+        regex,
+        mode="pool" if pool else "subprocess",
+        isolated=isolated,
+        timeout=timeout,
+        skip_unchanged=skip_unchanged,
+    )
+    for result in results:
+        if not result.ok:
+            print(f"{result.status}: {result.filename}")
 
 
 @click.command(name="build_does")
@@ -251,6 +274,13 @@ def test():
     subprocess.call(command)
 
 
+def write_profile():
+    """ Writes the build profile and prints where the time went """
+    tracepath = profiler.write_trace(CONFIG["build_directory"] / "profile.json")
+    profiler.report()
+    print(f"profile written to {tracepath}")
+
+
 @click.group()
 @click.option(
     "--version",
@@ -260,11 +290,21 @@ def test():
     is_eager=True,
     help="Show the version number.",
 )
-def cli():
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Time the build stages and write build/profile.json",
+)
+@click.pass_context
+def cli(ctx, profile):
     """ `pf` is the photonics factory command line tool.
     It helps to build, test, and configure masks and components.
     """
-    pass
+    if profile:
+        profiler.enable()
+        profiler.clear()
+        ctx.call_on_close(write_profile)
 
 
 log.add_command(log_show)
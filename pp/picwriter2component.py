@@ -8,6 +8,7 @@ import picwriter.toolkit as pt
 import picwriter.components as pc
 import pp
 from pp.component import Component
+from pp.derived_layers import inline_cladding
 
 
 gdspy.current_library = gdspy.GdsLibrary()
@@ -42,6 +43,10 @@ def picwriter2component(picwriter_object: pt.Component) -> Component:
         po.cell_hash
     ]  # Extract the relevant cells from the picwriter global cell list
 
+    # the cladding of the waveguide template can be deferred to the derived layers
+    clad = (po.wgt.clad_layer, po.wgt.clad_datatype)
+    skip = [] if inline_cladding([clad]) else [clad]
+
     ps = po_cell.get_polygonsets()
     for i in range(len(ps)):
         polygons = ps[i].polygons
@@ -49,7 +54,8 @@ def picwriter2component(picwriter_object: pt.Component) -> Component:
         datatypes = ps[i].datatypes
 
         for j in range(len(polygons)):
-            c.add_polygon(polygons[j], layer=(layers[j], datatypes[j]))
+            if (layers[j], datatypes[j]) not in skip:
+                c.add_polygon(polygons[j], layer=(layers[j], datatypes[j]))
 
     translate_by = po.port
     rotate_by = direction_to_degree(po.direction)
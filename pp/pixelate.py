@@ -1,4 +1,3 @@
-import itertools as it
 import numpy as np
 from pp.geo_utils import polygon_grow
 
@@ -40,17 +39,12 @@ def pixelate_path(
 
     print(scalings)
 
-    def _snap(x):
-        return round(int(x / snap_res), 0) * snap_res
-
-    def _gen_pixel(p, a):
-        x0, y0 = p
-        pix = [(x0 + a, y0 - a), (x0 + a, y0 + a), (x0 - a, y0 + a), (x0 - a, y0 - a)]
-        pix = [(_snap(_x), _snap(_y)) for _x, _y in pix]
-        return pix
-
-    a = pixel_size / 2
-    return [_gen_pixel(p, a * s) for p, s in zip(pts, scalings)]
+    # all pixels at once: (n_points, 4 corners, 2)
+    a = (pixel_size / 2 * scalings)[:, None]
+    corners = np.array([(1, -1), (1, 1), (-1, 1), (-1, -1)])
+    pixels = np.asarray(pts, dtype=float)[:, None, :] + a[:, :, None] * corners
+    pixels = np.trunc(pixels / snap_res) * snap_res
+    return [list(map(tuple, pixel)) for pixel in pixels.tolist()]
 
 
 def points_to_shapely(pts):
@@ -76,6 +70,7 @@ def _pixelate(
     nb_pixels_y=None,
     min_pixel_size=0.4,
     snap_res=0.05,
+    merge=False,
 ):
     """
     Pixelates a shape (as 2d array) onto an NxN grid.
@@ -83,11 +78,10 @@ def _pixelate(
     Arguments:
         pts: The 2D array to be pixelated
         N: The number of pixels on an edge of the grid
+        merge: merges adjacent pixels into rectangles
     Returns:
         A list of pixel bounding boxes
     """
-    from shapely import geometry
-
     shape = points_to_shapely(pts)  # convert to shapely
     if not shape:
         return []
@@ -127,18 +121,119 @@ def _pixelate(
     ys = np.linspace(south + h / 2 - ay, north - h / 2 + ay, nb_pixels_y)
     xs = _snap_to_resolution(xs, snap_res)
     ys = _snap_to_resolution(ys, snap_res)
-    grid = it.product(xs, ys)
 
-    pixels = []
+    hit = _rasterize(np.asarray(shape.exterior.coords), xs, ys, w, h)
+    ix, iy = np.nonzero(hit)
+    x, y = xs[ix], ys[iy]
+    pixels = np.stack([x - w / 2, y - h / 2, x + w / 2, y + h / 2], axis=1)
+    pixels = [tuple(pixel) for pixel in pixels.tolist()]
+    if merge:
+        pixels = merge_pixels(pixels)
+    return pixels
 
-    for x, y in grid:
-        _w, _s, _e, _n = x - w / 2, y - h / 2, x + w / 2, y + h / 2
-        newpix = geometry.box(_w, _s, _e, _n)
-        if shape.intersects(newpix):
-            r = (_w, _s, _e, _n)
 
-            pixels.append(r)
-    return pixels
+def _rasterize(ring, xs, ys, w, h, max_chunk_size=2 ** 22):
+    """Returns a (len(xs), len(ys)) boolean array of the w x h pixels centered
+    on the grid xs x ys that intersect (or touch) the polygon ``ring``.
+
+    A pixel intersects the polygon if its center is inside (even-odd rule)
+    or if any polygon edge crosses the pixel box (Liang-Barsky clipping).
+    Both tests are separable in x and y, so they are broadcast over the
+    whole grid and evaluated in chunks of edges to bound memory.
+    """
+    p0 = ring[:-1] if np.allclose(ring[0], ring[-1]) else ring
+    p1 = np.roll(p0, -1, axis=0)
+    nx, ny = len(xs), len(ys)
+    hit = np.zeros((nx, ny), dtype=bool)
+    inside = np.zeros((nx, ny), dtype=bool)
+    chunk = max(1, max_chunk_size // max(1, nx * ny))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(0, len(p0), chunk):
+            x0, y0 = p0[i : i + chunk, 0], p0[i : i + chunk, 1]
+            x1, y1 = p1[i : i + chunk, 0], p1[i : i + chunk, 1]
+            dx, dy = x1 - x0, y1 - y0
+
+            # edge crossing: parametric range t of the edge inside each slab
+            tx0, tx1 = _clip_slab(x0, dx, xs - w / 2, xs + w / 2)
+            ty0, ty1 = _clip_slab(y0, dy, ys - h / 2, ys + h / 2)
+            t0 = np.maximum(tx0[:, None, :], ty0[None, :, :])
+            t1 = np.minimum(tx1[:, None, :], ty1[None, :, :])
+            hit |= (t0 <= t1).any(axis=2)
+
+            # even-odd rule for the pixel centers
+            crosses_row = (y0 > ys[:, None]) != (y1 > ys[:, None])
+            x_cross = x0 + (ys[:, None] - y0) * dx / dy
+            crossings = crosses_row[None, :, :] & (
+                xs[:, None, None] < x_cross[None, :, :]
+            )
+            inside ^= (crossings.sum(axis=2) % 2).astype(bool)
+
+    return hit | inside
+
+
+def _clip_slab(p, dp, low, high):
+    """Liang-Barsky clipping of the segments p + t * dp (t in [0, 1]) against
+    each slab [low, high]. Returns t_enter, t_exit arrays of shape
+    (n_slabs, n_segments), with t_enter > t_exit when they do not overlap.
+    """
+    t_low = (low[:, None] - p) / dp
+    t_high = (high[:, None] - p) / dp
+    t_enter = np.maximum(np.minimum(t_low, t_high), 0)
+    t_exit = np.minimum(np.maximum(t_low, t_high), 1)
+
+    # segments parallel to the slab are either fully in or fully out
+    parallel = dp == 0
+    in_slab = (low[:, None] <= p) & (p <= high[:, None])
+    t_enter = np.where(parallel, np.where(in_slab, 0.0, 2.0), t_enter)
+    t_exit = np.where(parallel, np.where(in_slab, 1.0, -1.0), t_exit)
+    return t_enter, t_exit
+
+
+def merge_pixels(pixels):
+    """Merges adjacent or overlapping pixel boxes (west, south, east, north)
+    into larger rectangles to reduce the number of polygons.
+
+    Pixels are first merged into vertical runs within each column, and then
+    identical runs in neighbouring columns are merged horizontally.
+    """
+    if not pixels:
+        return []
+    boxes = np.array(pixels, dtype=float)
+    boxes = boxes[np.lexsort((boxes[:, 1], boxes[:, 0]))]
+
+    columns = []
+    for column in np.split(boxes, np.nonzero(np.diff(boxes[:, 0]))[0] + 1):
+        breaks = np.nonzero(column[1:, 1] > column[:-1, 3] + 1e-9)[0] + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(column)]]) - 1
+        columns += [
+            np.stack(
+                [
+                    column[starts, 0],
+                    column[starts, 1],
+                    column[starts, 2],
+                    column[ends, 3],
+                ],
+                axis=1,
+            )
+        ]
+    runs = np.concatenate(columns)
+    runs = runs[np.lexsort((runs[:, 0], runs[:, 3], runs[:, 1]))]
+
+    merged = []
+    for run in runs.tolist():
+        last = merged[-1] if merged else None
+        if (
+            last
+            and np.isclose(last[1], run[1])
+            and np.isclose(last[3], run[3])
+            and run[0] <= last[2] + 1e-9
+        ):
+            last[2] = max(last[2], run[2])
+        else:
+            merged.append(run)
+    return [tuple(r) for r in merged]
 
 
 def rect_to_coords(r):
@@ -170,8 +265,47 @@ def gen_op_blocking(pts, snap_res=0.05, margin=0.3):
     return polygon_grow(pts, margin)
 
 
+def test_pixelate():
+    from shapely import geometry
+
+    pts = polygon_grow([(x, 2 * x ** 2) for x in np.linspace(0, 2, 9)], 0.5)
+    pixels = _pixelate(pts, N=40, min_pixel_size=None)
+
+    shape = points_to_shapely(pts)
+    xs = sorted(set(0.5 * (p[0] + p[2]) for p in pixels))
+    assert pixels
+    assert all(shape.intersects(geometry.box(*p)) for p in pixels)
+
+    # the pixels just outside of each column must not touch the shape
+    w = pixels[0][2] - pixels[0][0]
+    h = pixels[0][3] - pixels[0][1]
+    for x in xs:
+        column = [p for p in pixels if np.isclose(0.5 * (p[0] + p[2]), x)]
+        south = min(p[1] for p in column) - h / 2
+        north = max(p[3] for p in column) + h / 2
+        assert not shape.intersects(
+            geometry.box(x - w / 2, south - h, x + w / 2, south)
+        )
+        assert not shape.intersects(
+            geometry.box(x - w / 2, north, x + w / 2, north + h)
+        )
+
+
+def test_merge_pixels():
+    from shapely.ops import unary_union
+    from shapely import geometry
+
+    pts = [(0, 0), (4, 0), (4, 1), (1, 1), (1, 4), (0, 4)]
+    pixels = _pixelate(pts, N=20, min_pixel_size=None)
+    merged = merge_pixels(pixels)
+    assert len(merged) < len(pixels)
+
+    union = unary_union([geometry.box(*p) for p in pixels])
+    union_merged = unary_union([geometry.box(*p) for p in merged])
+    assert np.isclose(union.symmetric_difference(union_merged).area, 0)
+
+
 if __name__ == "__main__":
-    import numpy as np
 
     pts = [(x, x ** 2) for x in np.linspace(0, 1, 5)]
     c = pixelate(pts)
@@ -29,6 +29,7 @@ YAML defines component DOE settings and placement
         A-B1-2: doe1
 """
 
+import itertools
 import os
 import sys
 from omegaconf import OmegaConf
@@ -36,9 +37,12 @@ from omegaconf import OmegaConf
 import pp
 from pp.doe import get_settings_list, load_does
 from pp.config import CONFIG
+from pp.oasis import find_layout, get_suffix
+from pp.component import ComponentArray
 from pp.components import component_factory
 from pp.write_component import write_gds
 from pp.write_component import write_component_report
+from pp import profiler
 
 
 def _print(*args, **kwargs):
@@ -49,24 +53,50 @@ def _print(*args, **kwargs):
 def placer_grid_cell_refs(
     component_factory, cols=1, rows=1, dx=10.0, dy=10.0, x0=0, y0=0, **settings
 ):
+    """returns references placed on a grid, column by column
+
+    consecutive copies of the same component in a column
+    are placed as one GDS array reference (AREF)
+    """
     if callable(component_factory):
         settings_list = get_settings_list(**settings)
         component_list = [component_factory(**s) for s in settings_list]
     else:
         component_list = component_factory
 
-    indices = [(i, j) for j in range(cols) for i in range(rows)]
-
     if rows * cols < len(component_list):
         raise ValueError(
             "Shape ({}, {}): Not enough emplacements ({}) for all these components ({}).".format(
-                rows, cols, len(indices), len(component_list)
+                rows, cols, rows * cols, len(component_list)
             )
         )
+
+    if len(component_list) == rows * cols and len(set(map(id, component_list))) == 1:
+        return [
+            ComponentArray(
+                component_list[0],
+                columns=cols,
+                rows=rows,
+                spacing=(dx, dy),
+                origin=(x0, y0),
+            )
+        ]
+
     components = []
-    for component, (i, j) in zip(component_list, indices):
-        c_ref = component.ref(position=(x0 + j * dx, y0 + i * dy))
-        components += [c_ref]
+    for j in range(cols):
+        i = 0
+        column = component_list[j * rows : (j + 1) * rows]
+        for _, run in itertools.groupby(column, key=id):
+            run = list(run)
+            origin = (x0 + j * dx, y0 + i * dy)
+            if len(run) > 1:
+                c_ref = ComponentArray(
+                    run[0], columns=1, rows=len(run), spacing=(dx, dy), origin=origin
+                )
+            else:
+                c_ref = run[0].ref(position=origin)
+            components += [c_ref]
+            i += len(run)
 
     return components
 
@@ -286,6 +316,7 @@ def load_placer_with_does(filepath, defaults={"do_permutation": True}):
 CONTENT_SEP = " , "
 
 
+@profiler.profile("save_doe")
 def save_doe(doe_name, components, doe_root_path=None, precision=1e-9):
     """
     Save all components from this DOE in a tmp cache folder
@@ -303,7 +334,7 @@ def save_doe(doe_name, components, doe_root_path=None, precision=1e-9):
         fw.write(CONTENT_SEP.join(component_names))
 
     for c in components:
-        gdspath = os.path.join(doe_dir, c.name + ".gds")
+        gdspath = os.path.join(doe_dir, c.name + get_suffix())
         write_gds(c, gdspath=gdspath, precision=precision)
         write_component_report(c, json_path=gdspath[:-4] + ".json")
 
@@ -319,7 +350,7 @@ def load_doe_from_cache(doe_name, doe_root_path=None):
     with open(content_file) as f:
         component_names = f.read().split(CONTENT_SEP)
 
-    gdspaths = [os.path.join(doe_dir, name + ".gds") for name in component_names]
+    gdspaths = [find_layout(os.path.join(doe_dir, name)) for name in component_names]
     components = [pp.import_gds(gdspath) for gdspath in gdspaths]
     return components
 
@@ -364,10 +395,18 @@ def doe_exists(doe_name, list_settings, doe_root_path=None):
     return False
 
 
-def component_grid_from_yaml(filepath, precision=1e-9):
+@profiler.profile("placement")
+def component_grid_from_yaml(filepath, precision=1e-9, doe_name_to_components=None):
     """ Returns a Component composed of DOEs/components given in a yaml file
     allows for each DOE to have its own x and y spacing (more flexible than method1)
+
+    Args:
+        filepath: YAML
+        precision: for saving the DOEs in the cache
+        doe_name_to_components: already built DOEs,
+            such as returned by generate_does(shared_memory=True)
     """
+    doe_name_to_components = doe_name_to_components or {}
     input_does = OmegaConf.load(str(filepath))
     mask_settings = input_does["mask"]
     does = load_does(filepath)
@@ -395,10 +434,10 @@ def component_grid_from_yaml(filepath, precision=1e-9):
             doe["cache_enabled"] if "cache_enabled" in doe else default_cache_enabled
         )
 
-        components = None
+        components = doe_name_to_components.get(doe_name)
 
         # If cache enabled, attempt to load from cache
-        if cache_enabled:
+        if components is None and cache_enabled:
             try:
                 components = load_doe_from_cache(doe_name)
             except Exception as e:
@@ -535,5 +574,17 @@ def build_components(
     return components
 
 
+def test_placer_grid_cell_refs():
+    c1 = pp.c.pad()
+    c2 = pp.c.rectangle()
+    refs = placer_grid_cell_refs([c1] * 6, cols=3, rows=2, dx=200, dy=300)
+    assert len(refs) == 1
+    assert refs[0].columns == 3 and refs[0].rows == 2
+
+    refs = placer_grid_cell_refs([c1, c1, c2, c1, c1], cols=3, rows=2, dx=200, dy=300)
+    assert [getattr(r, "rows", 1) for r in refs] == [2, 1, 1, 1]
+    assert tuple(refs[-1].origin) == (400, 0)
+
+
 if __name__ == "__main__":
     pass
@@ -1,6 +1,8 @@
 from typing import Callable
-from typing import Any, List, Optional, Tuple, Dict, Union
+from typing import Any, Iterable, List, Optional, Tuple, Dict, Union
+import bisect
 import functools
+import weakref
 from copy import deepcopy
 import csv
 import numpy as np
@@ -10,6 +12,7 @@ from phidl.device_layout import Device
 from pp.drc import snap_to_grid
 
 port_types = ["optical", "rf", "dc", "heater"]
+_INDEXED_ATTRIBUTES = frozenset(["midpoint", "orientation", "layer", "port_type"])
 
 
 class Port(PortPhidl):
@@ -38,20 +41,46 @@ class Port(PortPhidl):
         layer: Tuple[int, int] = (1, 0),
         port_type: str = "optical",
     ) -> None:
-        self.name = name
-        self.midpoint = np.array(midpoint, dtype="float64")
-        self.width = width
-        self.orientation = np.mod(orientation, 360)
-        self.parent = parent
-        self.info = {}
-        self.uid = Port._next_uid
-        self.layer = layer
-        self.port_type = port_type
+        # set directly, as a new port has no index to update
+        self.__dict__.update(
+            name=name,
+            midpoint=np.array(midpoint, dtype="float64"),
+            width=width,
+            orientation=np.mod(orientation, 360),
+            parent=parent,
+            info={},
+            uid=Port._next_uid,
+            layer=layer,
+            port_type=port_type,
+        )
 
         if self.width < 0:
             raise ValueError("[PHIDL] Port creation error: width must be >=0")
         self._next_uid += 1
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name in _INDEXED_ATTRIBUTES:
+            self._changed()
+
+    def _changed(self) -> None:
+        """drops the port index of the parent component
+        and of the other components that hold the port
+        """
+        parent = self.__dict__.get("parent")
+        ports = getattr(parent, "__dict__", {}).get("ports")
+        if isinstance(ports, PortDict):
+            ports.index = None
+        for port_dict in self.__dict__.get("_port_dicts", ()):
+            ports = port_dict()
+            if ports is not None:
+                ports.index = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state.pop("_port_dicts", None)
+        return state
+
     def __repr__(self) -> str:
         return (
             "Port (name {}, midpoint {}, width {}, orientation {}, layer {},"
@@ -135,6 +164,221 @@ class Port(PortPhidl):
             )
 
 
+DIRECTIONS = "ENWS"
+
+
+def get_directions(orientations: Iterable[float]) -> np.ndarray:
+    """returns the side that each orientation faces (0: E, 1: N, 2: W, 3: S)"""
+    angle = np.mod(np.asarray(orientations, dtype=float), 360)
+    return np.select(
+        [(angle <= 45) | (angle >= 315), angle <= 135, angle <= 225], [0, 1, 2], 3
+    )
+
+
+def _hashable(layer):
+    return tuple(layer) if isinstance(layer, list) else layer
+
+
+def _group(keys: List[Any]) -> Dict[Any, np.ndarray]:
+    """returns {key: indices of the key}, keys in order of appearance"""
+    codes = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+    if len(codes) == 1:
+        return {keys[0]: np.arange(len(keys))}
+    codes_array = np.array([codes[key] for key in keys], dtype=int)
+    return {key: np.flatnonzero(codes_array == i) for key, i in codes.items()}
+
+
+class PortIndex:
+    """structure of arrays view of some ports, to select and sort them
+    with numpy instead of scanning them with python predicates
+
+    Components keep the index of their ports (`Component.get_port_index`)
+    until a port is added, removed, renamed or changed (moved, rotated ...)
+
+    Args:
+        ports: {port name: Port} or list of ports
+    """
+
+    def __init__(self, ports: Union[Dict[str, Port], List[Port]]) -> None:
+        if isinstance(ports, dict):
+            self.names = list(ports.keys())
+            self.ports = list(ports.values())
+        else:
+            self.ports = list(ports)
+            self.names = [p.name for p in self.ports]
+        n = len(self.ports)
+        xy = np.concatenate([p.midpoint for p in self.ports] or [[]]).reshape(n, 2)
+        self.x = xy[:, 0].astype(float)
+        self.y = xy[:, 1].astype(float)
+        self.orientation = np.fromiter(
+            [p.orientation for p in self.ports], dtype=float, count=n
+        )
+        self.direction = get_directions(self.orientation)
+        self.by_direction = {
+            d: np.flatnonzero(self.direction == i) for i, d in enumerate(DIRECTIONS)
+        }
+        self.by_port_type = _group([p.port_type for p in self.ports])
+        self._by_layer = None
+        self._by_prefix = {}
+        self._names_sorted = None
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    @property
+    def by_layer(self) -> Dict[Any, np.ndarray]:
+        if self._by_layer is None:
+            self._by_layer = _group([_hashable(p.layer) for p in self.ports])
+        return self._by_layer
+
+    def _select_prefix(self, prefix: str) -> np.ndarray:
+        """returns the indices of the names that start with prefix
+        (bisection of the sorted names, cached by prefix)
+        """
+        if prefix in self._by_prefix:
+            return self._by_prefix[prefix]
+        if self._names_sorted is None:
+            names = [str(name) for name in self.names]
+            order = sorted(range(len(names)), key=names.__getitem__)
+            order = np.array(order, dtype=int)
+            self._names_sorted = ([names[i] for i in order], order)
+        names, order = self._names_sorted
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        index = self._by_prefix[prefix] = np.sort(order[start:end])
+        return index
+
+    def select(
+        self,
+        port_type: Optional[Union[str, Tuple[int, int]]] = None,
+        prefix: Optional[str] = None,
+        direction: Optional[str] = None,
+    ) -> np.ndarray:
+        """returns the indices (in port order) of the ports
+        of a port_type (or layer), with a name prefix and facing a direction (ENWS)
+        """
+        index = np.arange(len(self.ports))
+        if port_type is not None:
+            port_type = _hashable(port_type)
+            empty = np.zeros(0, dtype=int)
+            index = np.union1d(
+                self.by_port_type.get(port_type, empty),
+                self.by_layer.get(port_type, empty),
+            )
+        if prefix:
+            index = np.intersect1d(index, self._select_prefix(prefix))
+        if direction is not None:
+            index = np.intersect1d(index, self.by_direction[direction])
+        return index
+
+    def sort(self, index: np.ndarray, *keys: str) -> np.ndarray:
+        """returns index sorted by keys (x, y, -x or -y), first key first
+        ties keep the port order
+        """
+        if not keys or len(index) == 0:
+            return index
+        columns = [
+            -getattr(self, key[1:])[index]
+            if key[0] == "-"
+            else getattr(self, key)[index]
+            for key in reversed(keys)
+        ]
+        return index[np.lexsort(columns)]
+
+    def update_names(self, names: List[str]) -> None:
+        """sets the names of the ports (after renaming them in place)"""
+        self.names = names
+        self._by_prefix = {}
+        self._names_sorted = None
+
+    def get_ports(self, index: np.ndarray) -> List[Port]:
+        return [self.ports[i] for i in index.tolist()]
+
+    def get_dict(self, index: np.ndarray) -> Dict[str, Port]:
+        return {self.names[i]: self.ports[i] for i in index.tolist()}
+
+
+class PortDict(dict):
+    """ports dict {port name: Port} of a Component, that keeps their PortIndex
+    (dropped when the dict changes)
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.index = None
+        for port in self.values():
+            self._hold(port)
+
+    def _hold(self, port) -> None:
+        """keeps a reference to this dict on the ports of another parent
+        (ports of a reference), so that moving them drops this index
+        """
+        if not isinstance(port, Port):
+            return
+        parent = port.__dict__.get("parent")
+        if getattr(parent, "__dict__", {}).get("ports") is self:
+            return
+        port_dicts = port.__dict__.setdefault("_port_dicts", [])
+        if not any(port_dict() is self for port_dict in port_dicts):
+            port_dicts.append(weakref.ref(self))
+
+    def __reduce__(self):
+        return (PortDict, (dict(self),))
+
+    def get_index(self) -> PortIndex:
+        if self.index is None:
+            self.index = PortIndex(self)
+        return self.index
+
+    def __setitem__(self, key, value) -> None:
+        self.index = None
+        self._hold(value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        self.index = None
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self.index = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self.index = None
+        return super().popitem()
+
+    def clear(self) -> None:
+        self.index = None
+        super().clear()
+
+    def update(self, *args, **kwargs) -> None:
+        self.index = None
+        super().update(*args, **kwargs)
+        for port in self.values():
+            self._hold(port)
+
+    def setdefault(self, key, default=None):
+        self.index = None
+        value = super().setdefault(key, default)
+        self._hold(value)
+        return value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+def get_port_index(ports) -> PortIndex:
+    """returns the PortIndex of a Component, ComponentReference,
+    ports dict or list of ports (kept by Components)
+    """
+    if hasattr(ports, "get_port_index"):
+        return ports.get_port_index()
+    if isinstance(ports, PortDict):
+        return ports.get_index()
+    return PortIndex(ports)
+
+
 def read_port_markers(gdspath, layers=[(69, 0)]):
     """loads a GDS and returns the extracted device for a particular layer
 
@@ -177,21 +421,8 @@ def select_ports(
         Dictionnary containing only the ports with the wanted type(s)
         {port name: port}
     """
-
-    from pp.component import Component, ComponentReference
-
-    # Make it accept Component or ComponentReference
-    if isinstance(ports, Component) or isinstance(ports, ComponentReference):
-        ports = ports.ports
-
-    ports = {
-        p_name: p
-        for p_name, p in ports.items()
-        if p.port_type == port_type or p.layer == port_type
-    }
-    if prefix:
-        ports = {p_name: p for p_name, p in ports.items() if p_name.startswith(prefix)}
-    return ports
+    index = get_port_index(ports)
+    return index.get_dict(index.select(port_type=port_type, prefix=prefix))
 
 
 def select_optical_ports(ports: Dict[str, Port], prefix=None) -> Dict[str, Port]:
@@ -217,38 +448,14 @@ def move_copy(port, x=0, y=0):
 
 
 def get_ports_facing(ports, direction="W"):
-    from pp.component import Component, ComponentReference
-
-    if isinstance(ports, dict):
-        ports = list(ports.values())
-    elif isinstance(ports, Component) or isinstance(ports, ComponentReference):
-        ports = list(ports.ports.values())
-
-    direction_ports = {x: [] for x in ["E", "N", "W", "S"]}
-
-    for p in ports:
-        angle = p.orientation % 360
-        if angle <= 45 or angle >= 315:
-            direction_ports["E"].append(p)
-        elif angle <= 135 and angle >= 45:
-            direction_ports["N"].append(p)
-        elif angle <= 225 and angle >= 135:
-            direction_ports["W"].append(p)
-        else:
-            direction_ports["S"].append(p)
-
-    return direction_ports[direction]
+    index = get_port_index(ports)
+    return index.get_ports(index.select(direction=direction))
 
 
 def get_non_optical_ports(ports):
-    from pp.component import Component, ComponentReference
-
-    if isinstance(ports, dict):
-        ports = list(ports.values())
-    elif isinstance(ports, Component) or isinstance(ports, ComponentReference):
-        ports = list(ports.ports.values())
-    res = [p for p in ports if p.port_type not in ["optical"]]
-    return res
+    index = get_port_index(ports)
+    optical = index.by_port_type.get("optical", [])
+    return index.get_ports(np.setdiff1d(np.arange(len(index)), optical))
 
 
 def deco_rename_ports(component_factory: Callable) -> Callable:
@@ -261,24 +468,50 @@ def deco_rename_ports(component_factory: Callable) -> Callable:
     return auto_named_component_factory
 
 
-def _rename_ports_facing_side(
-    direction_ports: Dict[str, List[Port]], prefix: str = ""
+def _rename_ports_by_direction(
+    index: PortIndex, selected: np.ndarray, prefix: str = ""
+) -> None:
+    """renames the selected ports by side (E0, E1 ... N0 ...)
+    sorted along y (E, W) or x (N, S)
+    """
+    for direction in DIRECTIONS:
+        keys = ("y", "x") if direction in "EW" else ("x", "y")
+        ports = index.sort(
+            np.intersect1d(selected, index.by_direction[direction]), *keys
+        )
+        for i, p in enumerate(index.get_ports(ports)):
+            p.name = prefix + direction + str(i)
+
+
+def _rename_ports_counter_clockwise(
+    index: PortIndex, selected: np.ndarray, prefix: str = ""
 ) -> None:
-    for direction, list_ports in list(direction_ports.items()):
+    """renames the selected ports counter clockwise from the south east corner"""
+    ports = []
+    for direction, key in zip(DIRECTIONS, ("y", "-x", "-y", "x")):
+        ports += index.get_ports(
+            index.sort(np.intersect1d(selected, index.by_direction[direction]), key)
+        )
+    for i, p in enumerate(ports):
+        p.name = "{}{}".format(prefix, i)
+
 
-        if direction in ["E", "W"]:
-            # first sort along x then y
-            list_ports.sort(key=lambda p: p.x)
-            list_ports.sort(key=lambda p: p.y)
+def _set_parent(ports: List[Port], component: object) -> None:
+    for p in ports:
+        if p.parent is not component:
+            p.parent = component
 
-        if direction in ["S", "N"]:
-            # first sort along y then x
-            list_ports.sort(key=lambda p: p.y)
-            list_ports.sort(key=lambda p: p.x)
 
-        for i, p in enumerate(list_ports):
-            lbl = prefix + direction + str(i)
-            p.name = lbl
+def _set_renamed_ports(component: object, index: PortIndex) -> None:
+    """sets the ports dict with the new port names
+    keeping the index, as the ports only changed names
+    """
+    names = [p.name for p in index.ports]
+    ports = PortDict(zip(names, index.ports))
+    if len(ports) == len(index):
+        index.update_names(names)
+        ports.index = index
+    component.ports = ports
 
 
 def rename_ports_by_orientation(
@@ -286,95 +519,49 @@ def rename_ports_by_orientation(
 ) -> object:
     """Returns Component with port names based on port orientation (E, N, W, S)"""
 
-    direction_ports = {x: [] for x in ["E", "N", "W", "S"]}
-    ports_on_process = [
-        p for p in component.ports.values() if p.layer not in layers_excluded
-    ]
+    index = get_port_index(component.ports)
+    excluded = [index.by_layer.get(_hashable(layer), []) for layer in layers_excluded]
+    selected = np.setdiff1d(np.arange(len(index)), np.concatenate([[], *excluded]))
 
-    for p in ports_on_process:
-        # Make sure we can backtrack the parent component from the port
-        p.parent = component
-
-        angle = p.orientation % 360
-        if angle <= 45 or angle >= 315:
-            direction_ports["E"].append(p)
-        elif angle <= 135 and angle >= 45:
-            direction_ports["N"].append(p)
-        elif angle <= 225 and angle >= 135:
-            direction_ports["W"].append(p)
-        else:
-            direction_ports["S"].append(p)
+    # Make sure we can backtrack the parent component from the port
+    _set_parent(index.get_ports(selected), component)
 
-    _rename_ports_facing_side(direction_ports)
-    component.ports = {p.name: p for p in component.ports.values()}
+    _rename_ports_by_direction(index, selected)
+    _set_renamed_ports(component, index)
     return component
 
 
 def auto_rename_ports(component: object) -> object:
     """Returns Component with port names based on port orientation (E, N, W, S)"""
 
-    def _counter_clockwise(_direction_ports, prefix=""):
-
-        east_ports = _direction_ports["E"]
-        east_ports.sort(key=lambda p: p.y)  # sort south to north
-
-        north_ports = _direction_ports["N"]
-        north_ports.sort(key=lambda p: -p.x)  # sort east to west
-
-        west_ports = _direction_ports["W"]
-        west_ports.sort(key=lambda p: -p.y)  # sort north to south
-
-        south_ports = _direction_ports["S"]
-        south_ports.sort(key=lambda p: p.x)  # sort west to east
-
-        ports = east_ports + north_ports + west_ports + south_ports
-
-        for i, p in enumerate(ports):
-            p.name = "{}{}".format(prefix, i)
-
     type_to_ports_naming_functions = {
-        "optical": _rename_ports_facing_side,
-        "heater": lambda _d: _counter_clockwise(_d, "H_"),
-        "dc": lambda _d: _counter_clockwise(_d, "E_"),
-        "superconducting": lambda _d: _counter_clockwise(_d, "SC_"),
+        "optical": _rename_ports_by_direction,
+        "heater": lambda _i, _s: _rename_ports_counter_clockwise(_i, _s, "H_"),
+        "dc": lambda _i, _s: _rename_ports_counter_clockwise(_i, _s, "E_"),
+        "superconducting": lambda _i, _s: _rename_ports_counter_clockwise(
+            _i, _s, "SC_"
+        ),
     }
 
-    type_to_ports = {}
+    index = get_port_index(component.ports)
 
-    for p in component.ports.values():
-        if p.port_type not in type_to_ports:
-            type_to_ports[p.port_type] = []
-        type_to_ports[p.port_type] += [p]
-
-    for port_type, port_group in type_to_ports.items():
+    for port_type, port_group in index.by_port_type.items():
         if port_type in type_to_ports_naming_functions:
             _func_name_ports = type_to_ports_naming_functions[port_type]
         else:
             raise ValueError(
                 "Unknown port type <{}> in component {}, port {}".format(
-                    port_type, component.name, p
+                    port_type, component.name, index.ports[port_group[0]]
                 )
             )
 
         # Make sure we can backtrack the parent component from the port
+        _set_parent(index.get_ports(port_group), component)
 
-        direction_ports = {x: [] for x in ["E", "N", "W", "S"]}
-        for p in port_group:
-            p.parent = component
-            angle = p.orientation % 360
-            if angle <= 45 or angle >= 315:
-                direction_ports["E"].append(p)
-            elif angle <= 135 and angle >= 45:
-                direction_ports["N"].append(p)
-            elif angle <= 225 and angle >= 135:
-                direction_ports["W"].append(p)
-            else:
-                direction_ports["S"].append(p)
-
-        _func_name_ports(direction_ports)
+        _func_name_ports(index, port_group)
 
     # Set the port dictionnary with the new names
-    component.ports = {p.name: p for p in component.ports.values()}
+    _set_renamed_ports(component, index)
     return component
 
 
@@ -394,6 +581,48 @@ def test_select_ports_type():
     assert len(ports) == 3
 
 
+def test_port_index():
+    import pickle
+    import pp
+
+    c = pp.Component()
+    c.add_port(name="W0", midpoint=(0, 0), width=0.5, orientation=180)
+    c.add_port(name="E0", midpoint=(10, 0), width=0.5, orientation=0)
+    c.add_port(name="E_0", midpoint=(5, 5), orientation=90, port_type="dc")
+    index = c.get_port_index()
+    assert c.get_port_index() is index
+    assert [p.name for p in get_ports_facing(c, "E")] == ["E0"]
+    assert list(select_ports(c, prefix="E")) == ["E0"]
+
+    c.add_port(name="E1", midpoint=(10, 1), width=0.5, orientation=0)
+    assert c.get_port_index() is not index
+    assert list(select_ports(c, prefix="E")) == ["E0", "E1"]
+
+    c.ports["E1"].orientation = 90
+    assert [p.name for p in get_ports_facing(c, "N")] == ["E_0", "E1"]
+    c.rotate(90)
+    assert [p.name for p in get_ports_facing(c, "W")] == ["E_0", "E1"]
+    c.ports.pop("E1")
+    assert [p.name for p in get_non_optical_ports(c)] == ["E_0"]
+
+    auto_rename_ports(c)
+    assert list(c.ports) == ["S0", "N0", "E_0"]
+    assert [p.name for p in get_ports_facing(c, "N")] == ["N0"]
+    assert list(pickle.loads(pickle.dumps(c.ports))) == list(c.ports)
+
+
+def test_port_index_reference_ports():
+    import pp
+
+    c = pp.Component()
+    r = c << pp.c.waveguide()
+    c.ports["a"] = r.ports["E0"]
+    assert [p.name for p in get_ports_facing(c, "E")] == ["E0"]
+    c.rotate(90)
+    assert not get_ports_facing(c, "E")
+    assert [p.name for p in get_ports_facing(c, "N")] == ["E0"]
+
+
 if __name__ == "__main__":
     test_select_ports_type()
 
@@ -0,0 +1,324 @@
+""" build profiler
+
+Spans around the stages of a mask build (component construction, routing,
+hashing, GDS write, placement, metadata merge) aggregated by stage and
+component type, with cumulative time, self time and peak memory.
+
+.. code::
+
+    import pp
+
+    pp.profiler.enable()
+    with pp.profiler.span("placement", "my_mask"):
+        ...
+    pp.profiler.report()
+    pp.profiler.write_trace("build/profile.json")
+
+Functions are instrumented with the `profile` decorator.
+When disabled (default) a span is a shared no-op context manager,
+so instrumented code only pays for one global lookup.
+
+Enable it with `pf --profile`, `PP_PROFILE=1` (also for the scripts run by
+`pf mask build_devices`) or `pp.profiler.enable()`.
+
+`write_trace` writes Chrome trace events (chrome://tracing, perfetto, speedscope)
+"""
+
+import atexit
+import functools
+import glob
+import json
+import os
+import pathlib
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+ENABLED = False
+EVENTS = []  # (stage, key, start, duration, self_time, peak_memory, pid, tid)
+TRACE_DIRECTORY = None  # where other processes dump their events
+_LOCAL = threading.local()
+
+
+class _NullSpan:
+    """ no-op span (contextlib.nullcontext needs Python 3.7) """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _peak_memory_mb() -> float:
+    """ peak resident memory of this process in MB """
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _Span:
+    __slots__ = ("stage", "key", "start", "children")
+
+    def __init__(self, stage: str, key: str) -> None:
+        self.stage = stage
+        self.key = key
+
+    def __enter__(self):
+        stack = getattr(_LOCAL, "stack", None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+        stack.append(self)
+        self.children = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        stack = _LOCAL.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+        EVENTS.append(
+            (
+                self.stage,
+                self.key,
+                self.start,
+                duration,
+                duration - self.children,
+                _peak_memory_mb(),
+                os.getpid(),
+                threading.get_ident(),
+            )
+        )
+        return False
+
+
+def span(stage: str, key: str = ""):
+    """returns a context manager that times a build stage
+
+    Args:
+        stage: component, routing, hash, write_gds, placement, metadata ...
+        key: what is being processed (component type, DOE name ...)
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(stage, key)
+
+
+def profile(stage: str, key: Optional[str] = None) -> Callable:
+    """decorator that times a function as a build stage
+    key defaults to the function name
+    """
+
+    def decorator(function: Callable) -> Callable:
+        _key = key or function.__name__
+
+        @functools.wraps(function)
+        def _profile(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with _Span(stage, _key):
+                return function(*args, **kwargs)
+
+        return _profile
+
+    return decorator
+
+
+def enable(trace_directory: Optional[str] = None) -> None:
+    """enables the profiler for this process and its child processes
+
+    Args:
+        trace_directory: where child processes dump their events
+            (defaults to build/profile)
+    """
+    global ENABLED, TRACE_DIRECTORY
+    if trace_directory is None:
+        from pp.config import CONFIG
+
+        trace_directory = pathlib.Path(CONFIG["build_directory"]) / "profile"
+    TRACE_DIRECTORY = pathlib.Path(trace_directory)
+    TRACE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    os.environ["PP_PROFILE"] = str(TRACE_DIRECTORY)
+    ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED
+    ENABLED = False
+    os.environ.pop("PP_PROFILE", None)
+
+
+def clear() -> None:
+    """ removes the recorded events, including the ones dumped by other processes """
+    EVENTS.clear()
+    if TRACE_DIRECTORY:
+        for filepath in glob.glob(str(TRACE_DIRECTORY / "events_*.json")):
+            os.remove(filepath)
+
+
+def flush() -> None:
+    """dumps the events of this process into the trace directory
+    call it at the end of a worker process so that the main process can merge them
+
+    a forked worker inherits the events of its parent, only its own are dumped
+    """
+    if not ENABLED or not EVENTS or TRACE_DIRECTORY is None:
+        return
+    pid = os.getpid()
+    events = [event for event in EVENTS if event[6] == pid]
+    EVENTS.clear()
+    if events:
+        filepath = TRACE_DIRECTORY / f"events_{pid}_{uuid.uuid4().hex}.json"
+        filepath.write_text(json.dumps(events))
+
+
+def get_events() -> List[tuple]:
+    """ returns the events of this process and of the flushed processes """
+    events = list(EVENTS)
+    if TRACE_DIRECTORY:
+        for filepath in glob.glob(str(TRACE_DIRECTORY / "events_*.json")):
+            events += [tuple(event) for event in json.loads(open(filepath).read())]
+    return events
+
+
+def summary(events: Optional[List[tuple]] = None) -> List[Dict[str, Any]]:
+    """returns stats per (stage, key) sorted by self time:
+    count, total_time, self_time (without the nested spans), peak_memory_mb
+    """
+    events = get_events() if events is None else events
+    stats = {}
+    for stage, key, _, duration, self_time, peak_memory, _, _ in events:
+        s = stats.setdefault(
+            (stage, key),
+            dict(
+                stage=stage,
+                key=key,
+                count=0,
+                total_time=0.0,
+                self_time=0.0,
+                peak_memory_mb=0.0,
+            ),
+        )
+        s["count"] += 1
+        s["total_time"] += duration
+        s["self_time"] += self_time
+        s["peak_memory_mb"] = max(s["peak_memory_mb"], peak_memory)
+    return sorted(stats.values(), key=lambda s: -s["self_time"])
+
+
+def report(n: int = 30) -> None:
+    """ prints the n most expensive (stage, key) by self time """
+    rows = summary()
+    print(
+        f"{'stage':<12} {'key':<32} {'count':>7} {'total (s)':>10} {'self (s)':>10}"
+        f" {'peak (MB)':>10}"
+    )
+    for s in rows[:n]:
+        print(
+            f"{s['stage']:<12} {s['key'][:32]:<32} {s['count']:>7}"
+            f" {s['total_time']:>10.3f} {s['self_time']:>10.3f}"
+            f" {s['peak_memory_mb']:>10.1f}"
+        )
+
+
+def write_trace(filepath) -> str:
+    """writes all the events as a Chrome trace (JSON) with the summary"""
+    events = get_events()
+    trace_events = [
+        dict(
+            name=key or stage,
+            cat=stage,
+            ph="X",
+            ts=start * 1e6,
+            dur=duration * 1e6,
+            pid=pid,
+            tid=tid,
+            args=dict(self_time=self_time, peak_memory_mb=peak_memory),
+        )
+        for stage, key, start, duration, self_time, peak_memory, pid, tid in events
+    ]
+    filepath = pathlib.Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_text(
+        json.dumps(dict(traceEvents=trace_events, summary=summary(events)))
+    )
+    return str(filepath)
+
+
+if os.environ.get("PP_PROFILE"):
+    # started by a profiled process (pf --profile or PP_PROFILE=1)
+    enable(None if os.environ["PP_PROFILE"] == "1" else os.environ["PP_PROFILE"])
+    atexit.register(flush)
+
+
+def test_profiler(tmp_path):
+    enable(tmp_path)
+    try:
+        with span("placement", "mask"):
+            for _ in range(3):
+                with span("component", "waveguide"):
+                    time.sleep(0.01)
+        flush()
+        with span("metadata", "merge_json"):
+            pass
+        stats = {(s["stage"], s["key"]): s for s in summary()}
+        trace = json.loads(pathlib.Path(write_trace(tmp_path / "t.json")).read_text())
+    finally:
+        disable()
+        clear()
+
+    assert stats["component", "waveguide"]["count"] == 3
+    placement = stats["placement", "mask"]
+    assert placement["self_time"] < 0.01 < placement["total_time"]
+    assert len(trace["traceEvents"]) == 5
+    assert span("component") is _NULL_SPAN
+
+
+def _forked_worker() -> None:
+    with span("component", "worker"):
+        pass
+    flush()
+
+
+def test_profiler_fork(tmp_path):
+    import multiprocessing
+    import pytest
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs fork")
+    context = multiprocessing.get_context("fork")
+    enable(tmp_path)
+    try:
+        for _ in range(5):
+            with span("placement", "mask"):
+                pass
+        for _ in range(3):
+            process = context.Process(target=_forked_worker)
+            process.start()
+            process.join()
+        stats = {(s["stage"], s["key"]): s["count"] for s in summary()}
+    finally:
+        disable()
+        clear()
+    assert stats == {("placement", "mask"): 5, ("component", "worker"): 3}
+
+
+if __name__ == "__main__":
+    import pp
+
+    enable()
+    pp.c.mzi()
+    report()
@@ -0,0 +1,153 @@
+""" fast path for axis-aligned rectangles
+
+Most mask geometry (waveguides, pads, vias, padding, DEVREC boxes) are axis-aligned
+rectangles, stored here as (x0, y0, x1, y1) rows of a numpy array.
+The area of their union is computed with a vectorized slab decomposition
+on integer grid units, so it is exact (`drc.compute_area`).
+
+`split_rectangles` separates the rectangles from the other polygons,
+which still need the general polygon engine (gdspy)
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+def split_rectangles(
+    polygons: List[np.ndarray],
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """returns (rectangles, other polygons)
+
+    rectangles are the 4 point polygons with axis-aligned edges
+    """
+    is_quad = np.array([len(p) == 4 for p in polygons], dtype=bool)
+    others = [p for p, quad in zip(polygons, is_quad) if not quad]
+    if not is_quad.any():
+        return np.zeros((0, 4)), others
+
+    quads = np.array([p for p, quad in zip(polygons, is_quad) if quad], dtype=float)
+    edges = np.roll(quads, -1, axis=1) - quads
+    horizontal = (edges[:, :, 1] == 0) & (edges[:, :, 0] != 0)
+    vertical = (edges[:, :, 0] == 0) & (edges[:, :, 1] != 0)
+    is_rectangle = (horizontal[:, ::2] & vertical[:, 1::2]).all(axis=1) | (
+        vertical[:, ::2] & horizontal[:, 1::2]
+    ).all(axis=1)
+
+    others += [q for q, rectangle in zip(quads, is_rectangle) if not rectangle]
+    quads = quads[is_rectangle]
+    rectangles = np.concatenate([quads.min(axis=1), quads.max(axis=1)], axis=1)
+    return rectangles, others
+
+
+def rectangles_to_polygons(rectangles: np.ndarray) -> List[np.ndarray]:
+    """returns the polygons (4 points) of rectangles"""
+    x0, y0, x1, y1 = np.asarray(rectangles, dtype=float).reshape(-1, 4).T
+    points = np.stack(
+        [
+            np.stack([x0, y0], axis=1),
+            np.stack([x1, y0], axis=1),
+            np.stack([x1, y1], axis=1),
+            np.stack([x0, y1], axis=1),
+        ],
+        axis=1,
+    )
+    return list(points)
+
+
+def _get_slab_rectangles(rectangles: np.ndarray, precision: float) -> np.ndarray:
+    """returns disjoint rectangles (grid units) that cover the union of rectangles
+
+    The rectangles are clipped to tiles of about 16 rectangles, then each tile is
+    cut into slabs at the x coordinates of its rectangles and the y intervals
+    of the rectangles in each slab are merged. Everything is vectorized.
+    """
+    r = np.round(np.asarray(rectangles, dtype=float).reshape(-1, 4) / precision)
+    r = r.astype(np.int64)
+    r = r[(r[:, 2] > r[:, 0]) & (r[:, 3] > r[:, 1])]
+    if len(r) == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+
+    # clip the rectangles to square tiles
+    xmin, ymin = r[:, :2].min(axis=0)
+    xmax, ymax = r[:, 2:].max(axis=0)
+    size = max(int(np.sqrt((xmax - xmin) * (ymax - ymin) * 16 / len(r))), 1)
+    columns = (xmax - xmin) // size + 1
+    tx0, ty0 = (r[:, 0] - xmin) // size, (r[:, 1] - ymin) // size
+    nx = (r[:, 2] - 1 - xmin) // size - tx0 + 1
+    ny = (r[:, 3] - 1 - ymin) // size - ty0 + 1
+    counts = nx * ny
+    index = np.repeat(np.arange(len(r)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    tx = tx0[index] + k % nx[index]
+    ty = ty0[index] + k // nx[index]
+    x0 = np.maximum(r[index, 0], xmin + tx * size)
+    x1 = np.minimum(r[index, 2], xmin + (tx + 1) * size)
+    y0 = np.maximum(r[index, 1], ymin + ty * size)
+    y1 = np.minimum(r[index, 3], ymin + (ty + 1) * size)
+
+    # x coordinates of each tile, sorted by tile
+    width = xmax - xmin + 1
+    tile = ty * columns + tx
+    x0, x1 = tile * width + x0 - xmin, tile * width + x1 - xmin
+    xs = np.unique(np.concatenate([x0, x1]))
+    first = np.searchsorted(xs, x0)
+    counts = np.searchsorted(xs, x1) - first
+
+    # one (slab, y0, y1) row for each slab that a rectangle covers
+    index = np.repeat(np.arange(len(x0)), counts)
+    slabs = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(
+        counts.sum()
+    )
+    y0, y1 = y0[index] - ymin, y1[index] - ymin
+
+    # merge the intervals of each slab, slabs are kept apart by an offset
+    span = ymax - ymin + 1
+    order = np.lexsort((y0, slabs))
+    slabs = slabs[order]
+    y0, y1 = y0[order] + slabs * span, y1[order] + slabs * span
+    reach = np.maximum.accumulate(y1)
+    starts = np.ones(len(y0), dtype=bool)
+    starts[1:] = y0[1:] > reach[:-1]
+    ends = np.append(np.flatnonzero(starts)[1:], len(y0)) - 1
+
+    slabs = slabs[starts]
+    return np.stack(
+        [
+            xs[slabs] % width + xmin,
+            y0[starts] - slabs * span + ymin,
+            xs[slabs + 1] % width + xmin,
+            reach[ends] - slabs * span + ymin,
+        ],
+        axis=1,
+    )
+
+
+def rectangles_area(rectangles: np.ndarray, precision: float = 1e-3) -> float:
+    """returns the area covered by rectangles (overlaps counted once)
+
+    Args:
+        rectangles: (x0, y0, x1, y1) rows
+        precision: grid
+    """
+    r = _get_slab_rectangles(rectangles, precision)
+    return float(np.sum((r[:, 2] - r[:, 0]) * (r[:, 3] - r[:, 1]))) * precision ** 2
+
+
+def test_rectangles():
+    import gdspy
+
+    rectangles = np.array(
+        [[0, 0, 10, 2], [8, 0, 10, 10], [0, 8, 10, 10], [20, 20, 21, 21], [1, 1, 2, 2]]
+    )
+    polygons = rectangles_to_polygons(rectangles)
+    triangle = np.array([(0, 0), (1, 0), (0, 1)])
+    diamond = np.array([(0, 1), (1, 0), (2, 1), (1, 2)])
+    found, others = split_rectangles(polygons + [triangle, diamond])
+    assert np.array_equal(found, rectangles)
+    assert len(others) == 2
+
+    area = 20 + 16 + 16 + 1
+    assert np.isclose(rectangles_area(rectangles), area)
+    union = gdspy.boolean(polygons, None, "or").polygons
+    assert np.isclose(sum(gdspy.Polygon(p).area() for p in union), area)
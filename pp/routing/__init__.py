@@ -13,6 +13,7 @@ from pp.routing.connect_bundle import connect_bundle
 from pp.routing.connect_bundle import connect_bundle_path_length_match
 from pp.routing.connect_bundle import link_electrical_ports
 from pp.routing.connect_bundle import link_optical_ports
+from pp.routing.connect_bundle import link_ports_path_length_match
 from pp.routing.manhattan import round_corners, route_manhattan
 from pp.routing.repackage import package_optical2x2
 from pp.routing.route_fiber_single import route_fiber_single
@@ -35,6 +36,7 @@ __all__ = [
     "connect_strip_way_points",
     "link_electrical_ports",
     "link_optical_ports",
+    "link_ports_path_length_match",
     "package_optical2x2",
     "round_corners",
     "route_elec_ports_to_side",
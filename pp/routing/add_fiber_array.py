@@ -6,6 +6,7 @@ import pp
 from pp.add_tapers import add_tapers
 from pp.components.taper import taper
 from pp.container import container
+from pp.routing.quantize import quantize
 
 from pp.routing.route_fiber_array import route_fiber_array
 from pp.routing.get_input_labels import get_input_labels
@@ -96,7 +97,7 @@ def add_fiber_array(
     if port_width_component != port_width_gc:
         c = add_tapers(
             c,
-            taper_factory(
+            quantize(taper_factory)(
                 length=taper_length, width1=port_width_gc, width2=port_width_component
             ),
         )
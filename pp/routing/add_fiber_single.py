@@ -11,6 +11,7 @@ from pp.components.bend_circular import bend_circular
 from pp.components import waveguide
 from pp.components.grating_coupler.elliptical_trenches import grating_coupler_te
 from pp.container import container
+from pp.routing.quantize import quantize
 from pp.components.taper import taper
 from pp.add_tapers import add_tapers
 
@@ -93,7 +94,7 @@ def add_fiber_single(
     if port_width_component != port_width_gc:
         component = add_tapers(
             component,
-            taper_factory(
+            quantize(taper_factory)(
                 length=taper_length, width1=port_width_gc, width2=port_width_component
             ),
         )
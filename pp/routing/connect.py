@@ -5,6 +5,7 @@ from phidl.device_layout import Port as PortPhidl
 from pp.routing.manhattan import route_manhattan
 from pp.routing.manhattan import generate_manhattan_waypoints
 from pp.routing.manhattan import round_corners
+from pp.routing.quantize import quantize
 from pp.components.bend_circular import bend_circular
 from pp.components import waveguide
 from pp.components import taper as taper_factory
@@ -33,11 +34,11 @@ def connect_strip(
     route_factory: Callable = route_manhattan,
 ) -> ComponentReference:
 
-    bend90 = bend_factory(radius=bend_radius, width=input_port.width)
+    bend90 = quantize(bend_factory)(radius=bend_radius, width=input_port.width)
 
     if taper_factory:
         if callable(taper_factory):
-            taper = taper_factory(
+            taper = quantize(taper_factory)(
                 length=TAPER_LENGTH,
                 width1=input_port.width,
                 width2=WG_EXPANDED_WIDTH,
@@ -78,11 +79,11 @@ def connect_strip_way_points(
 
     taper_factory: can be either a taper component or a factory
     """
-    bend90 = bend_factory(radius=bend_radius, width=wg_width)
+    bend90 = quantize(bend_factory)(radius=bend_radius, width=wg_width)
 
     if taper_factory:
         if callable(taper_factory):
-            taper = taper_factory(
+            taper = quantize(taper_factory)(
                 length=TAPER_LENGTH,
                 width1=wg_width,
                 width2=WG_EXPANDED_WIDTH,
@@ -13,15 +13,60 @@ from pp.routing.u_groove_bundle import u_bundle_indirect
 from pp.routing.u_groove_bundle import u_bundle_direct
 from pp.routing.corner_bundle import corner_bundle
 from pp.routing.path_length_matching import path_length_matched_points
+from pp.routing.path_length_matching import path_length_matched_bundle
 from pp.name import autoname
 from pp.component import ComponentReference, Component
 from pp.port import Port
 from pp.config import conf
+from pp import profiler
 
 METAL_MIN_SEPARATION = 10.0
 BEND_RADIUS = conf.tech.bend_radius
 
 
+ROUTE_CACHE = {}  # route key: [(component, origin, rotation, x_reflection)]
+ROUTE_CACHE_PRECISION = 1e-3  # port positions are compared to the nm
+ROUTE_CACHE_SIZE = 1024  # least recently used bundles are dropped
+
+
+def _hashable(value):
+    """returns a hashable version of a routing parameter"""
+    if isinstance(value, Component):
+        return value.name
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, float) and np.isfinite(value):
+        return round(value / ROUTE_CACHE_PRECISION)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def get_route_key(start_ports, end_ports, **params):
+    """returns the cache key of a bundle route
+    port positions are relative to the first start port, so that bundles with the
+    same relative geometry (and port widths, layers and types) share the key
+    wherever they are placed
+    """
+    origin = start_ports[0].midpoint
+    ports = tuple(
+        (
+            tuple(np.round((p.midpoint - origin) / ROUTE_CACHE_PRECISION).astype(int)),
+            int(p.angle) % 360,
+            _hashable(float(p.width)),
+            _hashable(p.layer),
+            p.port_type,
+        )
+        for p in list(start_ports) + list(end_ports)
+    )
+    return (len(start_ports), ports, _hashable(params))
+
+
+@profiler.profile("routing")
 def connect_bundle(
     start_ports,
     end_ports,
@@ -29,6 +74,7 @@ def connect_bundle(
     separation=5.0,
     bend_radius=BEND_RADIUS,
     extension_length=0,
+    cache=True,
     **kwargs,
 ):
     """ Connects bundle of ports using river routing.
@@ -41,6 +87,8 @@ def connect_bundle(
         separation: waveguide separation
         bend_radius: for the routes
         extension_length: adds waveguide extension
+        cache: reuses the route cells of a previous bundle with the same
+            relative port geometry and settings (translated into place)
 
     """
     # Accept dict ot list
@@ -58,6 +106,71 @@ def connect_bundle(
         p.angle = int(p.angle) % 360
 
     assert len(end_ports) == nb_ports
+
+    params = dict(
+        route_filter=route_filter,
+        separation=separation,
+        bend_radius=bend_radius,
+        extension_length=extension_length,
+        **kwargs,
+    )
+    if cache:
+        return get_routes_cached(_connect_bundle, start_ports, end_ports, **params)
+    return _connect_bundle(start_ports, end_ports, **params)
+
+
+def get_routes_cached(router, start_ports, end_ports, **params):
+    """returns `router(start_ports, end_ports, **params)`
+    reusing the route cells of a previous call with the same router, settings and
+    relative port geometry (translated into place)
+    """
+    if not start_ports:
+        return router(start_ports, end_ports, **params)
+
+    key = (router, get_route_key(start_ports, end_ports, **params))
+    origin = start_ports[0].midpoint
+    if key in ROUTE_CACHE:
+        ROUTE_CACHE[key] = ROUTE_CACHE.pop(key)  # most recently used last
+        return [
+            ComponentReference(
+                component,
+                origin=ref_origin + origin,
+                rotation=rotation,
+                x_reflection=x_reflection,
+            )
+            for component, ref_origin, rotation, x_reflection in ROUTE_CACHE[key]
+        ]
+
+    routes = router(start_ports, end_ports, **params)
+
+    # only routes made of references can be translated into place
+    if isinstance(routes, list) and all(
+        isinstance(route, ComponentReference) for route in routes
+    ):
+        if len(ROUTE_CACHE) >= ROUTE_CACHE_SIZE:
+            ROUTE_CACHE.pop(next(iter(ROUTE_CACHE)))
+        ROUTE_CACHE[key] = [
+            (
+                route.parent,
+                np.array(route.origin) - origin,
+                route.rotation,
+                route.x_reflection,
+            )
+            for route in routes
+        ]
+    return routes
+
+
+def _connect_bundle(
+    start_ports,
+    end_ports,
+    route_filter=connect_strip_way_points,
+    separation=5.0,
+    bend_radius=BEND_RADIUS,
+    extension_length=0,
+    **kwargs,
+):
+    """ chooses the bundle router for the port angles """
     assert (
         len(set([p.angle for p in start_ports])) <= 1
     ), "All start port angles should be the same"
@@ -575,6 +688,57 @@ def connect_bundle_path_length_match(
     return [route_filter(waypoints) for waypoints in list_of_waypoints]
 
 
+def link_ports_path_length_match(
+    ports1: List[Port],
+    ports2: List[Port],
+    length: Optional[float] = None,
+    separation: float = 5.0,
+    bend_radius: float = BEND_RADIUS,
+    route_filter: Callable = connect_strip_way_points,
+    bend_length: Optional[float] = None,
+    **kwargs,
+) -> List[ComponentReference]:
+    """returns path length matched routes between two lists of facing ports
+    all the waypoints are computed at once with `path_length_matched_bundle`
+
+    Args:
+        ports1: start ports, facing the same direction
+        ports2: end ports, facing ports1
+        length: for all the routes (defaults to the shortest possible)
+        separation: between routes
+        bend_radius:
+        route_filter: function to connect the waypoints
+        bend_length: path length of the bends made by route_filter
+            (defaults to circular bends)
+        **kwargs: dL0, start_straight, end_straight
+
+    """
+    list_of_waypoints = path_length_matched_bundle(
+        ports1,
+        ports2,
+        separation=separation,
+        bend_radius=bend_radius,
+        length=length,
+        bend_length=bend_length,
+        **kwargs,
+    )
+    return [
+        route_filter(waypoints, bend_radius=bend_radius)
+        for waypoints in list_of_waypoints
+    ]
+
+
+def test_link_ports_path_length_match():
+    ports1 = [Port(f"top_{i}", (i * 10, 0), 0.5, 270) for i in range(16)]
+    ports2 = [Port(f"bot_{i}", (i * 127 - 900, -1500), 0.5, 90) for i in range(16)]
+    routes = link_ports_path_length_match(ports1, ports2, bend_radius=10)
+    lengths = [route.parent.info["length"] for route in routes]
+    assert np.allclose(lengths, lengths[0])
+    for route, p1, p2 in zip(routes, ports1, ports2):
+        assert np.allclose(route.ports["input"].midpoint, p1.midpoint)
+        assert np.allclose(route.ports["output"].midpoint, p2.midpoint)
+
+
 def link_electrical_ports(
     ports1: List[Port],
     ports2: List[Port],
@@ -637,18 +801,18 @@ def link_optical_ports(
     separation: float = 5.0,
     route_filter: Callable = connect_strip_way_points,
     bend_radius: float = BEND_RADIUS,
+    cache: bool = True,
     **kwargs,
 ) -> List[ComponentReference]:
     """ connect bundle of optical ports
+    cache: reuses the routes of a previous call with the same relative port geometry
     """
-    return link_ports(
-        ports1,
-        ports2,
-        separation,
-        bend_radius=bend_radius,
-        route_filter=route_filter,
-        **kwargs,
+    params = dict(
+        separation=separation, bend_radius=bend_radius, route_filter=route_filter
     )
+    if cache:
+        return get_routes_cached(link_ports, ports1, ports2, **params, **kwargs)
+    return link_ports(ports1, ports2, **params, **kwargs)
 
 
 def sign(x):
@@ -1048,6 +1212,44 @@ def test_facing_ports():
     return top_cell
 
 
+def test_connect_bundle_cache():
+    def bundle(x0, y0, cache):
+        ports1 = [Port(f"top_{i}", (x0 + i * 10, y0), 0.5, 270) for i in range(4)]
+        ports2 = [
+            Port(f"bot_{i}", (x0 + i * 127 - 200, y0 - 300), 0.5, 90) for i in range(4)
+        ]
+        return connect_bundle(ports1, ports2, cache=cache)
+
+    routes = bundle(0, 0, cache=True)
+    cached = bundle(1000.5, -20, cache=True)
+    uncached = bundle(1000.5, -20, cache=False)
+    assert [r.parent for r in routes] == [r.parent for r in cached]
+    for r1, r2 in zip(cached, uncached):
+        assert r1.parent is not r2.parent
+        assert np.allclose(r1.bbox, r2.bbox)
+        for name, port in r1.ports.items():
+            assert np.allclose(port.midpoint, r2.ports[name].midpoint)
+            assert port.orientation == r2.ports[name].orientation
+
+    # ports with the same geometry on another layer do not share the routes
+    def ports(layer):
+        return (
+            [Port(f"top_{i}", (i * 10, 0), 0.5, 270, layer=layer) for i in range(4)],
+            [Port(f"bot_{i}", (i * 127, -300), 0.5, 90, layer=layer) for i in range(4)],
+        )
+
+    assert get_route_key(*ports((1, 0))) == get_route_key(*ports([1, 0]))
+    assert get_route_key(*ports((1, 0))) != get_route_key(*ports((2, 0)))
+
+    # the least recently used bundle is dropped when the cache is full
+    ROUTE_CACHE.clear()
+    ROUTE_CACHE.update({i: [] for i in range(ROUTE_CACHE_SIZE)})
+    bundle(0, 0, cache=True)
+    assert len(ROUTE_CACHE) == ROUTE_CACHE_SIZE
+    assert 0 not in ROUTE_CACHE and 1 in ROUTE_CACHE
+    ROUTE_CACHE.clear()
+
+
 def demo_connect_bundle():
     """ combines all the connect_bundle tests """
 
@@ -2,6 +2,7 @@ import numpy as np
 import pp
 from pp.routing.manhattan import remove_flat_angles
 from pp.routing.manhattan import round_corners
+from pp.routing.quantize import quantize
 
 from pp.components import bend_circular
 from pp.components import waveguide
@@ -143,11 +144,12 @@ def connect_bundle_waypoints(
         start_ports, end_ports, way_points, **kwargs
     )
 
+    bend_factory = quantize(bend_factory)
     bends90 = [bend_factory(radius=bend_radius, width=p.width) for p in start_ports]
 
     if taper_factory:
         if callable(taper_factory):
-            taper = taper_factory(
+            taper = quantize(taper_factory)(
                 length=TAPER_LENGTH,
                 width1=start_ports[0].width,
                 width2=WG_EXPANDED_WIDTH,
@@ -5,10 +5,12 @@ from pp.name import clean_name
 from pp.component import Component, ComponentReference
 
 import pp
-from pp.geo_utils import angles_deg
+from pp.geo_utils import remove_flat_angles
 from numpy import bool_, float64, ndarray
 from typing import Callable, Dict, List, Optional, Tuple
 from pp.port import Port
+from pp import profiler
+from pp.routing.quantize import quantize
 
 TOLERANCE = 0.0001
 DEG2RAD = np.pi / 180
@@ -402,27 +404,6 @@ def make_ref(component_factory: Callable) -> Callable:
     return _make_ref
 
 
-def remove_flat_angles(points: ndarray) -> ndarray:
-    a = angles_deg(np.vstack(points))
-    da = a - np.roll(a, 1)
-    da = np.mod(np.round(da, 3), 180)
-
-    # To make sure we do not remove points at the edges
-    da[0] = 1
-    da[-1] = 1
-
-    to_rm = list(np.where(np.abs(da[:-1]) < 1e-9)[0])
-    if type(points) == list:
-        while to_rm:
-            i = to_rm.pop()
-            points.pop(i)
-
-    else:
-        points = points[da != 0]
-
-    return points
-
-
 @make_ref
 def round_corners(
     points,
@@ -451,6 +432,8 @@ def round_corners(
 
     if straight_factory_fall_back_no_taper is None:
         straight_factory_fall_back_no_taper = straight_factory
+    straight_factory = quantize(straight_factory)
+    straight_factory_fall_back_no_taper = quantize(straight_factory_fall_back_no_taper)
 
     ## Remove any flat angle, otherwise the algorithm won't work
     points = remove_flat_angles(points)
@@ -643,6 +626,7 @@ def generate_manhattan_waypoints(
     return points
 
 
+@profiler.profile("routing")
 def route_manhattan(
     input_port: Port,
     output_port: Port,
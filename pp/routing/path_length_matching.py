@@ -1,8 +1,19 @@
+from typing import List, Optional
+
 import numpy as np
-from pp.geo_utils import path_length
-from pp.routing.manhattan import remove_flat_angles
+from numpy import ndarray
+
+from pp.config import conf
+from pp.geo_utils import pack_waypoints
+from pp.geo_utils import unpack_waypoints
+from pp.geo_utils import path_length_packed
+from pp.geo_utils import remove_flat_angles_packed
+from pp.geo_utils import remove_identicals_packed
 from pp.routing.manhattan import _is_horizontal
 from pp.routing.manhattan import _is_vertical
+from pp.port import Port
+
+BEND_RADIUS = conf.tech.bend_radius
 
 
 def path_length_matched_points(
@@ -50,16 +61,16 @@ def path_length_matched_points_modify_segment(list_of_waypoints, modify_segment_
         raise ValueError(
             "list_of_waypoints should be a list, got {}".format(type(list_of_waypoints))
         )
-    list_of_waypoints = [
-        remove_flat_angles(waypoints) for waypoints in list_of_waypoints
-    ]
-    lengths = [path_length(waypoints) for waypoints in list_of_waypoints]
+    # all the routes in one numpy pass
+    points, offsets = remove_flat_angles_packed(*pack_waypoints(list_of_waypoints))
+    lengths = path_length_packed(points, offsets)
+    list_of_waypoints = unpack_waypoints(points, offsets)
     L0 = max(lengths)
 
     N = len(list_of_waypoints[0])
 
     # Find how many turns there are per path
-    nb_turns = [len(waypoints) - 2 for waypoints in list_of_waypoints]
+    nb_turns = np.diff(offsets) - 2
 
     # The paths have to have the same number of turns, otherwise this algo
     # cannot path length match
@@ -155,22 +166,20 @@ def path_length_matched_points_add_waypoints(
 
     """
 
-    print(list_of_waypoints[0])
-
     if type(list_of_waypoints) != list:
         raise ValueError(
             "list_of_waypoints should be a list, got {}".format(type(list_of_waypoints))
         )
-    list_of_waypoints = [
-        remove_flat_angles(waypoints) for waypoints in list_of_waypoints
-    ]
-    lengths = [path_length(waypoints) for waypoints in list_of_waypoints]
+    # all the routes in one numpy pass
+    points, offsets = remove_flat_angles_packed(*pack_waypoints(list_of_waypoints))
+    lengths = path_length_packed(points, offsets)
+    list_of_waypoints = unpack_waypoints(points, offsets)
     L0 = max(lengths)
 
     N = len(list_of_waypoints[0])
 
     # Find how many turns there are per path
-    nb_turns = [len(waypoints) - 2 for waypoints in list_of_waypoints]
+    nb_turns = np.diff(offsets) - 2
 
     # The paths have to have the same number of turns, otherwise cannot path-length
     # match with this algorithm
@@ -264,3 +273,235 @@ def path_length_matched_points_add_waypoints(
         list_new_waypoints += [new_points]
 
     return list_new_waypoints
+
+
+def _rotate(points: ndarray, angle: int) -> ndarray:
+    """rotates points (..., 2) by a multiple of 90 degrees (exact)"""
+    c, s = [[1, 0], [0, 1], [-1, 0], [0, -1]][(angle // 90) % 4]
+    return points @ np.array([[c, s], [-s, c]])
+
+
+def path_length_matched_bundle(
+    start_ports: List[Port],
+    end_ports: List[Port],
+    separation: float = 5.0,
+    bend_radius: float = BEND_RADIUS,
+    length: Optional[float] = None,
+    dL0: float = 0.0,
+    start_straight: float = 0.0,
+    end_straight: float = 0.0,
+    bend_length: Optional[float] = None,
+) -> List[ndarray]:
+    """returns path length matched waypoints for a bundle of facing ports
+
+    Solves all the routes at once instead of matching routes generated by
+    connect_bundle. Each route goes straight, jogs sideways to its end port
+    (river routing, jog levels ordered so that routes do not cross) and then
+    goes through a serpentine in the band where all the routes run in parallel.
+    All the serpentines have the same number of wiggles (same number of bends),
+    and the wiggle amplitude of each route is computed in closed form to match
+    the lengths, so the serpentines nest without colliding.
+
+    The serpentines go on the side of the bundle with the largest port pitch.
+
+    .. code::
+
+               |   |   |
+               |_  |_  |__
+                _|  _|  __|   serpentine, amplitude depends on the route
+               |_  |_  |__
+                _|  _|  __|
+              __|   |   |
+          ___|    __|   |     jogs
+         |       |      |
+
+    Args:
+        start_ports: facing the same direction
+        end_ports: facing the start ports
+        separation: center to center distance between routes
+        bend_radius: for the bends
+        length: target length for all the routes (defaults to the shortest possible)
+        dL0: extra length for all the routes
+        start_straight: minimum straight length after the start ports
+        end_straight: minimum straight length before the end ports
+        bend_length: path length of a 90 degree bend (defaults to a circular bend)
+
+    Returns:
+        list of waypoints, in the order of the start ports
+
+    Raises:
+        ValueError: if the ports or the spacing do not allow length matching
+    """
+    if len(start_ports) != len(end_ports):
+        raise ValueError(f"got {len(start_ports)} start and {len(end_ports)} end ports")
+
+    R = bend_radius
+    bend_length = np.pi * R / 2 if bend_length is None else bend_length
+    correction = 2 * R - bend_length  # length lost at each corner
+
+    angle = int(start_ports[0].angle) % 360
+    if {int(p.angle) % 360 for p in start_ports} != {angle} or {
+        int(p.angle) % 360 for p in end_ports
+    } != {(angle + 180) % 360}:
+        raise ValueError(
+            "start ports must face the same direction, end ports facing them"
+        )
+
+    # work in a frame where start ports face north and end ports south
+    starts = _rotate(
+        np.array([p.midpoint for p in start_ports], dtype=float), 90 - angle
+    )
+    ends = _rotate(np.array([p.midpoint for p in end_ports], dtype=float), 90 - angle)
+    if ends[:, 1].min() <= starts[:, 1].max():
+        raise ValueError("end ports must be in front of the start ports")
+
+    pitch_start = np.diff(np.sort(starts[:, 0])).min(initial=np.inf)
+    pitch_end = np.diff(np.sort(ends[:, 0])).min(initial=np.inf)
+    if min(pitch_start, pitch_end) < separation:
+        raise ValueError(f"port pitch {min(pitch_start, pitch_end)} < {separation}")
+
+    # serpentines go on the widest side, flip the bundle if that is the start side
+    flip = pitch_start > pitch_end
+    if flip:
+        starts, ends = -ends, -starts
+        pitch_end = pitch_start
+        start_straight, end_straight = end_straight, start_straight
+
+    # routes connect the ports in x order
+    order_start = np.argsort(starts[:, 0])
+    order_end = np.argsort(ends[:, 0])
+    xs, ys = starts[order_start].T
+    xe, ye = ends[order_end].T
+    dx = xe - xs
+    jog = np.abs(dx) > 1e-9
+    if (np.abs(dx[jog]) < 2 * R).any():
+        raise ValueError(f"routes need to move sideways 0 or more than {2 * R}")
+
+    # jog levels: the routes that move towards the outside jog first
+    level = np.zeros(len(xs))
+    right, left = np.flatnonzero(dx > 1e-9), np.flatnonzero(dx < -1e-9)
+    level[right[np.argsort(-xs[right])]] = np.arange(len(right))
+    level[left[np.argsort(xs[left])]] = np.arange(len(left))
+    h = ys.max() + start_straight + R + level * separation
+
+    # serpentine amplitudes: same number of wiggles n for all the routes
+    # each wiggle adds 2 * amplitude and 4 corners to a route
+    base = (ye - ys) + np.abs(dx) - 2 * jog * correction
+    a_min = 2 * R
+    a_max = pitch_end - separation
+    if length is None:
+        spread = base.max() - base.min() + dL0
+        n = 0 if spread < 1e-9 else None
+        if n is None and a_max > a_min:
+            n = int(np.ceil(spread / (2 * (a_max - a_min)) - 1e-9))
+        if n is not None:
+            length = base.max() + dL0 + 2 * n * (a_min - 2 * correction)
+    elif a_max > 2 * correction:
+        n = max(1, int(np.ceil((length - base.min()) / (2 * (a_max - 2 * correction)))))
+        if (length - base.max()) / (2 * n) + 2 * correction < a_min:
+            raise ValueError(f"length {length} too short for these ports")
+    else:
+        n = None
+    if n is None:
+        raise ValueError(
+            f"port pitch {pitch_end} too small for serpentines,"
+            f" needs more than {a_min + separation} for bend_radius={R}"
+        )
+    amplitude = (length - base + 4 * n * correction) / (2 * n) if n else 0 * base
+
+    g = max(2 * R, separation)
+    y0 = h.max() + 2 * R
+    top = y0 + (2 * n - 1) * g if n else h.max()
+    if ye.min() - end_straight - R < top:
+        distance = top + R + end_straight - ys.max()
+        raise ValueError(f"ports {ye.min() - ys.max()} apart, needs {distance}")
+
+    # waypoints of all the routes (routes, points, xy)
+    nb_routes = len(xs)
+    points = [
+        np.column_stack([xs, ys]),
+        np.column_stack([xs, h]),
+        np.column_stack([xe, h]),
+    ]
+    for k in range(n):
+        y = y0 + 2 * k * g
+        points += [
+            np.column_stack([xe, np.full(nb_routes, y)]),
+            np.column_stack([xe + amplitude, np.full(nb_routes, y)]),
+            np.column_stack([xe + amplitude, np.full(nb_routes, y + g)]),
+            np.column_stack([xe, np.full(nb_routes, y + g)]),
+        ]
+    points += [np.column_stack([xe, ye])]
+    points = np.stack(points, axis=1)
+
+    if flip:
+        points = -points[:, ::-1]
+    points = _rotate(points, angle - 90)
+
+    # remove the jogs of the straight routes (repeated points, then flat angles)
+    points, offsets = remove_identicals_packed(
+        points.reshape(-1, 2), np.arange(nb_routes + 1) * points.shape[1], closed=False
+    )
+    points, offsets = remove_flat_angles_packed(points, offsets)
+    routes = unpack_waypoints(points, offsets)
+
+    # back to the order of the start ports
+    order = order_end if flip else order_start
+    waypoints = [None] * nb_routes
+    for i, route in zip(order, routes):
+        waypoints[i] = route
+    return waypoints
+
+
+def test_path_length_matched_bundle():
+    import pytest
+    from pp.geo_utils import path_length
+
+    corner = 2 * 10 - np.pi * 10 / 2
+    for angle, pitch1, pitch2, length in [
+        (0, 10, 127, None),
+        (90, 10, 127, 3500),
+        (180, 127, 10, None),
+        (270, 10, 50, None),
+    ]:
+        xy1 = [(i * pitch1, 0) for i in range(16)]
+        xy2 = [(i * pitch2 - 900, 1500) for i in range(16)]
+        xy1 = _rotate(np.array(xy1), angle - 90)
+        xy2 = _rotate(np.array(xy2), angle - 90)
+        ports1 = [Port(f"S{i}", xy, 0.5, angle) for i, xy in enumerate(xy1)]
+        ports2 = [Port(f"E{i}", xy, 0.5, angle + 180) for i, xy in enumerate(xy2)]
+        waypoints = path_length_matched_bundle(
+            ports1, ports2, bend_radius=10, length=length
+        )
+
+        for route, p1, p2 in zip(waypoints, ports1, ports2):
+            assert np.allclose(route[0], p1.midpoint)
+            assert np.allclose(route[-1], p2.midpoint)
+
+        lengths = [path_length(w) - (len(w) - 2) * corner for w in waypoints]
+        assert np.allclose(lengths, length or lengths[0])
+
+    with pytest.raises(ValueError):
+        path_length_matched_bundle(ports1[:2], ports2[:2], length=10)
+
+
+def test_path_length_matched_bundle_straight_routes():
+    from pp.geo_utils import path_length
+    from pp.routing.connect_bundle import link_ports_path_length_match
+
+    corner = 2 * 10 - np.pi * 10 / 2
+
+    # the middle route of a symmetric fan-out, and aligned ports, go straight
+    for xy1, xy2 in [
+        ([(i * 10, 0) for i in range(5)], [(i * 127 - 234, 1500) for i in range(5)]),
+        ([(i * 50, 0) for i in range(3)], [(i * 50, 500) for i in range(3)]),
+    ]:
+        ports1 = [Port(f"S{i}", xy, 0.5, 90) for i, xy in enumerate(xy1)]
+        ports2 = [Port(f"E{i}", xy, 0.5, 270) for i, xy in enumerate(xy2)]
+        waypoints = path_length_matched_bundle(ports1, ports2, bend_radius=10)
+        for route in waypoints:
+            assert (np.abs(np.diff(route, axis=0)).sum(axis=1) > 0).all()
+        lengths = [path_length(w) - (len(w) - 2) * corner for w in waypoints]
+        assert np.allclose(lengths, lengths[0])
+        routes = link_ports_path_length_match(ports1, ports2, bend_radius=10)
+        assert len(routes) == len(ports1)
@@ -0,0 +1,103 @@
+""" quantized routing factories
+
+Routes compute bend radii, widths and straight lengths at runtime, so tiny float
+differences (10.0 vs 10.000000001) would ask the factories for near-duplicate cells.
+`quantize` wraps a factory so that these settings are snapped to the tech grid
+before the call, so that the autoname cache (NAME_TO_DEVICE) returns
+a handful of bend, taper and straight cells per process.
+
+`warm_routing_cache` builds the common bends and tapers of the tech config
+(call it before forking workers so that they inherit them)
+"""
+
+import functools
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from pp.components.bend_circular import bend_circular
+from pp.components.taper import taper
+from pp.config import BEND_RADIUS, GRID_PER_UNIT, TAPER_LENGTH, WG_EXPANDED_WIDTH
+
+QUANTIZED_SETTINGS = ("radius", "width", "length", "width1", "width2")
+
+
+def snap(value: float) -> float:
+    """returns value snapped to the tech grid"""
+    return float(np.round(value * GRID_PER_UNIT) / GRID_PER_UNIT)
+
+
+def quantize_settings(**settings) -> dict:
+    """returns settings with the radius, width and length values snapped to grid"""
+    return {
+        k: snap(v)
+        if k in QUANTIZED_SETTINGS and isinstance(v, (int, float, np.number))
+        else v
+        for k, v in settings.items()
+    }
+
+
+def quantize(factory: Callable) -> Callable:
+    """returns a factory that snaps radius/width/length settings to grid
+    (autoname factories then return their cached cells)
+    """
+    if getattr(factory, "_quantized", False) or not callable(factory):
+        return factory
+
+    @functools.wraps(factory)
+    def _quantize(*args, **kwargs):
+        return factory(*args, **quantize_settings(**kwargs))
+
+    _quantize._quantized = True
+    return _quantize
+
+
+def warm_routing_cache(
+    radius: Optional[float] = None,
+    widths: Iterable[float] = (0.5,),
+    bend_factory: Callable = bend_circular,
+    taper_factory: Callable = taper,
+) -> None:
+    """builds the bends and tapers that routes use with the tech config defaults
+
+    Args:
+        radius: bend radius (defaults to tech bend_radius)
+        widths: waveguide widths
+        bend_factory:
+        taper_factory:
+    """
+    radius = BEND_RADIUS if radius is None else radius
+    for width in widths:
+        quantize(bend_factory)(radius=radius, width=width)
+        quantize(taper_factory)(
+            length=TAPER_LENGTH, width1=width, width2=WG_EXPANDED_WIDTH,
+        )
+
+
+def test_quantize():
+    import pp
+    from pp.name import NAME_TO_DEVICE
+
+    bend = quantize(pp.c.bend_circular)
+    b1 = bend(radius=10.0, width=0.5)
+    assert bend(radius=10.000000001, width=0.5000000001) is b1
+    assert quantize(bend) is bend
+
+    NAME_TO_DEVICE.clear()
+    warm_routing_cache(bend_factory=pp.c.bend_circular, taper_factory=pp.c.taper)
+    assert len(NAME_TO_DEVICE) == 2
+
+    c = pp.Component()
+    p1 = pp.Port("p1", midpoint=(0, 0), width=0.5, orientation=90)
+    p2 = pp.Port("p2", midpoint=(100.0000000001, 200), width=0.5, orientation=270)
+    p3 = pp.Port("p3", midpoint=(100, 200.0000000001), width=0.5, orientation=270)
+    c.add(pp.routing.connect_strip(p1, p2))
+    c.add(pp.routing.connect_strip(p1, p3))
+    route1, route2 = [
+        {id(r.parent) for r in ref.parent.references} for ref in c.references
+    ]
+    assert route1 == route2
+
+
+if __name__ == "__main__":
+    test_quantize()
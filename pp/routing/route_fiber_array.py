@@ -8,6 +8,7 @@ from pp.components import waveguide
 from pp.components.grating_coupler.elliptical_trenches import grating_coupler_te
 
 from pp.routing.manhattan import round_corners
+from pp.routing.quantize import quantize
 from pp.routing.connect_bundle import link_optical_ports
 from pp.routing.connect_bundle import get_min_spacing
 from pp.routing.route_south import route_south
@@ -403,7 +404,7 @@ def route_fiber_array(
         ]
         elements += [gca1, gca2]
 
-        bend90 = bend_factory(radius=bend_radius)
+        bend90 = quantize(bend_factory)(radius=bend_radius)
         loop_back = round_corners(route, bend90, straight_factory)
         elements += [loop_back]
 
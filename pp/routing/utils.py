@@ -1,5 +1,5 @@
 from typing import Dict, List
-from pp.port import Port
+from pp.port import DIRECTIONS, Port, PortIndex
 
 
 def flip(port: Port) -> Port:
@@ -8,26 +8,16 @@ def flip(port: Port) -> Port:
 
 
 def direction_ports_from_list_ports(optical_ports: List[Port]) -> Dict[str, List[Port]]:
-    direction_ports = {x: [] for x in ["E", "N", "W", "S"]}
     for p in optical_ports:
         p.angle = (p.angle + 360.0) % 360
-        if p.angle <= 45.0 or p.angle >= 315:
-            direction_ports["E"].append(p)
-        elif p.angle <= 135.0 and p.angle >= 45.0:
-            direction_ports["N"].append(p)
-        elif p.angle <= 225.0 and p.angle >= 135.0:
-            direction_ports["W"].append(p)
-        else:
-            direction_ports["S"].append(p)
 
-    for direction, list_ports in list(direction_ports.items()):
-        if direction in ["E", "W"]:
-            list_ports.sort(key=lambda p: p.y)
-
-        if direction in ["S", "N"]:
-            list_ports.sort(key=lambda p: p.x)
-
-    return direction_ports
+    index = PortIndex(optical_ports)
+    return {
+        direction: index.get_ports(
+            index.sort(index.by_direction[direction], "y" if direction in "EW" else "x")
+        )
+        for direction in DIRECTIONS
+    }
 
 
 def check_ports_have_equal_spacing(list_ports):
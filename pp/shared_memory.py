@@ -0,0 +1,329 @@
+""" transfer Components between processes through shared memory
+
+A worker writes the geometry of a list of Components (and all their
+dependencies) into one shared memory block:
+
+- points: polygon vertices of all cells (float64, N x 2)
+- polygon_sizes: number of vertices of each polygon
+- polygon_layers: (layer, datatype) of each polygon
+- polygonsets: (cell, first polygon, number of polygons) of each PolygonSet
+- references: (owner, cell, x, y, rotation, magnification, x_reflection,
+  columns, rows, x_spacing, y_spacing) of each reference, columns = 0 for SREFs
+
+and returns a small picklable descriptor (block name, array offsets, cell
+names, ports, labels and metadata) that can be sent through a Queue.
+
+The main process maps the block and rebuilds the Components with polygons
+that are numpy views of the shared memory (no copy, no GDS round trip).
+
+The worker hands the block over to the reader, which unlinks it once mapped,
+the mapping stays valid as long as the polygons use it.
+Blocks that are never read are removed with `unlink_shared_memory`.
+
+Needs Python 3.8 or later (multiprocessing.shared_memory), imported on first use.
+"""
+
+import pickle
+from typing import Any, Dict, List
+
+import numpy as np
+from phidl.device_layout import CellArray, Polygon
+
+from pp.component import Component, ComponentArray, ComponentReference, _clean_value
+from pp import profiler
+
+_INTERNAL_ATTRIBUTES = ("ports", "__ports__", "aliases", "uid")
+
+
+def import_shared_memory():
+    """returns (SharedMemory, resource_tracker), needs Python 3.8 or later"""
+    try:
+        from multiprocessing import resource_tracker
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError:
+        raise ImportError("shared memory transfers need Python 3.8 or later")
+    return SharedMemory, resource_tracker
+
+
+def _get_cells(components: List[Component]) -> List[Component]:
+    """returns all the cells, each cell after its dependencies"""
+    cells = []
+    visited = set()
+
+    def visit(cell):
+        if id(cell) in visited:
+            return
+        visited.add(id(cell))
+        for reference in cell.references:
+            visit(reference.parent)
+        cells.append(cell)
+
+    for component in components:
+        visit(component)
+    return cells
+
+
+def _picklable(value: Any) -> Any:
+    try:
+        pickle.dumps(value)
+        return value
+    except Exception:
+        return _clean_value(value)
+
+
+def _get_metadata(cell: Component) -> Dict[str, Any]:
+    return {
+        k: _picklable(v)
+        for k, v in cell.__dict__.items()
+        if k not in _INTERNAL_ATTRIBUTES
+    }
+
+
+def _get_port(port):
+    port = port._copy(new_uid=False)
+    port.parent = None
+    return port
+
+
+@profiler.profile("shared_memory")
+def write_shared_memory(components: List[Component]) -> Dict[str, Any]:
+    """writes components into a shared memory block
+
+    Returns:
+        descriptor for read_shared_memory (picklable)
+    """
+    cells = _get_cells(components)
+    index = {id(cell): i for i, cell in enumerate(cells)}
+
+    polygons, polygon_layers, polygonsets = [], [], []
+    references = []
+    headers = []
+    for i, cell in enumerate(cells):
+        for polygonset in cell.polygons:
+            polygonsets.append((i, len(polygons), len(polygonset.polygons)))
+            polygons += polygonset.polygons
+            polygon_layers += zip(polygonset.layers, polygonset.datatypes)
+
+        aliases = {}
+        for j, reference in enumerate(cell.references):
+            is_array = isinstance(reference, CellArray)
+            references.append(
+                (
+                    i,
+                    index[id(reference.parent)],
+                    reference.origin[0],
+                    reference.origin[1],
+                    reference.rotation or 0,
+                    np.nan
+                    if reference.magnification is None
+                    else reference.magnification,
+                    bool(reference.x_reflection),
+                    reference.columns if is_array else 0,
+                    reference.rows if is_array else 0,
+                    reference.spacing[0] if is_array else 0,
+                    reference.spacing[1] if is_array else 0,
+                )
+            )
+            for alias, alias_reference in getattr(cell, "aliases", {}).items():
+                if alias_reference is reference:
+                    aliases[alias] = j
+
+        headers.append(
+            dict(
+                name=cell.name,
+                metadata=_get_metadata(cell) if isinstance(cell, Component) else {},
+                ports=[_get_port(port) for port in cell.ports.values()],
+                aliases=aliases,
+                labels=list(cell.labels),
+                paths=list(cell.paths),
+            )
+        )
+
+    arrays = dict(
+        points=np.concatenate(polygons) if polygons else np.zeros((0, 2)),
+        polygon_sizes=np.array([len(p) for p in polygons], dtype=np.int64),
+        polygon_layers=np.array(polygon_layers, dtype=np.int64).reshape(-1, 2),
+        polygonsets=np.array(polygonsets, dtype=np.int64).reshape(-1, 3),
+        references=np.array(references, dtype=np.float64).reshape(-1, 11),
+    )
+
+    offsets = {}
+    size = 0
+    for name, array in arrays.items():
+        offsets[name] = (size, array.shape, array.dtype.str)
+        size += -(-array.nbytes // 8) * 8
+
+    SharedMemory, resource_tracker = import_shared_memory()
+    shm = SharedMemory(create=True, size=max(size, 8))
+    for name, array in arrays.items():
+        offset, shape, dtype = offsets[name]
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        view[...] = array
+        del view
+    shm.close()
+    # the reader unlinks the block
+    resource_tracker.unregister(shm._name, "shared_memory")
+
+    return dict(
+        name=shm.name,
+        arrays=offsets,
+        cells=headers,
+        components=[index[id(c)] for c in components],
+    )
+
+
+@profiler.profile("shared_memory")
+def read_shared_memory(descriptor: Dict[str, Any]) -> List[Component]:
+    """returns the components written by write_shared_memory
+    polygon points are views of the shared memory block
+    """
+    SharedMemory, _ = import_shared_memory()
+    shm = SharedMemory(name=descriptor["name"])
+    # the arrays keep the mapping alive: detach it, so that closing shm
+    # only closes its file descriptor
+    mapping, shm._mmap = shm._mmap, None
+    shm._buf.release()
+    shm._buf = None
+    shm.close()
+    shm.unlink()
+    arrays = {
+        name: np.ndarray(shape, dtype=dtype, buffer=mapping, offset=offset)
+        for name, (offset, shape, dtype) in descriptor["arrays"].items()
+    }
+
+    points = arrays["points"]
+    ends = np.cumsum(arrays["polygon_sizes"])
+    starts = ends - arrays["polygon_sizes"]
+    polygon_layers = arrays["polygon_layers"].tolist()
+
+    cells = []
+    for header in descriptor["cells"]:
+        cell = Component(name=header["name"])
+        cell.__dict__.update(header["metadata"])
+        for port in header["ports"]:
+            cell.add_port(port=port)
+        cell.labels.extend(header["labels"])
+        cell.paths.extend(header["paths"])
+        cells.append(cell)
+
+    for i, first, n in arrays["polygonsets"].tolist():
+        polygonset = Polygon.__new__(Polygon)
+        polygonset.parent = cells[i]
+        polygonset.polygons = [
+            points[start:end]
+            for start, end in zip(starts[first : first + n], ends[first : first + n])
+        ]
+        polygonset.layers = [layer for layer, _ in polygon_layers[first : first + n]]
+        polygonset.datatypes = [
+            datatype for _, datatype in polygon_layers[first : first + n]
+        ]
+        polygonset.properties = {}
+        cells[i].polygons.append(polygonset)
+
+    for row in arrays["references"].tolist():
+        owner, parent, x, y, rotation, magnification, x_reflection = row[:7]
+        columns, rows, x_spacing, y_spacing = row[7:]
+        settings = dict(
+            origin=(x, y),
+            rotation=rotation,
+            magnification=None if np.isnan(magnification) else magnification,
+            x_reflection=bool(x_reflection),
+        )
+        if columns:
+            reference = ComponentArray(
+                cells[int(parent)],
+                columns=columns,
+                rows=rows,
+                spacing=(x_spacing, y_spacing),
+                **settings,
+            )
+        else:
+            reference = ComponentReference(cells[int(parent)], **settings)
+        reference.owner = cells[int(owner)]
+        reference.owner.add(reference)
+
+    for i, header in enumerate(descriptor["cells"]):
+        for alias, j in header["aliases"].items():
+            cells[i].aliases[alias] = cells[i].references[j]
+
+    return [cells[i] for i in descriptor["components"]]
+
+
+def unlink_shared_memory(descriptor: Dict[str, Any]) -> None:
+    """removes a block written by write_shared_memory that will not be read"""
+    SharedMemory, _ = import_shared_memory()
+    try:
+        shm = SharedMemory(name=descriptor["name"])
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _worker(queue):
+    import pp
+
+    queue.put(write_shared_memory([pp.c.mzi(), pp.c.mmi1x2()]))
+
+
+def test_shared_memory():
+    import multiprocessing
+    import pytest
+    import pp
+
+    pytest.importorskip("multiprocessing.shared_memory")
+
+    mzi = pp.c.mzi()
+    array = pp.Component()
+    array.add_array(pp.c.rectangle(), columns=3, rows=2, spacing=(20, 10))
+    array.add_label("a", position=(1, 2))
+
+    c1, c2 = read_shared_memory(write_shared_memory([mzi, array]))
+    assert c1.name == mzi.name
+    assert c1.settings == mzi.settings
+    assert sorted(c1.ports) == sorted(mzi.ports)
+    for name, port in mzi.ports.items():
+        assert np.allclose(c1.ports[name].midpoint, port.midpoint)
+    assert np.allclose(c1.bbox, mzi.bbox)
+    assert sorted(c1.aliases) == sorted(mzi.aliases)
+    for layer, polygons in mzi.get_polygons(by_spec=True).items():
+        polygons2 = c1.get_polygons(by_spec=True)[layer]
+        assert len(polygons) == len(polygons2)
+        assert all(np.array_equal(p1, p2) for p1, p2 in zip(polygons, polygons2))
+
+    assert c2.references[0].columns == 3
+    assert np.allclose(c2.bbox, array.bbox)
+    assert c2.labels[0].text == "a"
+    rectangle = c2.references[0].parent
+    assert rectangle.polygons[0].polygons[0].base is not None  # a view, not a copy
+
+    queue = multiprocessing.Queue()
+    p = multiprocessing.Process(target=_worker, args=(queue,))
+    p.start()
+    c1, c2 = read_shared_memory(queue.get(timeout=60))
+    p.join()
+    assert c1.name == mzi.name
+    assert np.allclose(c1.bbox, mzi.bbox)
+    assert "W0" in c2.ports
+
+
+def test_unlink_shared_memory():
+    import pytest
+    import pp
+
+    pytest.importorskip("multiprocessing.shared_memory")
+    SharedMemory, _ = import_shared_memory()
+
+    descriptor = write_shared_memory([pp.c.mmi1x2()])
+    unlink_shared_memory(descriptor)
+    unlink_shared_memory(descriptor)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=descriptor["name"])
+
+
+if __name__ == "__main__":
+    import pp
+
+    c = pp.c.mzi()
+    c2 = read_shared_memory(write_shared_memory([c]))[0]
+    pp.show(c2)
@@ -16,6 +16,9 @@ from pp import klive
 from pp.component import Component
 
 from pp.layers import LAYER
+from pp.derived_layers import add_derived_layers
+from pp.oasis import convert, get_suffix, is_oasis
+from pp import profiler
 
 
 def get_component_type(component_type, component_factory=component_factory, **kwargs):
@@ -46,7 +49,7 @@ def write_component_type(
     assert type(component_type) == str
 
     component_name = get_component_name(component_type, **kwargs)
-    gdspath = path_directory / (component_name + ".gds")
+    gdspath = path_directory / (component_name + get_suffix())
     path_directory.mkdir(parents=True, exist_ok=True)
 
     if not gdspath.exists() or overwrite:
@@ -57,6 +60,7 @@ def write_component_type(
     return gdspath
 
 
+@profiler.profile("metadata")
 def write_component_report(component, json_path=None):
     """write component GDS and metadata:
 
@@ -85,8 +89,7 @@ def write_component_report(component, json_path=None):
                 )
 
     """ write json """
-    with open(json_path, "w+") as fw:
-        fw.write(json.dumps(component.get_json(), indent=2))
+    component.write_json(json_path)
     return json_path
 
 
@@ -112,7 +115,7 @@ def write_component(
         settings: dict of settings
     """
 
-    gdspath = gdspath or path_library / (component.name + ".gds")
+    gdspath = gdspath or path_library / (component.name + get_suffix())
     gdspath = pathlib.Path(gdspath)
     ports_path = gdspath.with_suffix(".ports")
     json_path = gdspath.with_suffix(".json")
@@ -144,8 +147,7 @@ def write_component(
                 )
 
     """ write JSON """
-    with open(json_path, "w+") as fw:
-        fw.write(json.dumps(component.get_json(), indent=2))
+    component.write_json(json_path)
     return gdspath
 
 
@@ -165,11 +167,12 @@ def write_gds(
     auto_rename: bool = False,
     with_settings_label: bool = conf.tech.with_settings_label,
 ) -> str:
-    """write component to GDS and returs gdspath
+    """write component to GDS (or OASIS for .oas paths) and returs gdspath
 
     Args:
         component (required)
         gdspath: by default saves it into CONFIG['gds_directory']
+            with the suffix of conf.tech.layout_format
         auto_rename: False by default (otherwise it calls it top_cell)
         unit
         precission
@@ -178,7 +181,7 @@ def write_gds(
         gdspath
     """
 
-    gdspath = gdspath or CONFIG["gds_directory"] / (component.name + ".gds")
+    gdspath = gdspath or CONFIG["gds_directory"] / (component.name + get_suffix())
     gdspath = pathlib.Path(gdspath)
     gdsdir = gdspath.parent
     gdspath = str(gdspath)
@@ -192,6 +195,9 @@ def write_gds(
         component.remove_layers([port_layer])
         component.remove_layers([label_layer])
 
+    if conf.tech.deferred_cladding:
+        add_derived_layers(component)
+
     # write component settings into text layer
     if with_settings_label:
         settings = component.get_settings()
@@ -206,9 +212,15 @@ def write_gds(
                 layer=CONFIG["layers"]["TEXT"],
             )
 
-    component.write_gds(
-        gdspath, precision=precision, auto_rename=auto_rename,
-    )
+    with profiler.span("write_gds", component.function_name or "Component"):
+        # gdspy only writes GDS, klayout converts it to OASIS
+        tmppath = gdspath[:-4] + ".tmp.gds" if is_oasis(gdspath) else gdspath
+        component.write_gds(
+            tmppath, precision=precision, auto_rename=auto_rename,
+        )
+        if tmppath != gdspath:
+            convert(tmppath, gdspath)
+            pathlib.Path(tmppath).unlink()
     component.path = gdspath
     return gdspath
 
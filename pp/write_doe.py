@@ -3,14 +3,17 @@ from pp.name import get_component_name
 from pp.components import component_factory
 from pp.write_component import write_component
 from pp.config import CONFIG
+from pp.oasis import get_suffix
 from pp.doe import get_settings_list
 from pp.routing.add_fiber_array import add_fiber_array_te, add_fiber_array_tm
+from pp import profiler
 
 name2function = dict(
     add_fiber_array_te=add_fiber_array_te, add_fiber_array_tm=add_fiber_array_tm
 )
 
 
+@profiler.profile("metadata")
 def write_doe_metadata(
     doe_name,
     cell_names,
@@ -174,7 +177,7 @@ def write_doe(
 
         cell_names.append(component.name)
         cell_settings.append(settings)
-        gdspath = path / (component.name + ".gds")
+        gdspath = path / (component.name + get_suffix())
         doe_gds_paths += [gdspath]
         write_component(component, gdspath)
 